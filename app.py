@@ -8,7 +8,10 @@ AI 구매 후회 방지 분석기 - Streamlit 웹앱
 import streamlit as st
 import streamlit.components.v1 as components
 import pandas as pd
+import io
 import sys
+import time
+import uuid
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -36,10 +39,15 @@ from utils.visualizer import (
 )
 from utils.regret_calculator import (
     add_regret_scores_to_dataframe,
+    IncrementalRegretScorer,
     get_regret_score_interpretation,
-    get_overall_regret_analysis
+    get_overall_regret_analysis,
+    build_ai_analysis_inputs
 )
 
+from utils.pipeline_cache import get_csv_pipeline_cache, hash_content, make_cache_key
+from utils.ai_telemetry import get_ai_telemetry, usage_cost
+
 # 인증 (Google OAuth + 로컬 ID/PW)
 from utils.auth import (
     get_login_url,
@@ -50,7 +58,10 @@ from utils.auth import (
     save_session,
     load_session,
     register_local,
-    login_local
+    login_local,
+    cache_user_profile,
+    set_user_language,
+    get_saved_purchase_count
 )
 
 # Supabase DB (선택적)
@@ -58,10 +69,13 @@ try:
     from utils.database import (
         is_db_available, get_or_create_user, get_user_by_email,
         is_admin,
-        save_purchases, save_single_purchase, load_purchases,
-        delete_purchases, get_purchase_count,
-        save_analysis, load_analyses, load_latest_analysis,
-        log_ai_usage
+        save_purchases, save_purchase_items,
+        load_purchases_cached,
+        delete_purchases, get_purchase_count, get_purchase_data_version,
+        load_purchase_summary,
+        load_analysis_list, load_analysis_body, make_analysis_preview, load_latest_analysis,
+        save_analysis_async, find_precomputed_analysis, load_ai_usage_summary,
+        get_write_queue
     )
     DB_AVAILABLE = True
 except ImportError:
@@ -245,6 +259,114 @@ def display_sidebar():
         """, unsafe_allow_html=True)
 
 
+# 사이드바 분석 이력 세션 캐시 유지 시간 (초)
+ANALYSIS_HISTORY_TTL = 60
+
+
+def get_analysis_history(user_id: str, user_email: str) -> dict:
+    """
+    사이드바 분석 이력 + 구매 이력 수 (세션 캐시)
+
+    TTL 안이고 이 프로세스에서 구매 이력이 바뀌지 않았으면 DB를 조회하지 않습니다.
+    새 분석은 remember_new_analysis로 캐시 앞에 직접 추가합니다 (쓰기 지연 큐 저장 전에도 표시).
+    구매 이력 수는 COUNT 쿼리 대신 세션 프로필의 users.purchase_count를 사용합니다.
+
+    Returns:
+        {'analyses': 최근 분석 5건 (메타데이터 + 미리보기), 'purchase_count': 저장된 구매 이력 수}
+    """
+    version = get_purchase_data_version(user_id)
+    history = st.session_state.get('analysis_history')
+    if (history and history['user_id'] == user_id
+            and history['purchase_version'] == version
+            and time.time() - history['loaded_at'] < ANALYSIS_HISTORY_TTL):
+        return history
+
+    # 구매 이력을 저장/삭제한 뒤면 트리거가 갱신한 건수를 프로필에서 다시 읽음
+    data_changed = bool(history and history['user_id'] == user_id
+                        and history['purchase_version'] != version)
+    purchase_count = get_saved_purchase_count(user_email, refresh=data_changed)
+    if purchase_count is None:
+        purchase_count = get_purchase_count(user_id)
+
+    history = {
+        'user_id': user_id,
+        'purchase_version': version,
+        'loaded_at': time.time(),
+        'analyses': load_analysis_list(user_id, limit=5),
+        'purchase_count': purchase_count
+    }
+    st.session_state.analysis_history = history
+    return history
+
+
+def get_purchase_summary() -> dict:
+    """
+    현재 분석 범위의 카테고리/월별 집계 (서버 측 purchase_summary RPC, 세션 캐시)
+
+    누적 구매 분석(DB)일 때만 사용하고, CSV 업로드 분석이면 None을 반환하여
+    화면이 DataFrame에서 직접 집계하도록 합니다.
+
+    Returns:
+        load_purchase_summary 결과 또는 None
+    """
+    scope = st.session_state.get('analysis_scope')
+    if not scope or not DB_AVAILABLE or not is_db_available():
+        return None
+
+    user_id = scope['user_id']
+    key = (user_id, scope['date_from'], get_purchase_data_version(user_id))
+    cached = st.session_state.get('purchase_summary')
+    if cached and cached['key'] == key:
+        return cached['summary']
+
+    summary = load_purchase_summary(user_id, date_from=scope['date_from'])
+    st.session_state.purchase_summary = {'key': key, 'summary': summary}
+    return summary
+
+
+def remember_new_analysis(user_id: str, analysis: dict) -> None:
+    """방금 저장 요청한 분석을 세션 이력 캐시 앞에 추가 (본문은 이미 있으므로 행에 그대로 보관)"""
+    history = st.session_state.get('analysis_history')
+    if not history or history['user_id'] != user_id:
+        return
+    row = dict(
+        analysis,
+        created_at=pd.Timestamp.now().isoformat(),
+        psychology_preview=make_analysis_preview(analysis.get('psychology_analysis')),
+        insights_preview=make_analysis_preview(analysis.get('smart_insights'))
+    )
+    history['analyses'] = [row] + history['analyses'][:4]
+
+
+def get_analysis_body(user_id: str, analysis: dict, load: bool = False) -> dict:
+    """
+    분석 이력 1건의 본문 (세션 캐시)
+
+    Args:
+        user_id: 사용자 UUID
+        analysis: 이력 목록 행
+        load: 캐시에 없으면 DB에서 조회 (전체 보기 버튼을 눌렀을 때)
+
+    Returns:
+        {psychology_analysis, smart_insights} 또는 None (아직 불러오지 않음)
+    """
+    # 이 세션에서 방금 만든 분석은 본문을 이미 갖고 있음
+    if 'psychology_analysis' in analysis:
+        return analysis
+
+    bodies = st.session_state.setdefault('analysis_bodies', {})
+    analysis_id = analysis.get('id')
+    if analysis_id in bodies:
+        return bodies[analysis_id]
+    if not load or analysis_id is None:
+        return None
+
+    body = load_analysis_body(user_id, analysis_id)
+    if body is not None:
+        bodies[analysis_id] = body
+    return body
+
+
 def display_analysis_history():
     """사이드바에 분석 이력 표시 (DB 연동 시)"""
     lang = get_lang()
@@ -256,13 +378,14 @@ def display_analysis_history():
         st.divider()
         st.markdown(f"### {t('analysis_history', lang)}")
 
-        analyses = load_analyses(user_id, limit=5)
+        history = get_analysis_history(user_id, st.session_state.user_info['email'])
+        analyses = history['analyses']
         if not analyses:
             st.caption(t('no_analysis_history', lang))
             return
 
         # 저장된 구매 이력 수
-        purchase_count = get_purchase_count(user_id)
+        purchase_count = history['purchase_count']
         st.caption(f"{t('saved_purchases', lang)}: {purchase_count}{t('count_unit', lang)}")
 
         for a in analyses:
@@ -272,11 +395,67 @@ def display_analysis_history():
             label = f"{created} | {count}{t('count_unit', lang)} | {t('regret_label', lang)} {avg_score:.0f}{t('score_unit', lang)}"
 
             with st.expander(label, expanded=False):
-                if a.get('psychology_analysis'):
-                    st.markdown(a['psychology_analysis'][:300] + "\u2026" if len(a.get('psychology_analysis', '')) > 300 else a.get('psychology_analysis', ''))
-                if a.get('smart_insights'):
+                # 목록은 미리보기만 - 본문은 전체 보기를 누른 분석만 불러와 세션에 보관
+                body = get_analysis_body(user_id, a)
+                psychology = a.get('psychology_preview') or ''
+                insights = a.get('insights_preview') or ''
+                truncated = psychology.endswith("\u2026") or insights.endswith("\u2026")
+                if body is None and truncated:
+                    if st.button(t('show_full_analysis', lang), key=f"analysis_body_{a.get('id')}"):
+                        body = get_analysis_body(user_id, a, load=True)
+                if body is not None:
+                    psychology = body.get('psychology_analysis') or ''
+                    insights = body.get('smart_insights') or ''
+
+                if psychology:
+                    st.markdown(psychology)
+                if insights:
                     st.markdown("---")
-                    st.markdown(a['smart_insights'][:300] + "\u2026" if len(a.get('smart_insights', '')) > 300 else a.get('smart_insights', ''))
+                    st.markdown(insights)
+
+
+# 관리자 AI 사용량 일별 요약 세션 캐시 유지 시간 (초)
+AI_USAGE_SUMMARY_TTL = 300
+
+
+def get_ai_usage_summary() -> list:
+    """최근 7일 AI 사용량 일별 요약 (세션 캐시 - TTL 안의 rerun은 DB 조회 없음)"""
+    cached = st.session_state.get('ai_usage_summary')
+    if cached and time.time() - cached['loaded_at'] < AI_USAGE_SUMMARY_TTL:
+        return cached['rows']
+
+    rows = load_ai_usage_summary(days=7)
+    st.session_state.ai_usage_summary = {'rows': rows, 'loaded_at': time.time()}
+    return rows
+
+
+def display_ai_telemetry():
+    """사이드바에 AI 호출 계측 요약 표시 (관리자 전용)"""
+    if not st.session_state.get('is_admin', False):
+        return
+
+    lang = get_lang()
+    with st.sidebar:
+        st.divider()
+        with st.expander(t('ai_telemetry', lang)):
+            # 이 프로세스의 실시간 집계 (실패 호출 포함)
+            summary = get_ai_telemetry().summary()
+            if summary:
+                st.caption(t('ai_telemetry_process', lang))
+                st.dataframe(pd.DataFrame(summary), hide_index=True)
+            else:
+                st.caption(t('ai_telemetry_empty', lang))
+
+            # DB 기준 최근 7일 (모든 프로세스) + 쓰기 지연 큐 상태
+            if DB_AVAILABLE and is_db_available():
+                queue = get_write_queue().stats()
+                st.caption(t('write_queue_status', lang).format(
+                    queue['written'], queue['pending'], queue['retried'], queue['dropped']
+                ))
+                daily = get_ai_usage_summary()
+                if daily:
+                    st.caption(t('ai_telemetry_daily', lang))
+                    st.dataframe(pd.DataFrame(daily), hide_index=True)
 
 
 def display_login_screen():
@@ -441,38 +620,40 @@ def upload_csv():
 
     if uploaded_file is not None:
         try:
-            # 새 파일 감지 (파일명 비교)
-            if st.session_state.get('last_uploaded_file') != uploaded_file.name:
-                st.session_state.last_uploaded_file = uploaded_file.name
+            content = uploaded_file.getvalue()
+            content_hash = hash_content(content)
+            cache_key = make_cache_key(content_hash, lang)
+            csv_cache = get_csv_pipeline_cache()
+            session_id = get_cache_session_id()
+
+            # 새 파일 감지 (내용 해시 비교)
+            if st.session_state.get('last_uploaded_file') != content_hash:
+                st.session_state.last_uploaded_file = content_hash
                 st.session_state.new_analysis = True
 
-            # CSV 읽기 (인코딩 자동 감지)
-            try:
-                df = pd.read_csv(uploaded_file, encoding='utf-8')
-            except UnicodeDecodeError:
-                df = pd.read_csv(uploaded_file, encoding='cp949')
+            # 이 세션이 이전에 올린 파일의 캐시 해제
+            csv_cache.release(session_id, keep=cache_key)
 
-            st.success(f"{t('csv_upload_success', lang)} ({len(df)}건)")
+            # 같은 파일·같은 날이면 캐시된 결과 사용 (rerun마다 재계산 방지)
+            result = csv_cache.get(cache_key)
+            if result is None:
+                with st.spinner(f'🧮 {t("calculating_regret", lang)}'):
+                    result = run_csv_pipeline(content)
+                csv_cache.put(cache_key, result, owner=session_id)
+            else:
+                csv_cache.acquire(cache_key, session_id)
 
-            # 데이터 검증
-            is_valid, error_message = validate_csv(df)
+            st.success(f"{t('csv_upload_success', lang)} ({result['row_count']}건)")
 
-            if not is_valid:
-                st.error(f"❌ {t('csv_invalid', lang)}: {error_message}")
+            if result['error'] is not None:
+                st.error(f"❌ {t('csv_invalid', lang)}: {result['error']}")
                 return None
 
             st.success(t('csv_valid', lang))
-
-            # 데이터 전처리
-            processed_df = process_csv_data(df)
-
-            # 후회 점수 계산
-            with st.spinner(f'🧮 {t("calculating_regret", lang)}'):
-                processed_df = add_regret_scores_to_dataframe(processed_df)
-
             st.success(t('regret_calc_complete', lang))
 
-            return processed_df
+            # 캐시 항목은 다른 세션과 공유하므로 복사본 반환
+            return result['processed_df'].copy()
 
         except Exception as e:
             st.error(f"❌ {t('file_error', lang)}: {str(e)}")
@@ -481,6 +662,45 @@ def upload_csv():
     return None
 
 
+def get_cache_session_id() -> str:
+    """파이프라인 캐시 소유 관리용 세션 id"""
+    if 'cache_session_id' not in st.session_state:
+        st.session_state.cache_session_id = uuid.uuid4().hex
+    return st.session_state.cache_session_id
+
+
+def run_csv_pipeline(content: bytes) -> dict:
+    """
+    업로드 CSV 파이프라인 실행 (읽기 → 검증 → 전처리 → 후회 점수)
+
+    Args:
+        content: 업로드 파일 내용
+
+    Returns:
+        {
+            'row_count': 원본 행 수,
+            'processed_df': 후회 점수가 포함된 DataFrame (검증 실패 시 None),
+            'error': 검증 에러 메시지 (성공 시 None)
+        }
+    """
+    # CSV 읽기 (인코딩 자동 감지)
+    try:
+        df = pd.read_csv(io.BytesIO(content), encoding='utf-8')
+    except UnicodeDecodeError:
+        df = pd.read_csv(io.BytesIO(content), encoding='cp949')
+
+    # 데이터 검증
+    is_valid, error_message = validate_csv(df)
+    if not is_valid:
+        return {'row_count': len(df), 'processed_df': None, 'error': error_message}
+
+    # 데이터 전처리 + 후회 점수 계산
+    processed_df = process_csv_data(df)
+    processed_df = add_regret_scores_to_dataframe(processed_df)
+
+    return {'row_count': len(df), 'processed_df': processed_df, 'error': None}
+
+
 def expense_tracker():
     """가계부 - 지출 기록 + 누적 데이터 조회/삭제 + 분석"""
     lang = get_lang()
@@ -611,8 +831,7 @@ def expense_tracker():
         with save_col:
             if st.button(t('btn_save_all', lang), type="primary", use_container_width=True):
                 if has_db:
-                    for item in st.session_state.pending_items:
-                        save_single_purchase(user_id, item)
+                    save_purchase_items(user_id, st.session_state.pending_items)
                 else:
                     if 'manual_items' not in st.session_state:
                         st.session_state.manual_items = []
@@ -659,7 +878,7 @@ def expense_tracker():
         date_from = None
         if days > 0:
             date_from = (pd.Timestamp.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-        purchases_df = load_purchases(user_id, date_from=date_from, include_id=True)
+        purchases_df = load_purchases_cached(user_id, date_from=date_from, include_id=True)
     else:
         # DB 없을 때 세션 fallback
         if st.session_state.get('manual_items'):
@@ -703,18 +922,26 @@ def expense_tracker():
         # ===== 3. 분석 버튼 =====
         if st.button(f"🚀 {t('analyze_accumulated', lang)}", type="primary", use_container_width=True):
             with st.spinner(f'🧮 {t("processing_data", lang)}'):
-                # 분석용 데이터 준비 (_id 제외)
-                analysis_df = purchases_df.drop(columns=['_id'], errors='ignore').copy()
-
-                # 기존 파이프라인 실행
-                is_valid, error_message = validate_csv(analysis_df)
-                if not is_valid:
+                if has_db and '_id' in purchases_df.columns:
+                    # DB 모드: 이전 분석 이후 추가/삭제된 행만 재계산
+                    processed_df, error_message = score_accumulated_purchases(user_id, days, purchases_df)
+                    st.session_state.analysis_scope = {'user_id': user_id, 'date_from': date_from}
+                else:
+                    st.session_state.analysis_scope = None
+                    # 분석용 데이터 준비 (_id 제외)
+                    analysis_df = purchases_df.drop(columns=['_id'], errors='ignore').copy()
+
+                    # 기존 파이프라인 실행
+                    is_valid, error_message = validate_csv(analysis_df)
+                    processed_df = None
+                    if is_valid:
+                        processed_df = process_csv_data(analysis_df)
+                        processed_df = add_regret_scores_to_dataframe(processed_df)
+
+                if processed_df is None:
                     st.error(f"❌ {t('validation_failed', lang)}: {error_message}")
                     return None
 
-                processed_df = process_csv_data(analysis_df)
-                processed_df = add_regret_scores_to_dataframe(processed_df)
-
                 st.success(f"✅ {t('analysis_done', lang)}")
                 st.session_state.new_analysis = True
                 return processed_df
@@ -725,6 +952,43 @@ def expense_tracker():
     return None
 
 
+def score_accumulated_purchases(user_id, period_days, purchases_df):
+    """
+    누적 구매 데이터 후회 점수 계산 (증분)
+
+    사용자·기간별 IncrementalRegretScorer를 세션에 유지하고,
+    직전 분석 이후 추가된 행만 검증/전처리하여 반영하고 삭제된 행은 제거합니다.
+
+    Args:
+        user_id: 사용자 UUID
+        period_days: 기간 필터 (일, 0이면 전체)
+        purchases_df: load_purchases(include_id=True) 결과
+
+    Returns:
+        (후회 점수가 포함된 DataFrame 또는 None, 에러 메시지)
+    """
+    if 'regret_scorers' not in st.session_state:
+        st.session_state.regret_scorers = {}
+
+    scorer_key = (user_id, period_days)
+    scorer = st.session_state.regret_scorers.get(scorer_key)
+    if scorer is None:
+        scorer = IncrementalRegretScorer(id_column='_id')
+        st.session_state.regret_scorers[scorer_key] = scorer
+
+    added_df, removed_ids = scorer.diff(purchases_df)
+
+    if len(added_df) > 0:
+        is_valid, error_message = validate_csv(added_df.copy())
+        if not is_valid:
+            return None, error_message
+        scorer.add(process_csv_data(added_df))
+
+    scorer.remove(removed_ids)
+
+    return scorer.scored_frame().drop(columns=['_id']), None
+
+
 def display_raw_data(df: pd.DataFrame):
     """원본 데이터 테이블 표시"""
     lang = get_lang()
@@ -772,13 +1036,13 @@ def display_raw_data(df: pd.DataFrame):
         st.metric(t('num_categories', lang), f"{categories}")
 
 
-def display_category_analysis(df: pd.DataFrame):
+def display_category_analysis(df: pd.DataFrame, summary: dict = None):
     """카테고리별 분석 표시"""
     lang = get_lang()
     st.header(t('category_analysis', lang))
 
-    # 카테고리 집계
-    category_summary = get_category_summary(df)
+    # 카테고리 집계 (서버 집계가 있으면 사용)
+    category_summary = summary['categories'] if summary else get_category_summary(df)
 
     # 차트 타입 선택
     col1, col2 = st.columns([3, 1])
@@ -812,7 +1076,7 @@ def display_category_analysis(df: pd.DataFrame):
     )
 
 
-def display_additional_charts(df: pd.DataFrame):
+def display_additional_charts(df: pd.DataFrame, summary: dict = None):
     """추가 차트 표시"""
     lang = get_lang()
     st.header(t('deep_analysis', lang))
@@ -827,7 +1091,9 @@ def display_additional_charts(df: pd.DataFrame):
 
     with col2:
         st.subheader(t('monthly_trend', lang))
-        fig_timeline = create_timeline_chart(df, lang)
+        fig_timeline = create_timeline_chart(
+            df, lang, monthly_summary=summary['monthly'] if summary else None
+        )
         st.plotly_chart(fig_timeline, use_container_width=True)
 
     # 필요도 vs 사용빈도 산점도
@@ -1071,7 +1337,7 @@ def display_regret_score_analysis(df: pd.DataFrame):
         st.markdown(t('factor_explain_text', lang))
 
 
-def display_ai_analysis(df: pd.DataFrame):
+def display_ai_analysis(df: pd.DataFrame, summary: dict = None):
     """AI 기반 통합 분석 (심리 분석 + 스마트 인사이트)"""
     lang = get_lang()
     st.header(t('ai_analysis', lang))
@@ -1117,138 +1383,146 @@ def display_ai_analysis(df: pd.DataFrame):
         st.warning(t('regret_not_calculated', lang))
         return
 
-    # 전체 분석 데이터 준비
+    # 전체 분석 데이터 준비 (배치 사전 생성과 같은 입력)
     analysis = get_overall_regret_analysis(df)
-    insights_data = prepare_smart_insights_data(df)
-
-    # 카테고리별 통계
-    category_stats = insights_data['category_breakdown']
-
-    # 상위 후회 항목
-    top_regret = df.nlargest(5, '후회점수')
-    top_regret_items = []
-    for _, row in top_regret.iterrows():
-        top_regret_items.append({
-            'category': row['카테고리'],
-            'product': row['상품명'],
-            'amount': int(row['금액']),
-            'score': float(row['후회점수'])
-        })
+    ai_inputs = build_ai_analysis_inputs(
+        df, lang, category_summary=summary['categories'] if summary else None
+    )
 
     # 통합 AI 분석 생성 버튼
     if st.button(t('btn_ai', lang), type="primary", use_container_width=True):
-        with st.spinner(t('ai_analyzing', lang)):
-            if not OPENAI_AVAILABLE:
-                st.error(t('openai_not_installed', lang))
+        # 배치로 미리 생성된 결과가 현재 데이터와 일치하면 API 호출 없이 바로 표시
+        user_id = st.session_state.get('db_user_id')
+        if user_id and DB_AVAILABLE and is_db_available():
+            precomputed = find_precomputed_analysis(
+                user_id, len(df), int(df['금액'].sum()), lang
+            )
+            if precomputed:
+                st.session_state.ai_feedback = precomputed.get('psychology_analysis') or ''
+                st.session_state.smart_insights = precomputed.get('smart_insights') or ''
+
+                st.markdown("---")
+                st.markdown(st.session_state.ai_feedback)
+                st.markdown("---")
+                st.markdown(st.session_state.smart_insights)
+                st.markdown("---")
+                display_savings_calculator(df, summary)
+                st.success(t('ai_complete', lang))
                 return
 
-            openai_service = get_openai_service()
-            if not openai_service:
-                st.error(t('openai_init_error', lang))
-                return
+        if not OPENAI_AVAILABLE:
+            st.error(t('openai_not_installed', lang))
+            return
 
-            # 주요 원인 변환
-            cause_names = t('cause_names', lang)
-            main_cause = cause_names.get(
-                analysis['main_cause']['name'],
-                analysis['main_cause']['name']
-            )
+        openai_service = get_openai_service()
+        if not openai_service:
+            st.error(t('openai_init_error', lang))
+            return
 
-            total_tokens_used = 0
-
-            # --- 1) 심리 분석 ---
-            feedback_result = openai_service.generate_ai_feedback(
-                overall_score=analysis['avg_regret_score'],
-                total_purchases=analysis['total_purchases'],
-                total_amount=df['금액'].sum(),
-                regret_ratio=analysis['regret_ratio'],
-                main_cause=main_cause,
-                top_regret_items=top_regret_items,
-                category_breakdown=category_stats,
-                language=lang
-            )
+        if openai_service.analysis_mode == 'combined':
+            # 심리 분석 + 스마트 인사이트를 구조화 응답 1회로 생성 (공통 데이터 1회 전송)
+            with st.spinner(t('ai_analyzing', lang)):
+                combined_result = openai_service.generate_combined_analysis(
+                    **openai_service.combined_inputs(ai_inputs), language=lang
+                )
 
-            # --- 2) 스마트 인사이트 ---
-            insights_result = openai_service.generate_smart_insights(
-                overall_score=analysis['avg_regret_score'],
-                total_purchases=analysis['total_purchases'],
-                total_amount=df['금액'].sum(),
-                target_items=insights_data['target_items'],
-                category_spending=insights_data['category_spending'],
-                category_breakdown=category_stats,
-                language=lang
+            feedback_result = {
+                'success': combined_result['success'],
+                'feedback': combined_result['feedback'],
+                'error': combined_result['error']
+            }
+            insights_result = {
+                'success': combined_result['success'],
+                'insights': combined_result['insights'],
+                'error': combined_result['error']
+            }
+            usage_logs = [('combined', combined_result.get('usage'))]
+
+            if combined_result['success']:
+                st.markdown("---")
+                st.markdown(combined_result['feedback'])
+                st.markdown("---")
+                st.markdown(combined_result['insights'])
+        else:
+            # 심리 분석 + 스마트 인사이트 스트리밍
+            # 인사이트는 백그라운드에서 미리 수신하여 심리 분석을 그리는 동안에도 진행
+            feedback_stream = openai_service.stream_ai_feedback(
+                **openai_service.feedback_inputs(ai_inputs), language=lang
             )
+            insights_stream = openai_service.stream_smart_insights(
+                **openai_service.insights_inputs(ai_inputs), language=lang
+            ).prefetch()
 
-            # 결과 저장
-            if feedback_result['success']:
-                st.session_state.ai_feedback = feedback_result['feedback']
-                st.session_state.ai_usage = feedback_result.get('usage', {})
+            # 심리 분석 결과 표시 (도착하는 대로)
+            st.markdown("---")
+            st.write_stream(feedback_stream)
 
-            if insights_result['success']:
-                st.session_state.smart_insights = insights_result['insights']
-                st.session_state.smart_insights_usage = insights_result.get('usage', {})
+            # 스마트 인사이트 결과 표시 (도착하는 대로)
+            st.markdown("---")
+            st.write_stream(insights_stream)
 
-            if feedback_result['success'] or insights_result['success']:
-                st.success(t('ai_complete', lang))
+            feedback_result = feedback_stream.result()
+            insights_result = insights_stream.result()
+            usage_logs = [('psychology', feedback_result.get('usage')),
+                          ('smart_insights', insights_result.get('usage'))]
 
-                # DB에 분석 결과 저장
-                user_id = st.session_state.get('db_user_id')
-                if user_id and DB_AVAILABLE and is_db_available():
-                    high_regret = int((df['후회점수'] >= 50).sum()) if '후회점수' in df.columns else 0
-                    analysis_id = save_analysis(user_id, {
-                        'purchase_count': len(df),
-                        'total_spent': int(df['금액'].sum()),
-                        'average_regret_score': round(analysis['avg_regret_score'], 2),
-                        'high_regret_count': high_regret,
-                        'psychology_analysis': feedback_result.get('feedback', ''),
-                        'smart_insights': insights_result.get('insights', '')
-                    })
-
-                    # AI 사용량 로깅
-                    if feedback_result.get('usage'):
-                        log_ai_usage(user_id, analysis_id, 'psychology', feedback_result['usage'])
-                    if insights_result.get('usage'):
-                        log_ai_usage(user_id, analysis_id, 'smart_insights', insights_result['usage'])
-
-                # 심리 분석 결과 표시
-                if feedback_result['success']:
-                    st.markdown("---")
-                    st.markdown(feedback_result['feedback'])
+        # 결과 저장
+        if feedback_result['success']:
+            st.session_state.ai_feedback = feedback_result['feedback']
+            st.session_state.ai_usage = feedback_result.get('usage', {})
 
-                # 스마트 인사이트 결과 표시
-                if insights_result['success']:
-                    st.markdown("---")
-                    st.markdown(insights_result['insights'])
-                    st.markdown("---")
+        if insights_result['success']:
+            st.session_state.smart_insights = insights_result['insights']
+            st.session_state.smart_insights_usage = insights_result.get('usage', {})
 
-                    # 저축 시뮬레이터
-                    display_savings_calculator(df)
-
-                # 합산 API 사용량 표시
-                with st.expander(t('api_usage', lang)):
-                    usage1 = feedback_result.get('usage', {})
-                    usage2 = insights_result.get('usage', {})
-                    total_prompt = usage1.get('prompt_tokens', 0) + usage2.get('prompt_tokens', 0)
-                    total_completion = usage1.get('completion_tokens', 0) + usage2.get('completion_tokens', 0)
-                    total_all = total_prompt + total_completion
-
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric(t('token_input', lang), f"{total_prompt:,}")
-                    with col2:
-                        st.metric(t('token_output', lang), f"{total_completion:,}")
-                    with col3:
-                        st.metric(t('token_total', lang), f"{total_all:,}")
-
-                    prompt_cost = total_prompt * 0.15 / 1_000_000
-                    completion_cost = total_completion * 0.60 / 1_000_000
-                    total_cost = prompt_cost + completion_cost
-                    krw_cost = total_cost * 1300
-                    st.info(f"{t('cost_estimate', lang)}: ${total_cost:.6f} (≈ {format_currency(krw_cost, lang)})")
-            else:
-                error_msg = feedback_result.get('error', '') or insights_result.get('error', '')
-                st.error(f"{error_msg}")
-                st.info(t('api_retry', lang))
+        if feedback_result['success'] or insights_result['success']:
+            # DB에 분석 결과 + AI 사용량 저장 (쓰기 지연 큐 - 결과 화면을 기다리게 하지 않음)
+            # 사용량은 스트리밍의 경우 마지막 usage 청크 기준
+            user_id = st.session_state.get('db_user_id')
+            if user_id and DB_AVAILABLE and is_db_available():
+                high_regret = int((df['후회점수'] >= 50).sum()) if '후회점수' in df.columns else 0
+                analysis_row = {
+                    'purchase_count': len(df),
+                    'total_spent': int(df['금액'].sum()),
+                    'average_regret_score': round(analysis['avg_regret_score'], 2),
+                    'high_regret_count': high_regret,
+                    'psychology_analysis': feedback_result.get('feedback', ''),
+                    'smart_insights': insights_result.get('insights', '')
+                }
+                save_analysis_async(user_id, analysis_row, usage_logs=usage_logs)
+                remember_new_analysis(user_id, analysis_row)
+
+            if insights_result['success']:
+                st.markdown("---")
+
+                # 저축 시뮬레이터
+                display_savings_calculator(df, summary)
+
+            st.success(t('ai_complete', lang))
+
+            # 합산 API 사용량 표시
+            with st.expander(t('api_usage', lang)):
+                usages = [usage for _, usage in usage_logs if usage]
+                total_prompt = sum(u.get('prompt_tokens', 0) for u in usages)
+                total_completion = sum(u.get('completion_tokens', 0) for u in usages)
+                total_all = total_prompt + total_completion
+
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric(t('token_input', lang), f"{total_prompt:,}")
+                with col2:
+                    st.metric(t('token_output', lang), f"{total_completion:,}")
+                with col3:
+                    st.metric(t('token_total', lang), f"{total_all:,}")
+
+                # 응답 캐시 적중분은 실제 호출이 없으므로 비용 0
+                total_cost = sum(usage_cost(u) for u in usages)
+                krw_cost = total_cost * 1300
+                st.info(f"{t('cost_estimate', lang)}: ${total_cost:.6f} (≈ {format_currency(krw_cost, lang)})")
+        else:
+            error_msg = feedback_result.get('error', '') or insights_result.get('error', '')
+            st.error(f"{error_msg}")
+            st.info(t('api_retry', lang))
 
     # 이전에 생성된 결과가 있으면 표시
     elif 'ai_feedback' in st.session_state or 'smart_insights' in st.session_state:
@@ -1262,7 +1536,7 @@ def display_ai_analysis(df: pd.DataFrame):
             st.markdown("---")
             st.markdown(st.session_state.smart_insights)
             st.markdown("---")
-            display_savings_calculator(df)
+            display_savings_calculator(df, summary)
 
     else:
         st.info(t('ai_guide', lang))
@@ -1272,58 +1546,22 @@ def display_ai_analysis(df: pd.DataFrame):
             st.markdown(t('preview_insights', lang))
 
 
-def prepare_smart_insights_data(df):
-    """스마트 인사이트용 데이터 준비"""
-    # Top 5 후회 항목
-    top_regret = df.nlargest(5, '후회점수')
-
-    # Top 3 고가 항목
-    top_expensive = df.nlargest(3, '금액')
-
-    # 중복 제거 (최대 8건)
-    combined_indices = list(set(top_regret.index.tolist() + top_expensive.index.tolist()))
-    target_df = df.loc[combined_indices]
-
-    target_items = []
-    for _, row in target_df.iterrows():
-        target_items.append({
-            'category': row['카테고리'],
-            'product': row['상품명'],
-            'amount': int(row['금액']),
-            'score': float(row['후회점수']),
-            'necessity': int(row['필요도']),
-            'usage': int(row['사용빈도'])
-        })
-
-    # 카테고리별 지출
-    category_spending = df.groupby('카테고리')['금액'].sum().to_dict()
-
-    # 카테고리별 통계
-    category_stats = {}
-    for category in df['카테고리'].unique():
-        cat_df = df[df['카테고리'] == category]
-        category_stats[category] = {
-            'count': len(cat_df),
-            'amount': int(cat_df['금액'].sum())
-        }
-
-    return {
-        'target_items': target_items,
-        'category_spending': category_spending,
-        'category_breakdown': category_stats
-    }
-
-
-def display_savings_calculator(df):
+def display_savings_calculator(df, summary: dict = None):
     """카테고리별 저축 효과 시뮬레이터"""
     lang = get_lang()
     st.subheader(t('savings_sim', lang))
 
     # 데이터 기간 계산 (월 단위)
-    date_range = (df['날짜'].max() - df['날짜'].min()).days
+    if summary:
+        date_range = (summary['last_date'] - summary['first_date']).days
+    else:
+        date_range = (df['날짜'].max() - df['날짜'].min()).days
     months = max(date_range / 30, 1)
 
-    category_monthly = df.groupby('카테고리')['금액'].sum() / months
+    if summary:
+        category_monthly = summary['categories'].set_index('카테고리')['총_금액'] / months
+    else:
+        category_monthly = df.groupby('카테고리', observed=True)['금액'].sum() / months
 
     # 절감 비율 슬라이더
     reduction = st.slider(t('reduction_rate', lang), min_value=10, max_value=50, value=30, step=5)
@@ -1525,6 +1763,8 @@ def main():
         if db_user:
             st.session_state.db_user_id = db_user['id']
             st.session_state.is_admin = db_user.get('is_admin', False)
+            # 세션 프로필 캐시 채우기 (이후 rerun의 사용 횟수 확인은 DB 조회 없음)
+            cache_user_profile(user_email, db_user)
             # 세션 파일에도 db_user_id 저장
             user_info['db_user_id'] = db_user['id']
             save_session(user_info)
@@ -1580,6 +1820,7 @@ def main():
         new_lang = lang_options[selected_lang_label]
         if new_lang != st.session_state.language:
             st.session_state.language = new_lang
+            set_user_language(user_email, new_lang)
             st.rerun()
 
         lang = get_lang()
@@ -1614,6 +1855,9 @@ def main():
     # 분석 이력 (DB 연동 시)
     display_analysis_history()
 
+    # AI 호출 계측 요약 (관리자)
+    display_ai_telemetry()
+
     # 사용 횟수 소진 체크
     if not can_use:
         display_usage_limit_screen(remaining)
@@ -1636,24 +1880,36 @@ def main():
         csv_result = upload_csv()
         if csv_result is not None:
             processed_df = csv_result
-            # CSV 업로드 시 DB에도 저장
+            st.session_state.analysis_scope = None
+            # CSV 업로드 시 DB에도 저장 (같은 파일은 rerun마다 다시 저장하지 않음)
             user_id = st.session_state.get('db_user_id')
-            if user_id and DB_AVAILABLE and is_db_available():
-                save_purchases(user_id, csv_result, 'csv')
+            csv_hash = st.session_state.get('last_uploaded_file')
+            if (user_id and DB_AVAILABLE and is_db_available()
+                    and st.session_state.get('saved_csv_hash') != csv_hash):
+                if save_purchases(user_id, csv_result, 'csv'):
+                    st.session_state.saved_csv_hash = csv_hash
 
     if processed_df is not None:
         # 세션 상태에 저장
         st.session_state.processed_df = processed_df
 
-        # 새 분석인 경우에만 사용 횟수 증가 (중복 방지)
+        # 새 분석인 경우에만 사용 횟수 차감 (중복 방지)
+        # 다른 탭에서 먼저 마지막 횟수를 쓴 경우 차감이 거절되므로 여기서 막음 (관리자 제외)
         if st.session_state.get('new_analysis', False):
-            increment_usage_count(user_email)
             st.session_state.new_analysis = False
+            allowed, remaining, _ = increment_usage_count(user_email)
+            if not allowed and not st.session_state.get('is_admin', False):
+                st.session_state.processed_df = None
+                display_usage_limit_screen(remaining)
+                return
 
     # 데이터가 있으면 분석 표시
     if st.session_state.processed_df is not None:
         df = st.session_state.processed_df
 
+        # 누적 구매 분석이면 카테고리/월별 집계는 서버에서 받음
+        summary = get_purchase_summary()
+
         st.divider()
 
         # 원본 데이터 표시
@@ -1662,12 +1918,12 @@ def main():
         st.divider()
 
         # 카테고리 분석
-        display_category_analysis(df)
+        display_category_analysis(df, summary)
 
         st.divider()
 
         # 추가 차트
-        display_additional_charts(df)
+        display_additional_charts(df, summary)
 
         st.divider()
 
@@ -1682,7 +1938,7 @@ def main():
         st.divider()
 
         # AI 통합 분석 (심리 분석 + 스마트 인사이트)
-        display_ai_analysis(df)
+        display_ai_analysis(df, summary)
 
         st.divider()
 
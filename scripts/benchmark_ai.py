@@ -0,0 +1,158 @@
+"""
+AI 경로 부하 벤치마크
+
+로컬 가짜 OpenAI 서버를 띄우고 N개 세션이 동시에 OpenAIService를 호출하여
+호출별 지연 시간 p50/p95/p99와 처리량을 측정합니다. 실제 API 없이
+스케줄러 설정(OPENAI_MAX_CONCURRENCY 등), 프롬프트 예산, 스트리밍 경로를 조정할 때 사용합니다.
+
+사용법:
+    python scripts/benchmark_ai.py --sessions 20 --calls 5 --mode both \\
+        --latency 0.3 --token-delay 0.005 --completion-tokens 300 --error-rate 0.05
+
+    --mode feedback  : generate_ai_feedback
+    --mode insights  : generate_smart_insights
+    --mode both      : 두 호출을 번갈아
+    --mode stream    : stream_ai_feedback (첫 토큰 지연 TTFT도 측정)
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.fake_openai_server import start_server, add_server_arguments
+
+
+def _sample_inputs(seed: int) -> Dict:
+    """세션/호출마다 다른 프롬프트가 되도록 만든 분석 입력"""
+    rng = np.random.default_rng(seed)
+    categories = ['식비', '의류', '전자제품', '카페', '취미', '교통', '생활용품', '구독']
+    target_items = [
+        {
+            'category': str(rng.choice(categories)),
+            'product': f'상품{i}',
+            'amount': int(rng.integers(5, 500)) * 1000,
+            'score': float(rng.uniform(0, 100)),
+            'necessity': int(rng.integers(1, 6)),
+            'usage': int(rng.integers(1, 6))
+        }
+        for i in range(8)
+    ]
+    category_breakdown = {
+        cat: {'count': int(rng.integers(1, 20)), 'amount': int(rng.integers(10, 1000)) * 1000}
+        for cat in categories
+    }
+    return {
+        'overall_score': float(rng.uniform(0, 100)),
+        'total_purchases': sum(v['count'] for v in category_breakdown.values()),
+        'total_amount': sum(v['amount'] for v in category_breakdown.values()),
+        'regret_ratio': float(rng.uniform(0, 60)),
+        'main_cause': '충동 구매',
+        'top_regret_items': sorted(target_items, key=lambda x: x['score'], reverse=True)[:5],
+        'target_items': target_items,
+        'category_spending': {cat: v['amount'] for cat, v in category_breakdown.items()},
+        'category_breakdown': category_breakdown
+    }
+
+
+def _percentiles(values: List[float]) -> str:
+    if not values:
+        return '-'
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return f"p50 {p50 * 1000:.0f}ms / p95 {p95 * 1000:.0f}ms / p99 {p99 * 1000:.0f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AI 경로 부하 벤치마크')
+    parser.add_argument('--sessions', type=int, default=10, help='동시 세션 수')
+    parser.add_argument('--calls', type=int, default=5, help='세션당 호출 수')
+    parser.add_argument('--mode', choices=['feedback', 'insights', 'both', 'stream'], default='both')
+    parser.add_argument('--max-concurrency', type=int, default=None,
+                        help='스케줄러 동시 실행 상한 (기본: OPENAI_MAX_CONCURRENCY)')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='스케줄러 초당 요청 수 (0이면 제한 없음)')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server, state = start_server(0, args.latency, args.error_rate, args.server_error_rate,
+                                 args.token_delay, args.completion_tokens)
+
+    # 서비스 생성 전에 환경 설정 (응답 캐시는 꺼서 매 호출이 서버까지 가도록)
+    os.environ['OPENAI_BASE_URL'] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ['OPENAI_API_KEY'] = 'sk-fake-benchmark'
+    os.environ['OPENAI_CACHE_TTL'] = '0'
+    os.environ['OPENAI_RATE_PER_SECOND'] = str(args.rate)
+    if args.max_concurrency:
+        os.environ['OPENAI_MAX_CONCURRENCY'] = str(args.max_concurrency)
+
+    from utils.openai_service import OpenAIService
+
+    service = OpenAIService()
+
+    def call(session_id: int, call_id: int) -> Dict:
+        inputs = _sample_inputs(session_id * 10_000 + call_id)
+        mode = args.mode
+        if mode == 'both':
+            mode = 'feedback' if call_id % 2 == 0 else 'insights'
+
+        started = time.perf_counter()
+        ttft = None
+        if mode == 'feedback':
+            result = service.generate_ai_feedback(**service.feedback_inputs(inputs))
+        elif mode == 'insights':
+            result = service.generate_smart_insights(**service.insights_inputs(inputs))
+        else:
+            stream = service.stream_ai_feedback(**service.feedback_inputs(inputs))
+            for _ in stream:
+                pass
+            result = stream.result()
+            ttft = result.get('ttft')
+
+        return {
+            'success': result['success'],
+            'latency': time.perf_counter() - started,
+            'ttft': ttft,
+            'usage': result.get('usage') or {}
+        }
+
+    def session(session_id: int) -> List[Dict]:
+        return [call(session_id, call_id) for call_id in range(args.calls)]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        records = [r for rs in executor.map(session, range(args.sessions)) for r in rs]
+    elapsed = time.perf_counter() - started
+
+    server.shutdown()
+
+    ok = [r for r in records if r['success']]
+    latencies = [r['latency'] for r in ok]
+    ttfts = [r['ttft'] for r in ok if r['ttft'] is not None]
+    prompt_tokens = sum(r['usage'].get('prompt_tokens', 0) for r in ok)
+    completion_tokens = sum(r['usage'].get('completion_tokens', 0) for r in ok)
+    server_stats = state.snapshot()
+    scheduler_stats = service.scheduler.stats()
+
+    print(f"모드 {args.mode} / 세션 {args.sessions} × 호출 {args.calls} = {len(records)}건, "
+          f"소요 {elapsed:.2f}초")
+    print(f"  성공: {len(ok)}/{len(records)}, 처리량: {len(ok) / elapsed:.2f} 호출/초")
+    print(f"  지연: {_percentiles(latencies)}")
+    if ttfts:
+        print(f"  첫 토큰: {_percentiles(ttfts)}")
+    print(f"  토큰: 입력 {prompt_tokens:,} / 출력 {completion_tokens:,} "
+          f"(호출당 입력 {prompt_tokens / max(len(ok), 1):.0f})")
+    print(f"  서버: 요청 {server_stats['requests']}, 오류 {server_stats['errors']}, "
+          f"최대 동시 {server_stats['max_in_flight']}")
+    print(f"  스케줄러: 재시도 {scheduler_stats['retries']}, 실패 {scheduler_stats['failed']}, "
+          f"공유 {scheduler_stats['coalesced']}, 속도 제한 대기 {scheduler_stats['rate_wait_seconds']:.2f}초")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""
+로컬 OpenAI 호환 가짜 서버
+
+실제 API 없이 OpenAIService 경로를 시험/측정하기 위한 /v1/chat/completions 대역입니다.
+- 일반 응답 + 스트리밍(SSE) 응답, stream_options.include_usage 시 마지막 usage 청크
+- json_schema 응답 형식 요청 시 스키마 필드를 채운 JSON 반환
+- 첫 토큰 지연, 토큰당 지연, 출력 토큰 수, 429/500 오류 비율 설정
+- 동시 처리 중인 요청 수 / 총 요청 수 집계 (GET /stats)
+
+사용법:
+    python scripts/fake_openai_server.py --port 8800 --latency 0.3 --token-delay 0.01 \\
+        --completion-tokens 300 --error-rate 0.05 --server-error-rate 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:8800/v1 OPENAI_API_KEY=sk-fake streamlit run app.py
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+
+class FakeOpenAIState:
+    """서버 설정 + 집계 (요청 스레드 간 공유)"""
+
+    def __init__(self, latency: float = 0.2, error_rate: float = 0.0,
+                 server_error_rate: float = 0.0, token_delay: float = 0.0,
+                 completion_tokens: int = 40):
+        """
+        Args:
+            latency: 첫 토큰까지 지연 (초)
+            error_rate: 429 응답 비율 (0~1)
+            server_error_rate: 500 응답 비율 (0~1)
+            token_delay: 토큰당 추가 지연 (초, 스트리밍/일반 모두 적용)
+            completion_tokens: 응답 토큰 수
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.server_error_rate = server_error_rate
+        self.token_delay = token_delay
+        self.completion_tokens = completion_tokens
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.streams = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def enter(self, stream: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.streams += int(stream)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'streams': self.streams,
+                'errors': self.errors,
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight
+            }
+
+
+def _prompt_tokens(request: Dict) -> int:
+    """요청 메시지 토큰 수 근사 (ASCII 4글자당 1, 그 외 글자당 1)"""
+    total = 0
+    for message in request.get('messages', []):
+        text = message.get('content', '') or ''
+        ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+        total += ascii_chars // 4 + (len(text) - ascii_chars) + 4
+    return max(total, 1)
+
+
+def _completion_pieces(request: Dict, tokens: int) -> List[str]:
+    """응답 조각 (조각 1개 = 토큰 1개로 취급)"""
+    words = [f"토큰{i} " for i in range(tokens)]
+    response_format = request.get('response_format') or {}
+    if response_format.get('type') != 'json_schema':
+        return words
+
+    # 스키마의 문자열 필드를 나눠 채운 JSON을 조각으로 분할
+    schema = response_format.get('json_schema', {}).get('schema', {})
+    fields = list(schema.get('properties', {})) or ['content']
+    per_field = max(tokens // len(fields), 1)
+    payload = {
+        field: ''.join(words[i * per_field:(i + 1) * per_field]).strip()
+        for i, field in enumerate(fields)
+    }
+    text = json.dumps(payload, ensure_ascii=False)
+    size = max(len(text) // max(tokens, 1), 1)
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _usage(request: Dict, completion_tokens: int) -> Dict:
+    prompt_tokens = _prompt_tokens(request)
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens
+    }
+
+
+def make_handler(state: FakeOpenAIState):
+    """상태를 공유하는 요청 핸들러 클래스 생성"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, body: Dict, headers: Dict = None) -> None:
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _send_event(self, body) -> None:
+            data = body if isinstance(body, str) else json.dumps(body, ensure_ascii=False)
+            chunk = f"data: {data}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(chunk):X}\r\n".encode('ascii') + chunk + b"\r\n")
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/stats':
+                self._send_json(200, state.snapshot())
+            else:
+                self._send_json(404, {'error': {'message': 'not found'}})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send_json(404, {'error': {'message': 'not found'}})
+                return
+
+            stream = bool(request.get('stream'))
+            state.enter(stream)
+            try:
+                time.sleep(state.latency)
+
+                roll = random.random()
+                if roll < state.error_rate:
+                    state.record_error()
+                    self._send_json(429, {'error': {'message': 'Rate limit reached (fake)',
+                                                    'type': 'rate_limit_error'}},
+                                    headers={'retry-after': '0.2'})
+                    return
+                if roll < state.error_rate + state.server_error_rate:
+                    state.record_error()
+                    self._send_json(500, {'error': {'message': 'Internal error (fake)',
+                                                    'type': 'server_error'}})
+                    return
+
+                max_tokens = request.get('max_tokens') or state.completion_tokens
+                pieces = _completion_pieces(request, min(state.completion_tokens, max_tokens))
+                if stream:
+                    self._stream(request, pieces)
+                else:
+                    self._complete(request, pieces)
+            finally:
+                state.leave()
+
+        def _base(self, request: Dict, kind: str) -> Dict:
+            return {
+                'id': f'chatcmpl-fake-{time.time_ns()}',
+                'object': kind,
+                'created': int(time.time()),
+                'model': request.get('model', 'gpt-4o-mini')
+            }
+
+        def _complete(self, request: Dict, pieces: List[str]) -> None:
+            time.sleep(state.token_delay * len(pieces))
+            body = self._base(request, 'chat.completion')
+            body['choices'] = [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': ''.join(pieces)},
+                'finish_reason': 'stop'
+            }]
+            body['usage'] = _usage(request, len(pieces))
+            self._send_json(200, body)
+
+        def _stream(self, request: Dict, pieces: List[str]) -> None:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+            include_usage = (request.get('stream_options') or {}).get('include_usage')
+            base = self._base(request, 'chat.completion.chunk')
+
+            self._send_event(dict(base, choices=[{
+                'index': 0, 'delta': {'role': 'assistant', 'content': ''}, 'finish_reason': None
+            }], usage=None))
+            for piece in pieces:
+                time.sleep(state.token_delay)
+                self._send_event(dict(base, choices=[{
+                    'index': 0, 'delta': {'content': piece}, 'finish_reason': None
+                }], usage=None))
+            self._send_event(dict(base, choices=[{
+                'index': 0, 'delta': {}, 'finish_reason': 'stop'
+            }], usage=None))
+
+            # include_usage: choices 없이 usage만 담은 마지막 청크
+            if include_usage:
+                self._send_event(dict(base, choices=[], usage=_usage(request, len(pieces))))
+
+            self._send_event('[DONE]')
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_server(port: int = 0, latency: float = 0.2, error_rate: float = 0.0,
+                 server_error_rate: float = 0.0, token_delay: float = 0.0,
+                 completion_tokens: int = 40):
+    """
+    백그라운드 스레드에서 서버 시작
+
+    Args:
+        port: 포트 (0이면 임의 빈 포트)
+        latency: 첫 토큰까지 지연 (초)
+        error_rate: 429 응답 비율 (0~1)
+        server_error_rate: 500 응답 비율 (0~1)
+        token_delay: 토큰당 지연 (초)
+        completion_tokens: 응답 토큰 수
+
+    Returns:
+        (server, state) - base URL은 f"http://127.0.0.1:{server.server_port}/v1"
+    """
+    state = FakeOpenAIState(latency=latency, error_rate=error_rate,
+                            server_error_rate=server_error_rate,
+                            token_delay=token_delay, completion_tokens=completion_tokens)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """서버 설정 인자 (벤치마크 스크립트와 공용)"""
+    parser.add_argument('--latency', type=float, default=0.2, help='첫 토큰까지 지연 (초)')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='토큰당 지연 (초)')
+    parser.add_argument('--completion-tokens', type=int, default=40, help='응답 토큰 수')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='429 응답 비율 (0~1)')
+    parser.add_argument('--server-error-rate', type=float, default=0.0, help='500 응답 비율 (0~1)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='로컬 OpenAI 호환 가짜 서버')
+    parser.add_argument('--port', type=int, default=8800)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server, _ = start_server(args.port, args.latency, args.error_rate, args.server_error_rate,
+                             args.token_delay, args.completion_tokens)
+    print(f"가짜 OpenAI 서버: http://127.0.0.1:{server.server_port}/v1 (Ctrl+C 종료)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+AI 분석 배치 사전 생성 실행 스크립트
+
+사용법:
+    # 1. 대상 사용자 요청 JSONL 작성
+    python scripts/pregenerate_insights.py prepare --out data/batch/requests.jsonl
+
+    # 2. OpenAI Batch API 제출 → batch id 출력
+    python scripts/pregenerate_insights.py submit --requests data/batch/requests.jsonl
+
+    # 3. 완료 후 결과 수집 및 analyses 저장
+    python scripts/pregenerate_insights.py collect --batch-id batch_xxx --requests data/batch/requests.jsonl
+
+    # 로컬 대역 서버로 전체 흐름 시험 (prepare → 직접 실행 → 저장)
+    OPENAI_BASE_URL=http://127.0.0.1:8800/v1 python scripts/pregenerate_insights.py local
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.openai_service import get_openai_service
+from utils.batch_insights import (
+    prepare_batch, submit_batch, collect_batch, run_batch_locally, apply_batch_output
+)
+
+DEFAULT_REQUESTS_PATH = Path(__file__).parent.parent / "data" / "batch" / "requests.jsonl"
+
+
+def _load_manifest(requests_path: Path) -> dict:
+    with open(Path(requests_path).with_suffix('.manifest.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AI 분석 배치 사전 생성')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    prepare = sub.add_parser('prepare', help='요청 JSONL 작성')
+    prepare.add_argument('--out', type=Path, default=DEFAULT_REQUESTS_PATH)
+    prepare.add_argument('--limit', type=int, default=500)
+
+    submit = sub.add_parser('submit', help='Batch API 제출')
+    submit.add_argument('--requests', type=Path, default=DEFAULT_REQUESTS_PATH)
+
+    collect = sub.add_parser('collect', help='결과 수집 및 저장')
+    collect.add_argument('--batch-id', required=True)
+    collect.add_argument('--requests', type=Path, default=DEFAULT_REQUESTS_PATH)
+
+    local = sub.add_parser('local', help='로컬 대역 서버로 직접 실행')
+    local.add_argument('--out', type=Path, default=DEFAULT_REQUESTS_PATH)
+    local.add_argument('--limit', type=int, default=500)
+
+    args = parser.parse_args()
+
+    service = get_openai_service()
+    if service is None:
+        print("OPENAI_API_KEY가 설정되지 않았습니다.")
+        sys.exit(1)
+
+    if args.command in ('prepare', 'local'):
+        requests_path, manifest_path, user_count = prepare_batch(service, args.out, args.limit)
+        print(f"요청 작성: {requests_path} (사용자 {user_count}명)")
+        if args.command == 'prepare' or user_count == 0:
+            return
+        output = run_batch_locally(service, requests_path)
+        # 직접 실행한 요청은 일반 호출 가격으로 과금
+        saved, skipped = apply_batch_output(output, _load_manifest(requests_path),
+                                            batch_pricing=False)
+        print(f"분석 저장: {saved}건 (불완전 결과로 건너뜀: {skipped}명)")
+
+    elif args.command == 'submit':
+        batch_id = submit_batch(service.client, args.requests)
+        print(f"Batch 제출: {batch_id}")
+
+    elif args.command == 'collect':
+        output = collect_batch(service.client, args.batch_id)
+        if output is None:
+            return
+        saved, skipped = apply_batch_output(output, _load_manifest(args.requests))
+        print(f"분석 저장: {saved}건 (불완전 결과로 건너뜀: {skipped}명)")
+
+
+if __name__ == '__main__':
+    main()
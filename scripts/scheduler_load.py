@@ -0,0 +1,79 @@
+"""
+요청 스케줄러 부하 시험
+
+가짜 OpenAI 서버를 띄우고 여러 세션이 동시에 generate_ai_feedback을 호출하는 상황을 흉내 냅니다.
+서버가 관측한 최대 동시 요청 수가 OPENAI_MAX_CONCURRENCY를 넘지 않는지,
+429 응답이 재시도로 회복되는지, 같은 프롬프트 요청이 합쳐지는지 확인합니다.
+
+사용법:
+    python scripts/scheduler_load.py --sessions 40 --datasets 5 --error-rate 0.2
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.fake_openai_server import start_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OpenAI 요청 스케줄러 부하 시험')
+    parser.add_argument('--sessions', type=int, default=40, help='동시 세션 수')
+    parser.add_argument('--datasets', type=int, default=5, help='서로 다른 프롬프트 수')
+    parser.add_argument('--latency', type=float, default=0.3, help='가짜 서버 응답 지연 (초)')
+    parser.add_argument('--error-rate', type=float, default=0.2, help='가짜 서버 429 비율')
+    args = parser.parse_args()
+
+    server, state = start_server(0, args.latency, args.error_rate)
+
+    # 서비스 생성 전에 환경 설정 (응답 캐시는 꺼서 스케줄러만 측정)
+    os.environ['OPENAI_BASE_URL'] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ['OPENAI_API_KEY'] = 'sk-fake-load-test'
+    os.environ['OPENAI_CACHE_TTL'] = '0'
+
+    from utils.openai_service import OpenAIService
+
+    service = OpenAIService()
+
+    def session(i: int):
+        started = time.perf_counter()
+        result = service.generate_ai_feedback(
+            overall_score=40 + i % args.datasets,
+            total_purchases=20,
+            total_amount=500000,
+            regret_ratio=25.0,
+            main_cause='충동 구매',
+            top_regret_items=[],
+            category_breakdown={'식비': {'count': 10, 'amount': 200000}}
+        )
+        return result['success'], time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        results = list(executor.map(session, range(args.sessions)))
+    elapsed = time.perf_counter() - started
+
+    server.shutdown()
+
+    latencies = sorted(latency for _, latency in results)
+    succeeded = sum(1 for ok, _ in results if ok)
+    server_stats = state.snapshot()
+    scheduler_stats = service.scheduler.stats()
+
+    print(f"세션 {args.sessions}개 / 프롬프트 {args.datasets}종 / 소요 {elapsed:.2f}초")
+    print(f"  성공: {succeeded}/{args.sessions}")
+    print(f"  지연 중앙값: {latencies[len(latencies) // 2]:.2f}초, 최대: {latencies[-1]:.2f}초")
+    print(f"  서버 수신 요청: {server_stats['requests']} (429: {server_stats['errors']})")
+    print(f"  서버 최대 동시 요청: {server_stats['max_in_flight']} "
+          f"(상한 {service.scheduler.max_concurrency})")
+    print(f"  스케줄러: 제출 {scheduler_stats['submitted']}, 공유 {scheduler_stats['coalesced']}, "
+          f"재시도 {scheduler_stats['retries']}, 실패 {scheduler_stats['failed']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+-- ============================================
+-- (선택) purchases 월별 범위 파티셔닝 마이그레이션
+-- supabase_schema.sql 적용 후, 구매 이력이 수백만 건 이상일 때 SQL Editor에서 한 번 실행
+--
+-- - purchase_date 기준 월 단위 파티션 → 기간 조회는 해당 월 파티션만 스캔 (partition pruning)
+-- - 인덱스/트리거/RLS 정책은 부모 테이블에 정의 → 모든 파티션에 적용
+-- - 파티션 키가 PK/유니크 인덱스에 포함되어야 하므로 PK는 (id, purchase_date),
+--   중복 방지 키는 (user_id, purchase_date, row_hash) (앱 upsert 키와 동일)
+-- - id만으로 삭제하면 모든 파티션의 PK 인덱스를 확인하므로, 월 파티션 수는
+--   create_purchase_partitions 범위로 필요한 만큼만 유지
+-- ============================================
+
+BEGIN;
+
+-- 1. 기존 테이블 이름 변경 (인덱스 이름도 바꿔 새 테이블용 이름 확보)
+ALTER TABLE purchases RENAME TO purchases_unpartitioned;
+ALTER INDEX IF EXISTS idx_purchases_user_date_id RENAME TO idx_purchases_unpartitioned_user_date_id;
+ALTER INDEX IF EXISTS idx_purchases_user_created RENAME TO idx_purchases_unpartitioned_user_created;
+ALTER INDEX IF EXISTS idx_purchases_user_date_row_hash RENAME TO idx_purchases_unpartitioned_user_date_row_hash;
+
+-- 2. 파티션 부모 테이블 (컬럼은 supabase_schema.sql의 purchases와 동일, id 시퀀스는 이어서 사용)
+CREATE TABLE purchases (
+  id BIGINT NOT NULL DEFAULT nextval('purchases_id_seq'),
+  user_id UUID REFERENCES users(id) ON DELETE CASCADE NOT NULL,
+  purchase_date DATE NOT NULL,
+  category VARCHAR(100) NOT NULL,
+  product_name VARCHAR(255) DEFAULT '',
+  amount DECIMAL(12,0) NOT NULL DEFAULT 0,
+  thinking_days INTEGER,
+  repurchase_intent BOOLEAN,
+  necessity_score INTEGER CHECK (necessity_score BETWEEN 1 AND 5),
+  usage_frequency INTEGER CHECK (usage_frequency BETWEEN 1 AND 5),
+  source VARCHAR(20) DEFAULT 'manual',
+  row_hash VARCHAR(64),
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (id, purchase_date)
+) PARTITION BY RANGE (purchase_date);
+
+ALTER SEQUENCE purchases_id_seq OWNED BY purchases.id;
+
+CREATE INDEX idx_purchases_user_date_id ON purchases(user_id, purchase_date DESC, id DESC);
+CREATE INDEX idx_purchases_user_created ON purchases(user_id) INCLUDE (created_at);
+CREATE UNIQUE INDEX idx_purchases_user_date_row_hash ON purchases(user_id, purchase_date, row_hash);
+
+-- 3. 월 파티션 생성 함수 (이미 있는 월은 건너뜀)
+--    범위 밖 날짜는 기본 파티션으로 → 새 달이 오기 전에 미리 만들어 두기
+--    예) SELECT create_purchase_partitions(DATE '2027-01-01', DATE '2027-12-01');
+CREATE OR REPLACE FUNCTION create_purchase_partitions(p_from DATE, p_to DATE)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_month DATE := DATE_TRUNC('month', p_from)::DATE;
+  v_name TEXT;
+  v_created INTEGER := 0;
+BEGIN
+  WHILE v_month <= p_to LOOP
+    v_name := 'purchases_' || TO_CHAR(v_month, 'YYYY_MM');
+    IF TO_REGCLASS(v_name) IS NULL THEN
+      EXECUTE FORMAT(
+        'CREATE TABLE %I PARTITION OF purchases FOR VALUES FROM (%L) TO (%L)',
+        v_name, v_month, (v_month + INTERVAL '1 month')::DATE
+      );
+      v_created := v_created + 1;
+    END IF;
+    v_month := (v_month + INTERVAL '1 month')::DATE;
+  END LOOP;
+  RETURN v_created;
+END;
+$$;
+
+-- 기존 데이터 기간 + 앞으로 12개월
+SELECT create_purchase_partitions(
+  COALESCE((SELECT MIN(purchase_date) FROM purchases_unpartitioned), CURRENT_DATE),
+  (CURRENT_DATE + INTERVAL '12 months')::DATE
+);
+CREATE TABLE purchases_default PARTITION OF purchases DEFAULT;
+
+-- 4. 데이터 복사 (일별 집계는 이미 채워져 있으므로 집계 트리거는 복사 후 생성)
+-- (row_hash를 ALTER로 추가한 DB는 컬럼 순서가 다르므로 컬럼을 명시)
+INSERT INTO purchases (id, user_id, purchase_date, category, product_name, amount, thinking_days,
+                       repurchase_intent, necessity_score, usage_frequency, source, row_hash, created_at)
+SELECT id, user_id, purchase_date, category, product_name, amount, thinking_days,
+       repurchase_intent, necessity_score, usage_frequency, source, row_hash, created_at
+FROM purchases_unpartitioned;
+
+CREATE TRIGGER purchases_rollup_insert
+  AFTER INSERT ON purchases
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION rollup_purchases_inserted();
+
+CREATE TRIGGER purchases_rollup_delete
+  AFTER DELETE ON purchases
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION rollup_purchases_deleted();
+
+-- 5. RLS 정책 (supabase_schema.sql과 동일)
+ALTER TABLE purchases ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "purchases_select_own" ON purchases FOR SELECT USING (true);
+CREATE POLICY "purchases_insert" ON purchases FOR INSERT WITH CHECK (true);
+CREATE POLICY "purchases_delete_own" ON purchases FOR DELETE USING (true);
+
+-- 6. 옛 테이블 정리 (시퀀스는 새 테이블 소유로 옮겼으므로 함께 삭제되지 않음)
+--    뷰는 이름 변경된 옛 테이블을 가리키므로 삭제 후 같은 정의로 다시 생성
+DROP VIEW IF EXISTS users_pending_analysis;
+DROP TABLE purchases_unpartitioned;
+
+CREATE OR REPLACE VIEW users_pending_analysis AS
+SELECT u.id AS user_id,
+       u.language,
+       p.purchase_count,
+       p.last_purchase_at,
+       a.last_analysis_at
+FROM users u
+JOIN (
+  SELECT user_id, COUNT(*) AS purchase_count, MAX(created_at) AS last_purchase_at
+  FROM purchases
+  GROUP BY user_id
+) p ON p.user_id = u.id
+LEFT JOIN (
+  SELECT DISTINCT ON (user_id) user_id, created_at AS last_analysis_at,
+         purchase_count AS analyzed_count
+  FROM analyses
+  WHERE source = 'batch'
+  ORDER BY user_id, created_at DESC
+) a ON a.user_id = u.id
+WHERE a.last_analysis_at IS NULL
+   OR p.last_purchase_at > a.last_analysis_at
+   OR p.purchase_count <> a.analyzed_count;
+
+COMMIT;
+
+-- ============================================
+-- 완료! EXPLAIN으로 기간 조회가 해당 월 파티션만 스캔하는지 확인
+--   EXPLAIN SELECT * FROM purchases WHERE user_id = '...' AND purchase_date >= '2026-01-01';
+-- ============================================
@@ -19,9 +19,13 @@ CREATE TABLE IF NOT EXISTS users (
   language VARCHAR(10) DEFAULT 'ko',
   is_admin BOOLEAN DEFAULT FALSE,
   created_at TIMESTAMPTZ DEFAULT NOW(),
-  last_login TIMESTAMPTZ DEFAULT NOW()
+  last_login TIMESTAMPTZ DEFAULT NOW(),
+  purchase_count INTEGER NOT NULL DEFAULT 0
 );
 
+-- 저장된 구매 이력 수 (purchases 트리거가 유지 → 사이드바가 COUNT 쿼리 없이 프로필과 함께 읽음)
+ALTER TABLE users ADD COLUMN IF NOT EXISTS purchase_count INTEGER NOT NULL DEFAULT 0;
+
 -- 2. purchases 테이블 (구매 이력)
 CREATE TABLE IF NOT EXISTS purchases (
   id BIGSERIAL PRIMARY KEY,
@@ -35,11 +39,28 @@ CREATE TABLE IF NOT EXISTS purchases (
   necessity_score INTEGER CHECK (necessity_score BETWEEN 1 AND 5),
   usage_frequency INTEGER CHECK (usage_frequency BETWEEN 1 AND 5),
   source VARCHAR(20) DEFAULT 'manual',
+  row_hash VARCHAR(64),
   created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
-CREATE INDEX IF NOT EXISTS idx_purchases_user_id ON purchases(user_id);
-CREATE INDEX IF NOT EXISTS idx_purchases_date ON purchases(purchase_date);
+-- 구매 이력 조회: user_id 일치 + purchase_date 범위 + (purchase_date, id) 내림차순 keyset 페이지
+-- → 한 인덱스의 범위 스캔으로 정렬까지 처리 (정렬 단계 없음, LIMIT에서 멈춤)
+CREATE INDEX IF NOT EXISTS idx_purchases_user_date_id ON purchases(user_id, purchase_date DESC, id DESC);
+-- 사용자별 건수 / 마지막 구매 시각 (get_purchase_count, users_pending_analysis)
+-- → 테이블을 읽지 않는 index-only scan
+CREATE INDEX IF NOT EXISTS idx_purchases_user_created ON purchases(user_id) INCLUDE (created_at);
+-- 단일 컬럼 인덱스는 위 두 인덱스로 대체 (purchase_date 단독 조건 쿼리 없음)
+DROP INDEX IF EXISTS idx_purchases_user_id;
+DROP INDEX IF EXISTS idx_purchases_date;
+
+-- CSV 중복 저장 방지: 자연키(사용자, 날짜, 카테고리, 상품명, 금액) 해시
+-- 기존 DB는 컬럼 추가 후 인덱스 생성 (수동 입력 행은 row_hash NULL → 제약 대상 아님)
+-- 해시에 날짜가 포함되므로 purchase_date를 키에 넣어도 중복 판정은 같고,
+-- 월별 파티션 테이블(supabase_partitioning.sql)에서도 같은 upsert 키를 쓸 수 있음
+ALTER TABLE purchases ADD COLUMN IF NOT EXISTS row_hash VARCHAR(64);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_purchases_user_date_row_hash
+  ON purchases(user_id, purchase_date, row_hash);
+DROP INDEX IF EXISTS idx_purchases_user_row_hash;
 
 -- 3. analyses 테이블 (분석 이력)
 CREATE TABLE IF NOT EXISTS analyses (
@@ -51,10 +72,32 @@ CREATE TABLE IF NOT EXISTS analyses (
   high_regret_count INTEGER DEFAULT 0,
   psychology_analysis TEXT,
   smart_insights TEXT,
+  psychology_preview TEXT,
+  insights_preview TEXT,
+  source VARCHAR(20) DEFAULT 'interactive',
+  language VARCHAR(10),
   created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- 배치 사전 생성 결과 구분 (source = 'batch')
+ALTER TABLE analyses ADD COLUMN IF NOT EXISTS source VARCHAR(20) DEFAULT 'interactive';
+ALTER TABLE analyses ADD COLUMN IF NOT EXISTS language VARCHAR(10);
+-- 사이드바 이력 목록용 미리보기 (앞 300자, 잘렸으면 '…') - 목록은 본문 없이 조회
+ALTER TABLE analyses ADD COLUMN IF NOT EXISTS psychology_preview TEXT;
+ALTER TABLE analyses ADD COLUMN IF NOT EXISTS insights_preview TEXT;
+UPDATE analyses
+   SET psychology_preview = CASE WHEN LENGTH(psychology_analysis) > 300
+                                 THEN LEFT(psychology_analysis, 300) || '…'
+                                 ELSE COALESCE(psychology_analysis, '') END,
+       insights_preview = CASE WHEN LENGTH(smart_insights) > 300
+                               THEN LEFT(smart_insights, 300) || '…'
+                               ELSE COALESCE(smart_insights, '') END
+ WHERE psychology_preview IS NULL AND insights_preview IS NULL;
+
 CREATE INDEX IF NOT EXISTS idx_analyses_user_id ON analyses(user_id);
+-- users_pending_analysis의 사용자별 마지막 배치 분석 조회
+CREATE INDEX IF NOT EXISTS idx_analyses_batch_user_created
+  ON analyses(user_id, created_at DESC) WHERE source = 'batch';
 
 -- 4. ai_usage_logs 테이블 (API 사용 로그)
 CREATE TABLE IF NOT EXISTS ai_usage_logs (
@@ -66,9 +109,40 @@ CREATE TABLE IF NOT EXISTS ai_usage_logs (
   completion_tokens INTEGER DEFAULT 0,
   total_tokens INTEGER DEFAULT 0,
   estimated_cost_usd DECIMAL(10,6) DEFAULT 0,
+  cached BOOLEAN DEFAULT FALSE,
+  baseline_prompt_tokens INTEGER,
+  model VARCHAR(50),
+  language VARCHAR(5),
+  latency_ms INTEGER,
+  ttft_ms INTEGER,
+  retries INTEGER DEFAULT 0,
   created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- 기존 DB는 컬럼 추가 (응답 캐시 적중 호출 표시, 비용 0)
+ALTER TABLE ai_usage_logs ADD COLUMN IF NOT EXISTS cached BOOLEAN DEFAULT FALSE;
+-- 통합(combined) 호출의 개별 호출 대비 예상 입력 토큰 (절감량 비교용)
+ALTER TABLE ai_usage_logs ADD COLUMN IF NOT EXISTS baseline_prompt_tokens INTEGER;
+-- 호출 계측 (모델/언어, 전체 지연, 첫 토큰 지연, 스케줄러 재시도 횟수)
+ALTER TABLE ai_usage_logs ADD COLUMN IF NOT EXISTS model VARCHAR(50);
+ALTER TABLE ai_usage_logs ADD COLUMN IF NOT EXISTS language VARCHAR(5);
+ALTER TABLE ai_usage_logs ADD COLUMN IF NOT EXISTS latency_ms INTEGER;
+ALTER TABLE ai_usage_logs ADD COLUMN IF NOT EXISTS ttft_ms INTEGER;
+ALTER TABLE ai_usage_logs ADD COLUMN IF NOT EXISTS retries INTEGER DEFAULT 0;
+
+-- 5. purchase_daily_rollups 테이블 (사용자·날짜·카테고리별 구매 집계, purchases 트리거가 유지)
+CREATE TABLE IF NOT EXISTS purchase_daily_rollups (
+  user_id UUID REFERENCES users(id) ON DELETE CASCADE NOT NULL,
+  day DATE NOT NULL,
+  category VARCHAR(100) NOT NULL,
+  total_amount DECIMAL(14,0) NOT NULL DEFAULT 0,
+  purchase_count INTEGER NOT NULL DEFAULT 0,
+  max_amount DECIMAL(12,0) NOT NULL DEFAULT 0,
+  necessity_sum INTEGER NOT NULL DEFAULT 0,
+  usage_sum INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, day, category)
+);
+
 -- ============================================
 -- Row Level Security (RLS) 정책
 -- 각 유저는 자신의 데이터만 접근 가능
@@ -79,6 +153,7 @@ ALTER TABLE users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE purchases ENABLE ROW LEVEL SECURITY;
 ALTER TABLE analyses ENABLE ROW LEVEL SECURITY;
 ALTER TABLE ai_usage_logs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE purchase_daily_rollups ENABLE ROW LEVEL SECURITY;
 
 -- 서비스 키(service_role)로 접근 시 모든 데이터 접근 허용
 -- anon 키로는 RLS 정책 적용
@@ -101,6 +176,269 @@ CREATE POLICY "analyses_insert" ON analyses FOR INSERT WITH CHECK (true);
 CREATE POLICY "ai_usage_logs_select_own" ON ai_usage_logs FOR SELECT USING (true);
 CREATE POLICY "ai_usage_logs_insert" ON ai_usage_logs FOR INSERT WITH CHECK (true);
 
+-- purchase_daily_rollups: 본인 집계만 조회 (쓰기는 purchases 트리거가 SECURITY DEFINER로 수행)
+-- 서버(Streamlit)의 SUPABASE_KEY는 service_role 키여야 집계 조회/purchase_summary RPC가 RLS 없이 동작
+DROP POLICY IF EXISTS "purchase_daily_rollups_select_own" ON purchase_daily_rollups;
+CREATE POLICY "purchase_daily_rollups_select_own" ON purchase_daily_rollups
+  FOR SELECT USING (user_id = auth.uid());
+
+-- ============================================
+-- 배치 사전 생성 대상 (마지막 배치 분석 이후 구매 이력이 바뀐 사용자)
+-- 마지막 배치 분석보다 늦게 추가된 구매가 있거나, 건수가 달라진(삭제) 경우
+-- (화면 분석은 기간 필터가 적용된 건수를 저장하므로 비교 대상에서 제외)
+-- ============================================
+CREATE OR REPLACE VIEW users_pending_analysis AS
+SELECT u.id AS user_id,
+       u.language,
+       p.purchase_count,
+       p.last_purchase_at,
+       a.last_analysis_at
+FROM users u
+JOIN (
+  SELECT user_id, COUNT(*) AS purchase_count, MAX(created_at) AS last_purchase_at
+  FROM purchases
+  GROUP BY user_id
+) p ON p.user_id = u.id
+LEFT JOIN (
+  SELECT DISTINCT ON (user_id) user_id, created_at AS last_analysis_at,
+         purchase_count AS analyzed_count
+  FROM analyses
+  WHERE source = 'batch'
+  ORDER BY user_id, created_at DESC
+) a ON a.user_id = u.id
+WHERE a.last_analysis_at IS NULL
+   OR p.last_purchase_at > a.last_analysis_at
+   OR p.purchase_count <> a.analyzed_count;
+
+-- ============================================
+-- 일별 집계 + 사용자별 구매 건수 유지
+-- (purchases INSERT/DELETE 트리거 → purchase_daily_rollups, users.purchase_count)
+-- 문장 단위 트리거 + 전이 테이블: CSV 일괄 저장도 (날짜, 카테고리)/사용자별로 한 번씩만 반영
+-- SECURITY DEFINER: anon 키(모바일 앱)로 구매를 저장/삭제해도 집계 테이블 RLS에 막히지 않도록
+-- ============================================
+CREATE OR REPLACE FUNCTION rollup_purchases_inserted()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public
+AS $$
+BEGIN
+  INSERT INTO purchase_daily_rollups AS r
+         (user_id, day, category, total_amount, purchase_count, max_amount, necessity_sum, usage_sum)
+  SELECT user_id, purchase_date, category, SUM(amount), COUNT(*), MAX(amount),
+         COALESCE(SUM(necessity_score), 0), COALESCE(SUM(usage_frequency), 0)
+  FROM new_rows
+  GROUP BY user_id, purchase_date, category
+  ON CONFLICT (user_id, day, category) DO UPDATE
+    SET total_amount = r.total_amount + EXCLUDED.total_amount,
+        purchase_count = r.purchase_count + EXCLUDED.purchase_count,
+        max_amount = GREATEST(r.max_amount, EXCLUDED.max_amount),
+        necessity_sum = r.necessity_sum + EXCLUDED.necessity_sum,
+        usage_sum = r.usage_sum + EXCLUDED.usage_sum;
+
+  UPDATE users u
+     SET purchase_count = u.purchase_count + n.purchase_count
+  FROM (SELECT user_id, COUNT(*) AS purchase_count FROM new_rows GROUP BY user_id) n
+  WHERE u.id = n.user_id;
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION rollup_purchases_deleted()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public
+AS $$
+BEGIN
+  WITH removed AS (
+    SELECT user_id, purchase_date AS day, category, SUM(amount) AS total_amount,
+           COUNT(*) AS purchase_count, MAX(amount) AS max_amount,
+           COALESCE(SUM(necessity_score), 0) AS necessity_sum,
+           COALESCE(SUM(usage_frequency), 0) AS usage_sum
+    FROM old_rows
+    GROUP BY user_id, purchase_date, category
+  )
+  UPDATE purchase_daily_rollups r
+     SET total_amount = r.total_amount - d.total_amount,
+         purchase_count = r.purchase_count - d.purchase_count,
+         necessity_sum = r.necessity_sum - d.necessity_sum,
+         usage_sum = r.usage_sum - d.usage_sum,
+         -- 최대 금액 행이 지워졌을 때만 해당 (날짜, 카테고리)의 남은 행에서 다시 계산
+         max_amount = CASE
+           WHEN d.max_amount < r.max_amount THEN r.max_amount
+           ELSE COALESCE((SELECT MAX(p.amount) FROM purchases p
+                          WHERE p.user_id = d.user_id AND p.purchase_date = d.day
+                            AND p.category = d.category), 0)
+         END
+  FROM removed d
+  WHERE r.user_id = d.user_id AND r.day = d.day AND r.category = d.category;
+
+  DELETE FROM purchase_daily_rollups r
+  USING (SELECT DISTINCT user_id, purchase_date, category FROM old_rows) d
+  WHERE r.user_id = d.user_id AND r.day = d.purchase_date AND r.category = d.category
+    AND r.purchase_count <= 0;
+
+  UPDATE users u
+     SET purchase_count = GREATEST(u.purchase_count - d.purchase_count, 0)
+  FROM (SELECT user_id, COUNT(*) AS purchase_count FROM old_rows GROUP BY user_id) d
+  WHERE u.id = d.user_id;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS purchases_rollup_insert ON purchases;
+CREATE TRIGGER purchases_rollup_insert
+  AFTER INSERT ON purchases
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION rollup_purchases_inserted();
+
+DROP TRIGGER IF EXISTS purchases_rollup_delete ON purchases;
+CREATE TRIGGER purchases_rollup_delete
+  AFTER DELETE ON purchases
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION rollup_purchases_deleted();
+
+-- 기존 DB는 한 번 채우기 (트리거 생성 후 비어 있을 때만)
+INSERT INTO purchase_daily_rollups
+       (user_id, day, category, total_amount, purchase_count, max_amount, necessity_sum, usage_sum)
+SELECT user_id, purchase_date, category, SUM(amount), COUNT(*), MAX(amount),
+       COALESCE(SUM(necessity_score), 0), COALESCE(SUM(usage_frequency), 0)
+FROM purchases
+WHERE NOT EXISTS (SELECT 1 FROM purchase_daily_rollups)
+GROUP BY user_id, purchase_date, category;
+
+-- 구매 건수 다시 세기 (트리거 생성 전에 저장된 구매 반영, 다시 실행해도 결과 동일)
+UPDATE users u
+   SET purchase_count = COALESCE((SELECT COUNT(*) FROM purchases p WHERE p.user_id = u.id), 0)
+WHERE u.purchase_count IS DISTINCT FROM
+      COALESCE((SELECT COUNT(*) FROM purchases p WHERE p.user_id = u.id), 0);
+
+-- ============================================
+-- 구매 이력 집계 (RPC) - 대시보드 요약을 원본 행 없이 그리기 위한 사용자·기간별 집계
+-- purchase_daily_rollups에서 읽으므로 비용은 구매 건수가 아니라 구매한 날짜 수에 비례
+-- p_from / p_to: 구매일 범위 (NULL이면 제한 없음)
+-- ============================================
+
+-- 카테고리별: 총액, 평균 금액, 건수, 평균 필요도/사용빈도, 첫/마지막 구매일 (총액 내림차순)
+CREATE OR REPLACE FUNCTION purchase_category_summary(p_user_id UUID, p_from DATE DEFAULT NULL,
+                                                     p_to DATE DEFAULT NULL)
+RETURNS TABLE (category VARCHAR, total_amount NUMERIC, avg_amount NUMERIC, purchase_count BIGINT,
+               avg_necessity NUMERIC, avg_usage NUMERIC, first_date DATE, last_date DATE)
+LANGUAGE sql STABLE
+AS $$
+  SELECT r.category,
+         SUM(r.total_amount),
+         ROUND(SUM(r.total_amount) / SUM(r.purchase_count), 1),
+         SUM(r.purchase_count),
+         ROUND(SUM(r.necessity_sum)::NUMERIC / SUM(r.purchase_count), 1),
+         ROUND(SUM(r.usage_sum)::NUMERIC / SUM(r.purchase_count), 1),
+         MIN(r.day),
+         MAX(r.day)
+  FROM purchase_daily_rollups r
+  WHERE r.user_id = p_user_id
+    AND (p_from IS NULL OR r.day >= p_from)
+    AND (p_to IS NULL OR r.day <= p_to)
+  GROUP BY r.category
+  ORDER BY 2 DESC;
+$$;
+
+-- 월별: 'YYYY-MM', 총액, 건수 (월 오름차순)
+CREATE OR REPLACE FUNCTION purchase_monthly_summary(p_user_id UUID, p_from DATE DEFAULT NULL,
+                                                    p_to DATE DEFAULT NULL)
+RETURNS TABLE (month TEXT, total_amount NUMERIC, purchase_count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+  SELECT TO_CHAR(DATE_TRUNC('month', r.day), 'YYYY-MM'),
+         SUM(r.total_amount),
+         SUM(r.purchase_count)
+  FROM purchase_daily_rollups r
+  WHERE r.user_id = p_user_id
+    AND (p_from IS NULL OR r.day >= p_from)
+    AND (p_to IS NULL OR r.day <= p_to)
+  GROUP BY 1
+  ORDER BY 1;
+$$;
+
+-- 두 집계를 한 번의 왕복으로: {categories: [...], monthly: [...]}
+CREATE OR REPLACE FUNCTION purchase_summary(p_user_id UUID, p_from DATE DEFAULT NULL,
+                                            p_to DATE DEFAULT NULL)
+RETURNS JSON
+LANGUAGE sql STABLE
+AS $$
+  SELECT json_build_object(
+    'categories', COALESCE((SELECT json_agg(c) FROM purchase_category_summary(p_user_id, p_from, p_to) c), '[]'::json),
+    'monthly', COALESCE((SELECT json_agg(m) FROM purchase_monthly_summary(p_user_id, p_from, p_to) m), '[]'::json)
+  );
+$$;
+
+-- ============================================
+-- 무료 사용 횟수 확인/차감 (RPC: use_quota)
+-- 조건부 UPDATE 한 문장으로 확인+차감 → 여러 탭에서 동시에 호출해도 한도를 넘지 않음
+-- p_consume = FALSE면 조회만
+-- ============================================
+CREATE OR REPLACE FUNCTION use_quota(p_email TEXT, p_limit INTEGER DEFAULT 5,
+                                     p_consume BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (allowed BOOLEAN, remaining INTEGER, is_subscribed BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_count INTEGER;
+  v_subscribed BOOLEAN;
+BEGIN
+  IF p_consume THEN
+    UPDATE users u
+       SET usage_count = COALESCE(u.usage_count, 0) + 1
+     WHERE u.email = p_email
+       AND NOT COALESCE(u.is_subscribed, FALSE)
+       AND COALESCE(u.usage_count, 0) < p_limit
+    RETURNING u.usage_count INTO v_count;
+
+    IF FOUND THEN
+      RETURN QUERY SELECT TRUE, p_limit - v_count, FALSE;
+      RETURN;
+    END IF;
+  END IF;
+
+  -- 컬럼이 NULL인 기존 사용자는 미구독 / 사용 0회로 취급
+  SELECT COALESCE(u.usage_count, 0), COALESCE(u.is_subscribed, FALSE)
+    INTO v_count, v_subscribed
+    FROM users u
+   WHERE u.email = p_email;
+
+  IF NOT FOUND THEN
+    RETURN;  -- 사용자 없음 → 빈 결과 (앱에서 fallback)
+  END IF;
+
+  IF v_subscribed THEN
+    RETURN QUERY SELECT TRUE, -1, TRUE;
+  ELSE
+    -- 차감 요청이 여기까지 왔다면 한도 소진 (다른 요청이 먼저 차감)
+    RETURN QUERY SELECT (NOT p_consume AND v_count < p_limit),
+                        GREATEST(p_limit - v_count, 0), FALSE;
+  END IF;
+END;
+$$;
+
+-- ============================================
+-- AI 사용량 일별 요약 (관리자용: 호출 종류/모델별 지연·비용·캐시 적중)
+-- ============================================
+CREATE OR REPLACE VIEW ai_usage_daily_summary AS
+SELECT DATE(created_at) AS day,
+       call_type,
+       model,
+       COUNT(*) AS calls,
+       AVG(CASE WHEN cached THEN 1 ELSE 0 END)::NUMERIC(5,3) AS cache_hit_rate,
+       SUM(retries) AS retries,
+       PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY latency_ms)
+         FILTER (WHERE NOT cached) AS latency_p50_ms,
+       PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY latency_ms)
+         FILTER (WHERE NOT cached) AS latency_p95_ms,
+       PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY ttft_ms) AS ttft_p50_ms,
+       SUM(prompt_tokens) AS prompt_tokens,
+       SUM(completion_tokens) AS completion_tokens,
+       SUM(estimated_cost_usd) AS cost_usd
+FROM ai_usage_logs
+GROUP BY DATE(created_at), call_type, model;
+
 -- ============================================
--- 완료! Supabase 대시보드에서 테이블 4개 확인
+-- 완료! Supabase 대시보드에서 테이블 5개 확인
 -- ============================================
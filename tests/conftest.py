@@ -0,0 +1,11 @@
+"""
+테스트 공통 설정
+
+저장소 루트에서 `python -m pytest tests` 또는 `pytest tests`로 실행합니다.
+(scripts/와 같은 방식으로 루트를 import 경로에 추가)
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -0,0 +1,115 @@
+"""
+Batch 결과 저장 테스트 (apply_batch_output)
+
+DB 저장 함수는 호출 기록으로 바꿔 끼워 저장 여부/사용량 기록만 확인합니다.
+"""
+
+import pytest
+
+from utils import batch_insights
+
+MANIFEST = {
+    'user-a': {'purchase_count': 3, 'total_spent': 30000, 'language': 'ko'},
+    'user-b': {'purchase_count': 5, 'total_spent': 50000, 'language': 'ja'},
+    'user-c': {'purchase_count': 1, 'total_spent': 10000, 'language': 'ko'}
+}
+
+
+def ok_line(user_id: str, call_type: str, content: str = '분석 내용') -> dict:
+    return {
+        'custom_id': f"{user_id}:{call_type}",
+        'response': {
+            'status_code': 200,
+            'body': {
+                'model': 'gpt-4o-mini',
+                'choices': [{'message': {'content': content}}],
+                'usage': {'prompt_tokens': 100, 'completion_tokens': 50, 'total_tokens': 150}
+            }
+        },
+        'error': None
+    }
+
+
+def failed_line(user_id: str, call_type: str) -> dict:
+    return {
+        'custom_id': f"{user_id}:{call_type}",
+        'response': None,
+        'error': {'message': 'rate limited'}
+    }
+
+
+@pytest.fixture
+def db_calls(monkeypatch):
+    """save_analysis / log_ai_usage / flush_write_queue 호출 기록"""
+    calls = {'saved': [], 'usage': [], 'flushed': 0}
+
+    def save_analysis(user_id, analysis):
+        calls['saved'].append((user_id, analysis))
+        return len(calls['saved'])
+
+    def log_ai_usage(user_id, analysis_id, call_type, tokens):
+        calls['usage'].append((user_id, analysis_id, call_type, tokens))
+
+    def flush_write_queue():
+        calls['flushed'] += 1
+
+    monkeypatch.setattr(batch_insights, 'save_analysis', save_analysis)
+    monkeypatch.setattr(batch_insights, 'log_ai_usage', log_ai_usage)
+    monkeypatch.setattr(batch_insights, 'flush_write_queue', flush_write_queue)
+    return calls
+
+
+def test_saves_only_users_with_every_call_succeeded(db_calls):
+    output = [
+        ok_line('user-a', 'psychology'), ok_line('user-a', 'smart_insights'),
+        ok_line('user-b', 'psychology'), failed_line('user-b', 'smart_insights'),
+        failed_line('user-c', 'psychology'), failed_line('user-c', 'smart_insights')
+    ]
+
+    saved, skipped = batch_insights.apply_batch_output(output, MANIFEST)
+
+    assert (saved, skipped) == (1, 2)
+    assert [user_id for user_id, _ in db_calls['saved']] == ['user-a']
+    analysis = db_calls['saved'][0][1]
+    assert analysis['source'] == 'batch'
+    assert analysis['psychology_analysis'] == '분석 내용'
+    assert analysis['smart_insights'] == '분석 내용'
+    assert analysis['purchase_count'] == 3
+    # 건너뛴 사용자의 성공한 호출 사용량은 분석 행이 없으므로 기록하지 않음
+    assert {user_id for user_id, *_ in db_calls['usage']} == {'user-a'}
+    assert db_calls['flushed'] == 1
+
+
+def test_skips_missing_and_empty_results(db_calls):
+    output = [
+        ok_line('user-a', 'psychology'),
+        ok_line('user-b', 'psychology'), ok_line('user-b', 'smart_insights', content='   ')
+    ]
+
+    saved, skipped = batch_insights.apply_batch_output(output, MANIFEST)
+
+    assert (saved, skipped) == (0, 3)
+    assert db_calls['saved'] == []
+    assert db_calls['usage'] == []
+
+
+def test_ignores_results_for_users_not_in_manifest(db_calls):
+    output = [ok_line('user-x', 'psychology'), ok_line('user-x', 'smart_insights')]
+
+    saved, skipped = batch_insights.apply_batch_output(output, {})
+
+    assert (saved, skipped) == (0, 0)
+    assert db_calls['saved'] == []
+
+
+@pytest.mark.parametrize('batch_pricing', [True, False])
+def test_usage_logged_with_requested_pricing(db_calls, batch_pricing):
+    output = [ok_line('user-a', 'psychology'), ok_line('user-a', 'smart_insights')]
+
+    batch_insights.apply_batch_output(output, {'user-a': MANIFEST['user-a']},
+                                      batch_pricing=batch_pricing)
+
+    assert sorted(call_type for _, _, call_type, _ in db_calls['usage']) == \
+        ['psychology', 'smart_insights']
+    assert all(tokens['batch'] is batch_pricing for *_, tokens in db_calls['usage'])
+    assert all(analysis_id == 1 for _, analysis_id, _, _ in db_calls['usage'])
@@ -0,0 +1,69 @@
+"""
+구간 카운트 인덱스 테스트 (WindowedCountIndex)
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.date_index import DAY_NS, WindowedCountIndex, to_ns
+
+
+def brute_force(dates_ns, keys, query_keys, lo, hi):
+    """질의마다 전체를 훑는 기준 구현"""
+    return np.array([
+        sum(1 for d, k in zip(dates_ns, keys) if k == qk and l <= d <= h)
+        for qk, l, h in zip(query_keys, lo, hi)
+    ])
+
+
+def random_dates(n, seed):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2026-01-01') + pd.to_timedelta(rng.integers(0, 60, size=n), unit='D')
+    keys = rng.choice(['식비', '의류', '취미'], size=n)
+    return to_ns(dates), keys
+
+
+def test_count_many_matches_brute_force():
+    dates_ns, keys = random_dates(80, 0)
+    index = WindowedCountIndex(dates_ns, keys=keys)
+
+    lo = dates_ns - 3 * DAY_NS
+    hi = dates_ns + 3 * DAY_NS
+    expected = brute_force(dates_ns, keys, keys, lo, hi)
+
+    np.testing.assert_array_equal(index.count_many(keys, lo, hi), expected)
+    assert index.count(keys[0], lo[0], hi[0]) == expected[0]
+
+
+def test_unkeyed_index_counts_all_dates():
+    dates_ns, _ = random_dates(50, 1)
+    index = WindowedCountIndex(dates_ns)
+
+    counts = index.count_around(None, dates_ns, before=DAY_NS, after=0)
+    expected = [int(((dates_ns >= t - DAY_NS) & (dates_ns <= t)).sum()) for t in dates_ns]
+
+    np.testing.assert_array_equal(counts, expected)
+
+
+def test_add_and_remove_match_rebuilt_index():
+    dates_ns, keys = random_dates(60, 2)
+    index = WindowedCountIndex(dates_ns[:40], keys=keys[:40])
+    index.add(dates_ns[40:], keys=keys[40:])
+    # 같은 시각이 여러 건이면 요청한 건수만 제거
+    index.remove(dates_ns[:10], keys=keys[:10])
+
+    rebuilt = WindowedCountIndex(dates_ns[10:], keys=keys[10:])
+    lo = dates_ns - 5 * DAY_NS
+    hi = dates_ns + 5 * DAY_NS
+
+    assert len(index) == 50
+    np.testing.assert_array_equal(index.count_many(keys, lo, hi), rebuilt.count_many(keys, lo, hi))
+
+
+def test_unknown_keys_count_zero():
+    dates_ns, keys = random_dates(10, 3)
+    index = WindowedCountIndex(dates_ns, keys=keys)
+
+    counts = index.count_many(['없는키', None], dates_ns[:2] - DAY_NS, dates_ns[:2] + DAY_NS)
+
+    np.testing.assert_array_equal(counts, [0, 0])
@@ -0,0 +1,77 @@
+"""
+후회 점수 증분 계산기 테스트 (IncrementalRegretScorer)
+
+추가/삭제를 반복한 결과가 남은 전체 행을 처음부터 계산한 결과와 같은지 확인합니다.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.regret_calculator import (
+    SCORE_COLUMNS, IncrementalRegretScorer, calculate_regret_scores_vectorized
+)
+
+CURRENT_DATE = pd.Timestamp('2026-03-01 12:00')
+
+
+def make_purchases(n: int, seed: int, start_id: int = 1) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = (pd.Timestamp('2025-12-01')
+             + pd.to_timedelta(rng.integers(0, 80, size=n), unit='D')
+             + pd.to_timedelta(rng.choice([1, 12, 22], size=n), unit='h'))
+    return pd.DataFrame({
+        '_id': np.arange(start_id, start_id + n),
+        '날짜': dates,
+        '카테고리': rng.choice(['식비', '의류', '취미', '전자기기'], size=n),
+        '금액': rng.integers(1, 300, size=n) * 1000,
+        '필요도': rng.integers(1, 6, size=n),
+        '사용빈도': rng.integers(1, 6, size=n)
+    })
+
+
+def assert_matches_full_recompute(scorer: IncrementalRegretScorer, rows: pd.DataFrame):
+    incremental = scorer.scored_frame(current_date=CURRENT_DATE).set_index('_id').sort_index()
+    full = calculate_regret_scores_vectorized(rows, current_date=CURRENT_DATE)
+    full.index = rows['_id']
+    full = full.sort_index()
+
+    assert list(incremental.index) == list(full.index)
+    for key, column in SCORE_COLUMNS.items():
+        np.testing.assert_allclose(incremental[column].to_numpy(dtype=float),
+                                   full[key].to_numpy(dtype=float), err_msg=key)
+
+
+def test_add_in_batches_matches_full_recompute():
+    first = make_purchases(40, 0)
+    second = make_purchases(25, 1, start_id=100)
+
+    scorer = IncrementalRegretScorer()
+    scorer.add(first)
+    scorer.add(second)
+
+    assert len(scorer) == 65
+    assert_matches_full_recompute(scorer, pd.concat([first, second], ignore_index=True))
+
+
+def test_remove_matches_full_recompute():
+    rows = make_purchases(60, 2)
+    scorer = IncrementalRegretScorer()
+    scorer.add(rows)
+
+    # 최대 금액 행도 함께 삭제 (금액 통계 재계산 경로)
+    removed = list(rows['_id'].iloc[::4]) + [int(rows.loc[rows['금액'].idxmax(), '_id'])]
+    scorer.remove(removed)
+
+    assert_matches_full_recompute(scorer, rows[~rows['_id'].isin(removed)].reset_index(drop=True))
+
+
+def test_diff_reports_added_and_removed_rows():
+    rows = make_purchases(10, 3)
+    scorer = IncrementalRegretScorer()
+    scorer.add(rows.iloc[:8])
+
+    latest = pd.concat([rows.iloc[2:8], rows.iloc[8:]], ignore_index=True)
+    added, removed = scorer.diff(latest)
+
+    assert sorted(added['_id']) == sorted(rows['_id'].iloc[8:])
+    assert sorted(removed) == sorted(rows['_id'].iloc[:2])
@@ -0,0 +1,46 @@
+"""
+CSV 파이프라인 캐시 테스트 (키, LRU, 세션 소유 해제)
+"""
+
+from datetime import date
+
+from utils.pipeline_cache import PipelineCache, hash_content, make_cache_key
+
+
+def test_cache_key_includes_language_and_computation_date():
+    content_hash = hash_content(b'date,amount\n2026-01-01,1000\n')
+
+    key = make_cache_key(content_hash, 'ko', as_of=date(2026, 3, 1))
+
+    assert key == make_cache_key(content_hash, 'ko', as_of=date(2026, 3, 1))
+    assert key != make_cache_key(content_hash, 'ja', as_of=date(2026, 3, 1))
+    assert key != make_cache_key(content_hash, 'ko', as_of=date(2026, 3, 2))
+
+
+def test_evicts_least_recently_used_entry():
+    cache = PipelineCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_release_keeps_entries_used_by_other_sessions():
+    cache = PipelineCache()
+    cache.put('shared', 1, owner='s1')
+    cache.acquire('shared', 's2')
+    cache.put('mine', 2, owner='s1')
+    cache.put('current', 3, owner='s1')
+
+    cache.release('s1', keep='current')
+
+    assert cache.get('shared') == 1
+    assert cache.get('mine') is None
+    assert cache.get('current') == 3
+
+    cache.release('s2')
+    assert cache.get('shared') is None
@@ -0,0 +1,53 @@
+"""
+프롬프트 토큰 예산 테스트 (토큰 계산 fallback, 예산 내 표 구성)
+"""
+
+import pytest
+
+from utils import prompt_budget
+from utils.prompt_budget import TokenBudget, count_tokens
+
+
+class BrokenTiktoken:
+    """인코딩 파일을 받지 못하는 tiktoken 대역"""
+
+    def encoding_for_model(self, model):
+        raise OSError('encoding download failed')
+
+    def get_encoding(self, name):
+        raise OSError('encoding download failed')
+
+
+@pytest.fixture
+def broken_tiktoken(monkeypatch):
+    monkeypatch.setattr(prompt_budget, 'tiktoken', BrokenTiktoken(), raising=False)
+    monkeypatch.setattr(prompt_budget, 'TIKTOKEN_AVAILABLE', True)
+    monkeypatch.setattr(prompt_budget, '_encodings', {})
+
+
+def test_encoding_load_failure_falls_back_to_estimate(broken_tiktoken):
+    # ASCII 12글자 → 3토큰, 한글 2글자 → 2토큰
+    assert count_tokens('hello world!안녕') == 5
+    assert prompt_budget._encodings['gpt-4o-mini'] is None
+
+
+def test_take_rows_stays_within_budget_and_summarizes_overflow(broken_tiktoken):
+    budget = TokenBudget(max_tokens=30)
+    rows = [[f'item{i}', 1000 * i] for i in range(20)]
+
+    table = budget.take_rows(['name', 'amount'], rows,
+                             overflow_row=lambda rest: ['기타', len(rest)])
+
+    lines = table.split('\n')
+    assert lines[0] == 'name|amount'
+    assert lines[-1].startswith('기타|')
+    assert 1 < len(lines) < len(rows) + 1
+    assert budget.used <= budget.max_tokens
+    assert int(lines[-1].split('|')[1]) == len(rows) - (len(lines) - 2)
+
+
+def test_take_rows_returns_empty_when_header_does_not_fit(broken_tiktoken):
+    budget = TokenBudget(max_tokens=1)
+
+    assert budget.take_rows(['name', 'amount'], [['a', 1]]) == ''
+    assert budget.used == 0
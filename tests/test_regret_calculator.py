@@ -0,0 +1,90 @@
+"""
+후회 점수 벡터화 계산 테스트
+
+calculate_regret_scores_vectorized()가 행마다 calculate_regret_score()를 호출한 결과와
+같은지 확인합니다.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.regret_calculator import (
+    SCORE_COLUMNS, add_regret_scores_to_dataframe, calculate_regret_score,
+    calculate_regret_scores_vectorized
+)
+
+CURRENT_DATE = pd.Timestamp('2026-03-01 12:00')
+CATEGORIES = ['식비', '의류', '전자기기', '카페', '취미', '생활용품']
+
+
+def make_purchases(n: int, seed: int) -> pd.DataFrame:
+    """날짜가 몰리는 구간(같은 날/연속일/새벽)이 섞인 무작위 구매 데이터"""
+    rng = np.random.default_rng(seed)
+    days = rng.integers(0, 120, size=n)
+    hours = rng.choice([0, 1, 3, 10, 14, 21, 23], size=n)
+    dates = (pd.Timestamp('2025-11-01')
+             + pd.to_timedelta(days, unit='D')
+             + pd.to_timedelta(hours, unit='h'))
+    return pd.DataFrame({
+        '날짜': dates,
+        '카테고리': rng.choice(CATEGORIES, size=n),
+        '금액': rng.integers(1, 500, size=n) * 1000,
+        '필요도': rng.integers(1, 6, size=n),
+        '사용빈도': rng.integers(1, 6, size=n)
+    })
+
+
+def scalar_scores(df: pd.DataFrame) -> pd.DataFrame:
+    """기존 행 단위 계산 결과"""
+    rows = [
+        calculate_regret_score(
+            necessity=row['필요도'],
+            usage=row['사용빈도'],
+            amount=row['금액'],
+            purchase_date=row['날짜'],
+            category=row['카테고리'],
+            df=df,
+            current_date=CURRENT_DATE
+        )
+        for _, row in df.iterrows()
+    ]
+    return pd.DataFrame(rows, index=df.index)
+
+
+@pytest.mark.parametrize('n, seed', [(1, 0), (25, 1), (200, 2)])
+def test_vectorized_matches_row_by_row(n, seed):
+    df = make_purchases(n, seed)
+
+    expected = scalar_scores(df)
+    actual = calculate_regret_scores_vectorized(df, current_date=CURRENT_DATE)
+
+    for key in SCORE_COLUMNS:
+        np.testing.assert_allclose(actual[key].to_numpy(dtype=float),
+                                   expected[key].to_numpy(dtype=float),
+                                   err_msg=key)
+
+
+def test_vectorized_keeps_index_order():
+    df = make_purchases(30, 3)
+    shuffled = df.sample(frac=1, random_state=0)
+    shuffled.index = shuffled.index * 10
+
+    actual = calculate_regret_scores_vectorized(shuffled, current_date=CURRENT_DATE)
+    expected = scalar_scores(shuffled)
+
+    assert list(actual.index) == list(shuffled.index)
+    np.testing.assert_allclose(actual['total_score'].to_numpy(dtype=float),
+                               expected['total_score'].to_numpy(dtype=float))
+
+
+def test_add_regret_scores_adds_columns_without_mutating_input():
+    df = make_purchases(10, 4)
+    original_columns = list(df.columns)
+
+    result = add_regret_scores_to_dataframe(df)
+
+    assert list(df.columns) == original_columns
+    for column in SCORE_COLUMNS.values():
+        assert column in result.columns
+    assert result['후회점수'].between(0, 100).all()
@@ -0,0 +1,169 @@
+"""
+요청 스케줄러 테스트 (재시도, single-flight 공유, 스트림 슬롯 점유)
+"""
+
+import threading
+import time
+
+import pytest
+
+from utils.request_scheduler import RequestScheduler
+
+
+class RateLimitError(Exception):
+    """429 응답 대역"""
+    status_code = 429
+
+
+class BadRequestError(Exception):
+    """400 응답 대역 (재시도 대상 아님)"""
+    status_code = 400
+
+
+def make_scheduler(**kwargs) -> RequestScheduler:
+    options = dict(max_concurrency=2, rate_per_second=0, burst=2, max_retries=3,
+                   base_delay=0.01, max_delay=0.01)
+    options.update(kwargs)
+    return RequestScheduler(**options)
+
+
+def flaky(failures: int, error=RateLimitError):
+    """처음 failures번은 실패하고 이후 호출 횟수를 반환하는 함수"""
+    calls = {'count': 0}
+
+    def func():
+        calls['count'] += 1
+        if calls['count'] <= failures:
+            raise error('fail')
+        return calls['count']
+
+    return func, calls
+
+
+def test_retries_retryable_errors_until_success():
+    scheduler = make_scheduler()
+    func, calls = flaky(2)
+
+    assert scheduler.call(func) == 3
+    assert scheduler.last_retries() == 2
+    stats = scheduler.stats()
+    assert stats['retries'] == 2
+    assert stats['executed'] == 3
+    assert stats['failed'] == 0
+
+
+def test_gives_up_after_max_retries():
+    scheduler = make_scheduler(max_retries=2)
+    func, calls = flaky(10)
+
+    with pytest.raises(RateLimitError):
+        scheduler.call(func)
+    assert calls['count'] == 3
+    assert scheduler.stats()['failed'] == 1
+
+
+def test_does_not_retry_non_retryable_errors():
+    scheduler = make_scheduler()
+    func, calls = flaky(1, error=BadRequestError)
+
+    with pytest.raises(BadRequestError):
+        scheduler.call(func)
+    assert calls['count'] == 1
+    assert scheduler.stats()['retries'] == 0
+
+
+def test_coalesces_concurrent_calls_with_same_key():
+    scheduler = make_scheduler(max_concurrency=4)
+    release = threading.Event()
+    calls = {'count': 0}
+    results = []
+    lock = threading.Lock()
+
+    def func():
+        calls['count'] += 1
+        release.wait(timeout=5)
+        return 'response'
+
+    def worker():
+        result = scheduler.call(func, key='same-prompt')
+        with lock:
+            results.append((result, scheduler.last_shared()))
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    # 후속 요청이 모두 진행 중인 요청에 합류할 때까지 대기
+    deadline = time.monotonic() + 5
+    while scheduler.stats()['coalesced'] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert calls['count'] == 1
+    assert [result for result, _ in results] == ['response'] * 3
+    assert sorted(shared for _, shared in results) == [False, True, True]
+    assert scheduler.stats()['coalesced'] == 2
+
+
+def test_coalesced_followers_receive_leader_error():
+    scheduler = make_scheduler(max_concurrency=4, max_retries=0)
+    release = threading.Event()
+    errors = []
+
+    def func():
+        release.wait(timeout=5)
+        raise BadRequestError('bad')
+
+    def worker():
+        try:
+            scheduler.call(func, key='same-prompt')
+        except BadRequestError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while scheduler.stats()['coalesced'] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(errors) == 2
+    assert scheduler.stats()['executed'] == 1
+
+
+def test_stream_releases_slot_while_backing_off():
+    scheduler = make_scheduler(max_concurrency=1, base_delay=0.3, max_delay=0.3)
+    func, calls = flaky(1)
+    other_waited = []
+
+    def other():
+        # 첫 열기 실패 후 백오프 대기 중에 다른 요청이 슬롯을 얻을 수 있어야 함
+        time.sleep(0.1)
+        started = time.monotonic()
+        scheduler.call(lambda: None)
+        other_waited.append(time.monotonic() - started)
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    with scheduler.stream(func) as stream:
+        assert stream == 2
+        assert scheduler.stats()['in_flight'] == 1
+    thread.join(timeout=5)
+
+    assert other_waited and other_waited[0] < 0.2
+    assert scheduler.last_retries() == 1
+    assert scheduler.stats()['in_flight'] == 0
+
+
+def test_stream_releases_slot_on_failure():
+    scheduler = make_scheduler(max_concurrency=1)
+    func, _ = flaky(1, error=BadRequestError)
+
+    with pytest.raises(BadRequestError):
+        with scheduler.stream(func):
+            pass
+    assert scheduler.stats()['in_flight'] == 0
@@ -0,0 +1,44 @@
+"""
+응답 캐시 테스트 (TTL 만료, 최대 항목 수 제한)
+"""
+
+import time
+
+from utils.response_cache import ResponseCache, hash_prompt, make_response_key
+
+
+def test_round_trip_and_key_depends_on_prompt(tmp_path):
+    cache = ResponseCache(path=tmp_path / 'cache.sqlite3')
+    messages = [{'role': 'user', 'content': '분석해줘'}]
+    key = make_response_key('gpt-4o-mini', 0.7, 'ko', hash_prompt(messages))
+
+    cache.put(key, '응답', {'prompt_tokens': 10})
+
+    assert cache.get(key) == {'content': '응답', 'usage': {'prompt_tokens': 10}}
+    other = make_response_key('gpt-4o-mini', 0.7, 'ko',
+                              hash_prompt([{'role': 'user', 'content': '다른 질문'}]))
+    assert cache.get(other) is None
+
+
+def test_expired_entries_are_not_returned(tmp_path):
+    cache = ResponseCache(path=tmp_path / 'cache.sqlite3', ttl_seconds=0)
+    cache.put('k', '응답', None)
+    time.sleep(0.01)
+
+    assert cache.get('k') is None
+    assert len(cache) == 0
+
+
+def test_keeps_most_recently_used_entries(tmp_path):
+    cache = ResponseCache(path=tmp_path / 'cache.sqlite3', max_entries=2)
+    cache.put('a', '1', None)
+    time.sleep(0.01)
+    cache.put('b', '2', None)
+    time.sleep(0.01)
+    cache.get('a')
+    time.sleep(0.01)
+    cache.put('c', '3', None)
+
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
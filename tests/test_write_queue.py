@@ -0,0 +1,78 @@
+"""
+쓰기 지연 큐 묶음 insert 테스트 (거절된 행만 분리)
+"""
+
+from utils.database import WriteBehindQueue
+
+
+class FakeTable:
+    """insert 묶음에 'bad' 행이 있으면 거절하는 테이블 대역"""
+
+    def __init__(self, client):
+        self.client = client
+        self.rows = None
+
+    def insert(self, rows):
+        self.rows = rows
+        return self
+
+    def execute(self):
+        self.client.requests.append(len(self.rows))
+        if self.client.error is not None:
+            raise self.client.error
+        if any(row.get('bad') for row in self.rows):
+            raise ValueError('invalid row')
+
+        class Result:
+            data = [{'id': self.client.next_id + i} for i in range(len(self.rows))]
+        self.client.next_id += len(self.rows)
+        return Result()
+
+
+class FakeClient:
+    def __init__(self, error=None):
+        self.error = error
+        self.requests = []
+        self.next_id = 1
+
+    def table(self, name):
+        return FakeTable(self)
+
+
+def make_jobs(n, bad=()):
+    return [{'kind': 'ai_usage', 'attempts': 0, 'payload': {'n': i, 'bad': i in bad}}
+            for i in range(n)]
+
+
+def test_bisects_to_isolate_rejected_rows():
+    client = FakeClient()
+    jobs = make_jobs(8, bad={5})
+
+    saved, failed = WriteBehindQueue._insert(client, 'ai_usage_logs', jobs, lambda job: job['payload'])
+
+    assert [job['payload']['n'] for job in failed] == [5]
+    assert sorted(job['payload']['n'] for job, _ in saved) == [0, 1, 2, 3, 4, 6, 7]
+    assert all(analysis_id is not None for _, analysis_id in saved)
+
+
+def test_transport_errors_fail_whole_chunk_without_bisecting():
+    client = FakeClient(error=ConnectionError('down'))
+    jobs = make_jobs(8)
+
+    saved, failed = WriteBehindQueue._insert(client, 'ai_usage_logs', jobs, lambda job: job['payload'])
+
+    assert saved == []
+    assert len(failed) == 8
+    assert client.requests == [8]
+
+
+def test_requeue_drops_jobs_over_max_retries():
+    queue = WriteBehindQueue(max_jobs=10, max_retries=1)
+    jobs = make_jobs(2)
+    jobs[1]['attempts'] = 1
+
+    queue._requeue(jobs)
+
+    stats = queue.stats()
+    assert stats['pending'] == 1
+    assert stats['dropped'] == 1
@@ -0,0 +1,207 @@
+"""
+AI 호출 계측 (프로세스 전역)
+
+OpenAI 호출마다 호출 종류/모델/언어, 지연 시간, 첫 토큰 지연(TTFT), 토큰 수, 비용,
+캐시 적중, 재시도 횟수를 기록합니다.
+- 호출 기록은 메모리에서 (호출 종류, 모델)별로 집계하여 관리자 요약(summary)으로 제공
+- 계측 필드는 결과 usage에 덧붙여 log_ai_usage → ai_usage_logs로 저장 (database 쓰기 지연 큐)
+- 비용 계산식(estimate_cost)은 이 모듈 한 곳에만 둡니다
+"""
+
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# 모델별 가격 (USD / 1M 토큰: 입력, 출력)
+MODEL_PRICING = {
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00)
+}
+DEFAULT_MODEL = 'gpt-4o-mini'
+
+# Batch API는 일반 호출의 50% 가격
+BATCH_DISCOUNT = 0.5
+
+# 집계별로 보관할 최근 지연 시간 표본 수 (백분위 계산용)
+LATENCY_SAMPLES = 500
+
+
+def _pricing(model: Optional[str]) -> tuple:
+    """모델 가격 (날짜가 붙은 모델명 'gpt-4o-mini-2024-07-18'도 접두어로 매칭)"""
+    for name in sorted(MODEL_PRICING, key=len, reverse=True):
+        if model and model.startswith(name):
+            return MODEL_PRICING[name]
+    return MODEL_PRICING[DEFAULT_MODEL]
+
+
+def estimate_cost(prompt_tokens: int, completion_tokens: int, model: Optional[str] = None,
+                  cached: bool = False, batch: bool = False) -> float:
+    """
+    호출 비용 추정 (USD)
+
+    Args:
+        prompt_tokens: 입력 토큰 수
+        completion_tokens: 출력 토큰 수
+        model: 모델명 (가격표에 없으면 gpt-4o-mini 기준)
+        cached: 응답 캐시 적중 여부 (API를 호출하지 않았으므로 0)
+        batch: Batch API 호출 여부
+
+    Returns:
+        추정 비용 (USD)
+    """
+    if cached:
+        return 0.0
+
+    input_price, output_price = _pricing(model)
+    cost = (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+    return cost * BATCH_DISCOUNT if batch else cost
+
+
+def usage_cost(usage: Dict) -> float:
+    """usage dict ({prompt_tokens, completion_tokens, model, cached, shared, batch})의 비용 (USD)"""
+    # 공유받은 응답은 먼저 보낸 요청의 로그에 비용이 이미 기록됨
+    return estimate_cost(
+        usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0),
+        model=usage.get('model'), cached=bool(usage.get('cached') or usage.get('shared')),
+        batch=bool(usage.get('batch'))
+    )
+
+
+class AITelemetry:
+    """AI 호출 기록 집계 (스레드 안전)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._aggregates: Dict[tuple, Dict] = {}
+
+    def record_call(self, call_type: str, model: str, language: str, success: bool,
+                    latency: float, ttft: Optional[float] = None,
+                    usage: Optional[Dict] = None, retries: int = 0,
+                    error: Optional[str] = None, shared: bool = False) -> Dict:
+        """
+        호출 1건 기록
+
+        Args:
+            call_type: 'psychology', 'smart_insights', 'combined'
+            model: 모델명
+            language: 분석 언어
+            success: 성공 여부
+            latency: 전체 소요 시간 (초)
+            ttft: 첫 토큰까지 걸린 시간 (초, 스트리밍만)
+            usage: 토큰 사용량 ({prompt_tokens, completion_tokens, cached})
+            retries: 스케줄러 재시도 횟수
+            error: 에러 메시지 (실패 시)
+            shared: 진행 중이던 같은 요청의 응답을 공유받았는지 여부
+                (API 호출은 먼저 보낸 요청에서 이미 기록했으므로 shared 건수만 증가)
+
+        Returns:
+            usage에 덧붙일 계측 필드 {model, language, latency_ms, ttft_ms, retries, cost_usd}
+        """
+        usage = usage or {}
+        cached = bool(usage.get('cached'))
+        prompt_tokens = usage.get('prompt_tokens', 0)
+        completion_tokens = usage.get('completion_tokens', 0)
+        cost = (estimate_cost(prompt_tokens, completion_tokens, model, cached=cached)
+                if success and not shared else 0.0)
+
+        with self._lock:
+            agg = self._aggregates.get((call_type, model))
+            if agg is None:
+                agg = self._aggregates[(call_type, model)] = {
+                    'calls': 0, 'shared': 0, 'errors': 0, 'cache_hits': 0, 'retries': 0,
+                    'prompt_tokens': 0, 'completion_tokens': 0, 'cost_usd': 0.0,
+                    'last_error': None,
+                    'latency': deque(maxlen=LATENCY_SAMPLES),
+                    'ttft': deque(maxlen=LATENCY_SAMPLES)
+                }
+            if shared:
+                agg['shared'] += 1
+                return self._call_fields(model, language, latency, ttft, retries, cost)
+
+            agg['calls'] += 1
+            agg['errors'] += int(not success)
+            agg['cache_hits'] += int(cached)
+            agg['retries'] += retries
+            agg['prompt_tokens'] += prompt_tokens
+            agg['completion_tokens'] += completion_tokens
+            agg['cost_usd'] += cost
+            if error:
+                agg['last_error'] = error
+            # 캐시 적중은 지연 분포를 왜곡하므로 실제 호출만 표본으로 사용
+            if success and not cached:
+                agg['latency'].append(latency)
+                if ttft is not None:
+                    agg['ttft'].append(ttft)
+
+        return self._call_fields(model, language, latency, ttft, retries, cost)
+
+    @staticmethod
+    def _call_fields(model: str, language: str, latency: float, ttft: Optional[float],
+                     retries: int, cost: float) -> Dict:
+        """usage에 덧붙일 계측 필드"""
+        return {
+            'model': model,
+            'language': language,
+            'latency_ms': int(latency * 1000),
+            'ttft_ms': int(ttft * 1000) if ttft is not None else None,
+            'retries': retries,
+            'cost_usd': round(cost, 6)
+        }
+
+    def summary(self) -> List[Dict]:
+        """
+        (호출 종류, 모델)별 집계 (관리자 화면용)
+
+        Returns:
+            [{call_type, model, calls, shared, errors, cache_hit_rate, retries,
+              latency_p50_ms, latency_p95_ms, ttft_p50_ms,
+              prompt_tokens, completion_tokens, cost_usd, last_error}, ...]
+        """
+        with self._lock:
+            snapshot = [(key, dict(agg, latency=list(agg['latency']), ttft=list(agg['ttft'])))
+                        for key, agg in self._aggregates.items()]
+
+        rows = []
+        for (call_type, model), agg in sorted(snapshot, key=lambda item: item[0]):
+            latency_p50, latency_p95 = (np.percentile(agg['latency'], [50, 95]) * 1000
+                                        if agg['latency'] else (None, None))
+            rows.append({
+                'call_type': call_type,
+                'model': model,
+                'calls': agg['calls'],
+                'shared': agg['shared'],
+                'errors': agg['errors'],
+                'cache_hit_rate': round(agg['cache_hits'] / agg['calls'], 3) if agg['calls'] else None,
+                'retries': agg['retries'],
+                'latency_p50_ms': round(latency_p50) if latency_p50 is not None else None,
+                'latency_p95_ms': round(latency_p95) if latency_p95 is not None else None,
+                'ttft_p50_ms': round(float(np.median(agg['ttft'])) * 1000) if agg['ttft'] else None,
+                'prompt_tokens': agg['prompt_tokens'],
+                'completion_tokens': agg['completion_tokens'],
+                'cost_usd': round(agg['cost_usd'], 6),
+                'last_error': agg['last_error']
+            })
+        return rows
+
+
+# 싱글톤 인스턴스
+_ai_telemetry = None
+_telemetry_lock = threading.Lock()
+
+
+def get_ai_telemetry() -> AITelemetry:
+    """
+    프로세스 전역 AI 호출 계측 반환
+
+    Returns:
+        AITelemetry 인스턴스
+    """
+    global _ai_telemetry
+
+    with _telemetry_lock:
+        if _ai_telemetry is None:
+            _ai_telemetry = AITelemetry()
+
+    return _ai_telemetry
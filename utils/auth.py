@@ -7,6 +7,7 @@
 import os
 import re
 import json
+import time
 import streamlit as st
 from pathlib import Path
 from typing import Optional, Dict, Tuple
@@ -19,12 +20,14 @@ from google_auth_oauthlib.flow import Flow
 from google.oauth2 import id_token
 from google.auth.transport import requests
 
+from utils.pipeline_cache import get_csv_pipeline_cache
+
 # DB 모듈 (선택적)
 try:
     from utils.database import (
-        is_db_available, get_or_create_user, get_user_by_email,
+        is_db_available, get_or_create_user,
         get_user_by_username, create_local_user,
-        get_usage_count, increment_usage, update_language
+        use_quota, update_language, load_user_profile
     )
     DB_MODULE_AVAILABLE = True
 except ImportError:
@@ -129,6 +132,15 @@ def handle_oauth_callback(code: str) -> Optional[Dict]:
 USER_DATA_FILE = Path(__file__).parent.parent / "data" / "users.json"
 SESSION_FILE = Path(__file__).parent.parent / "data" / "session.json"
 
+# 무료 플랜 분석 횟수
+FREE_USAGE_LIMIT = 5
+
+# 세션 프로필 캐시 유지 시간 (초) - 다른 기기/관리자 변경(구독 등) 반영 주기
+USER_PROFILE_TTL = int(os.getenv('USER_PROFILE_TTL', '60'))
+
+# 세션 프로필에 보관하는 users 컬럼
+PROFILE_KEYS = ('id', 'usage_count', 'is_subscribed', 'is_admin', 'language', 'purchase_count')
+
 
 def _use_db() -> bool:
     """DB 사용 가능 여부"""
@@ -153,11 +165,11 @@ def load_session() -> Optional[Dict]:
         with open(SESSION_FILE, 'r', encoding='utf-8') as f:
             session = json.load(f)
 
-        # DB 연결 가능하면 db_user_id 복원
+        # DB 연결 가능하면 db_user_id 복원 (세션 프로필 캐시도 함께 채움)
         if _use_db() and 'db_user_id' not in session:
-            db_user = get_user_by_email(session.get('email', ''))
-            if db_user:
-                session['db_user_id'] = db_user['id']
+            profile = get_user_profile(session.get('email', ''))
+            if profile:
+                session['db_user_id'] = profile['id']
 
         return session
     except Exception:
@@ -196,6 +208,96 @@ def _save_user_data_json(data: Dict) -> None:
         pass
 
 
+# ============================================
+# 세션 프로필 캐시 (rerun마다 users 조회하지 않도록)
+# ============================================
+
+def cache_user_profile(user_email: str, db_user: Dict) -> Dict:
+    """
+    DB 사용자 행을 세션 프로필로 저장 (로그인 직후 get_or_create_user 결과 재사용)
+
+    Returns:
+        {id, usage_count, is_subscribed, is_admin, language, purchase_count}
+    """
+    profile = {key: db_user.get(key) for key in PROFILE_KEYS}
+    st.session_state.user_profile = {
+        'email': user_email,
+        'profile': profile,
+        'loaded_at': time.time()
+    }
+    return profile
+
+
+def get_user_profile(user_email: str) -> Optional[Dict]:
+    """
+    세션 캐시된 사용자 프로필 (USER_PROFILE_TTL 안의 rerun은 DB 조회 없음)
+
+    Returns:
+        {id, usage_count, is_subscribed, is_admin, language, purchase_count} 또는 None (DB 불가/사용자 없음)
+    """
+    entry = st.session_state.get('user_profile')
+    if (entry and entry['email'] == user_email
+            and time.time() - entry['loaded_at'] < USER_PROFILE_TTL):
+        return entry['profile']
+
+    if not _use_db():
+        return None
+
+    db_user = load_user_profile(user_email)
+    if db_user is None:
+        return None
+    return cache_user_profile(user_email, db_user)
+
+
+def invalidate_user_profile() -> None:
+    """세션 프로필 캐시 무효화 (다음 조회 시 DB에서 다시 읽음)"""
+    st.session_state.pop('user_profile', None)
+
+
+def _update_user_profile(**values) -> None:
+    """DB에 쓴 값을 세션 프로필에 반영 (재조회 없이)"""
+    entry = st.session_state.get('user_profile')
+    if entry:
+        entry['profile'].update(values)
+
+
+def get_saved_purchase_count(user_email: str, refresh: bool = False) -> Optional[int]:
+    """
+    저장된 구매 이력 수 (세션 프로필의 users.purchase_count, 트리거가 유지)
+
+    Args:
+        user_email: 사용자 이메일
+        refresh: 이 세션에서 구매 이력을 저장/삭제했으면 True (프로필을 다시 읽어 새 건수 반영)
+
+    Returns:
+        구매 이력 수 또는 None (DB 불가/사용자 없음)
+    """
+    if refresh:
+        invalidate_user_profile()
+    profile = get_user_profile(user_email)
+    if profile is None:
+        return None
+    return profile.get('purchase_count') or 0
+
+
+def _quota_from_profile(profile: Dict) -> Tuple[bool, int, bool]:
+    """프로필 → (사용 가능 여부, 남은 횟수, 구독 상태)"""
+    if profile.get('is_subscribed'):
+        return True, -1, True
+    remaining = FREE_USAGE_LIMIT - (profile.get('usage_count') or 0)
+    return remaining > 0, max(remaining, 0), False
+
+
+def set_user_language(user_email: str, lang: str) -> None:
+    """언어 설정 저장 (DB + 세션 프로필)"""
+    profile = get_user_profile(user_email)
+    if not profile or profile.get('language') == lang:
+        return
+
+    update_language(profile['id'], lang)
+    _update_user_profile(language=lang)
+
+
 # ============================================
 # 통합 인터페이스 (DB 우선, JSON fallback)
 # ============================================
@@ -207,11 +309,11 @@ def check_usage_limit(user_email: str) -> Tuple[bool, int, bool]:
     Returns:
         tuple: (사용 가능 여부, 남은 횟수, 구독 상태)
     """
-    # DB 사용 가능 시
+    # DB 사용 가능 시 (세션 프로필 캐시 - TTL 안에서는 조회 없음)
     if _use_db():
-        db_user = get_user_by_email(user_email)
-        if db_user:
-            return get_usage_count(db_user['id'])
+        profile = get_user_profile(user_email)
+        if profile is not None:
+            return _quota_from_profile(profile)
 
     # JSON fallback
     users = _load_user_data_json()
@@ -229,30 +331,50 @@ def check_usage_limit(user_email: str) -> Tuple[bool, int, bool]:
     if user['is_subscribed']:
         return True, -1, True
 
-    remaining = 5 - user['usage_count']
+    remaining = FREE_USAGE_LIMIT - user['usage_count']
     if remaining > 0:
         return True, remaining, False
     else:
         return False, 0, False
 
 
-def increment_usage_count(user_email: str) -> None:
+def increment_usage_count(user_email: str) -> Tuple[bool, int, bool]:
     """
-    사용 횟수 1 증가 (DB 우선, JSON fallback)
+    사용 횟수 1 차감 (DB 우선, JSON fallback)
+
+    DB에서는 남은 횟수 확인과 차감을 한 번에 처리하므로,
+    여러 탭에서 동시에 분석해도 한도를 넘겨 차감되지 않습니다.
+
+    Returns:
+        tuple: (차감 성공 여부, 남은 횟수, 구독 상태) - 구독자는 항상 (True, -1, True)
     """
-    # DB 사용 가능 시
+    # DB 사용 가능 시 (use_quota RPC 1회, 결과로 세션 프로필 갱신)
     if _use_db():
-        db_user = get_user_by_email(user_email)
-        if db_user:
-            increment_usage(db_user['id'])
-            return
+        quota = use_quota(user_email, FREE_USAGE_LIMIT, consume=True)
+        if quota is None:
+            invalidate_user_profile()
+        else:
+            _, remaining, is_subscribed = quota
+            if is_subscribed:
+                _update_user_profile(is_subscribed=True)
+            else:
+                _update_user_profile(usage_count=FREE_USAGE_LIMIT - remaining,
+                                     is_subscribed=False)
+            return quota
 
     # JSON fallback
     users = _load_user_data_json()
-    if user_email in users:
-        if not users[user_email].get('is_subscribed', False):
-            users[user_email]['usage_count'] += 1
-            _save_user_data_json(users)
+    user = users.get(user_email)
+    if user is None:
+        return True, FREE_USAGE_LIMIT, False
+    if user.get('is_subscribed', False):
+        return True, -1, True
+    if user['usage_count'] >= FREE_USAGE_LIMIT:
+        return False, 0, False
+
+    user['usage_count'] += 1
+    _save_user_data_json(users)
+    return True, FREE_USAGE_LIMIT - user['usage_count'], False
 
 
 # ============================================
@@ -405,10 +527,16 @@ def logout() -> None:
     # 세션 파일 삭제
     clear_session()
 
+    # CSV 파이프라인 캐시에서 이 세션 소유 항목 해제
+    if 'cache_session_id' in st.session_state:
+        get_csv_pipeline_cache().release(st.session_state.cache_session_id)
+
     # 세션 상태 초기화
     keys_to_delete = ['user_info', 'oauth_state', 'processed_df', 'manual_items',
                       'ai_feedback', 'ai_usage', 'smart_insights', 'smart_insights_usage',
-                      'db_user_id']
+                      'db_user_id', 'regret_scorers', 'user_profile', 'analysis_history',
+                      'analysis_scope', 'purchase_summary', 'analysis_bodies',
+                      'ai_usage_summary']
 
     for key in keys_to_delete:
         if key in st.session_state:
@@ -0,0 +1,257 @@
+"""
+AI 분석 배치 사전 생성
+
+마지막 분석 이후 구매 이력이 바뀐 사용자의 심리 분석/스마트 인사이트를 미리 만들어 두어,
+분석 버튼을 눌렀을 때 LLM을 기다리지 않고 바로 결과를 보여주도록 합니다.
+
+흐름:
+1. prepare_batch: 대상 사용자 조회 → 후회 점수 계산 → OpenAIService 요청 빌더로
+   Batch API 요청 JSONL + 메타데이터(manifest) 작성
+2. submit_batch / collect_batch: OpenAI Batch API 제출 및 결과 수집 (50% 가격)
+   run_batch_locally: 같은 JSONL을 chat completions 엔드포인트(로컬 대역 서버 등)로 직접 실행
+3. apply_batch_output: 결과 JSONL을 save_analysis로 저장 (source='batch')
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.csv_processor import validate_csv, process_csv_data
+from utils.regret_calculator import add_regret_scores_to_dataframe, build_ai_analysis_inputs
+from utils.database import (
+    load_users_pending_analysis, load_purchases, save_analysis, log_ai_usage,
+    flush_write_queue
+)
+
+# Batch API 요청 엔드포인트
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+# custom_id 접미사(log_ai_usage call_type) → analyses 컬럼
+CALL_TYPES = {
+    'psychology': 'psychology_analysis',
+    'smart_insights': 'smart_insights'
+}
+
+
+def build_user_requests(service, user_id: str, language: str = 'ko') -> Tuple[List[Dict], Optional[Dict]]:
+    """
+    사용자 1명의 Batch 요청 줄 생성
+
+    Args:
+        service: OpenAIService 인스턴스 (요청 빌더 사용)
+        user_id: 사용자 UUID
+        language: 분석 언어
+
+    Returns:
+        (Batch 요청 줄 목록, save_analysis용 메타데이터) - 데이터가 없거나 잘못되면 ([], None)
+    """
+    purchases_df = load_purchases(user_id)
+    if purchases_df is None or len(purchases_df) == 0:
+        return [], None
+
+    is_valid, _ = validate_csv(purchases_df.copy())
+    if not is_valid:
+        return [], None
+
+    df = add_regret_scores_to_dataframe(process_csv_data(purchases_df))
+    inputs = build_ai_analysis_inputs(df, language)
+
+    bodies = {
+        'psychology': service.build_feedback_request(
+            **service.feedback_inputs(inputs), language=language
+        ),
+        'smart_insights': service.build_smart_insights_request(
+            **service.insights_inputs(inputs), language=language
+        )
+    }
+    lines = [
+        {
+            'custom_id': f"{user_id}:{call_type}",
+            'method': 'POST',
+            'url': BATCH_ENDPOINT,
+            'body': body
+        }
+        for call_type, body in bodies.items()
+    ]
+
+    metadata = {
+        'purchase_count': len(df),
+        'total_spent': int(df['금액'].sum()),
+        'average_regret_score': round(inputs['overall_score'], 2),
+        'high_regret_count': int((df['후회점수'] >= 50).sum()),
+        'language': language
+    }
+    return lines, metadata
+
+
+def prepare_batch(service, output_path: Path, limit: int = 500) -> Tuple[Path, Path, int]:
+    """
+    대상 사용자 전체의 Batch 요청 JSONL + manifest 작성
+
+    Args:
+        service: OpenAIService 인스턴스
+        output_path: 요청 JSONL 경로 (manifest는 같은 이름 .manifest.json)
+        limit: 최대 사용자 수
+
+    Returns:
+        (요청 JSONL 경로, manifest 경로, 포함된 사용자 수)
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_path.with_suffix('.manifest.json')
+
+    manifest = {}
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for user in load_users_pending_analysis(limit=limit):
+            user_id = user['user_id']
+            lines, metadata = build_user_requests(service, user_id, user.get('language') or 'ko')
+            if not lines:
+                continue
+            for line in lines:
+                f.write(json.dumps(line, ensure_ascii=False) + '\n')
+            manifest[user_id] = metadata
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    return output_path, manifest_path, len(manifest)
+
+
+def submit_batch(client, requests_path: Path) -> str:
+    """
+    OpenAI Batch API에 요청 JSONL 제출
+
+    Args:
+        client: OpenAI 클라이언트
+        requests_path: 요청 JSONL 경로
+
+    Returns:
+        batch id
+    """
+    with open(requests_path, 'rb') as f:
+        input_file = client.files.create(file=f, purpose='batch')
+
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window='24h'
+    )
+    return batch.id
+
+
+def collect_batch(client, batch_id: str) -> Optional[List[Dict]]:
+    """
+    완료된 Batch 결과 줄 조회
+
+    Returns:
+        결과 줄 목록 또는 None (아직 완료되지 않음)
+    """
+    batch = client.batches.retrieve(batch_id)
+    if batch.status != 'completed' or not batch.output_file_id:
+        print(f"[Batch] {batch_id} 상태: {batch.status}")
+        return None
+
+    content = client.files.content(batch.output_file_id).text
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def run_batch_locally(service, requests_path: Path) -> List[Dict]:
+    """
+    요청 JSONL을 chat completions로 직접 실행하여 Batch 결과 형식으로 반환
+
+    Batch API가 없는 로컬 대역 서버(OPENAI_BASE_URL)로 전체 흐름을 시험할 때 사용합니다.
+
+    Args:
+        service: OpenAIService 인스턴스 (요청 스케줄러 경유)
+        requests_path: 요청 JSONL 경로
+
+    Returns:
+        Batch 결과 형식의 줄 목록
+    """
+    output = []
+    with open(requests_path, 'r', encoding='utf-8') as f:
+        for raw in f:
+            if not raw.strip():
+                continue
+            request = json.loads(raw)
+            try:
+                response = service.scheduler.call(
+                    lambda: service.client.chat.completions.create(**request['body'])
+                )
+                output.append({
+                    'custom_id': request['custom_id'],
+                    'response': {'status_code': 200, 'body': response.model_dump()},
+                    'error': None
+                })
+            except Exception as e:
+                output.append({
+                    'custom_id': request['custom_id'],
+                    'response': None,
+                    'error': {'message': str(e)}
+                })
+    return output
+
+
+def apply_batch_output(output_lines: Iterable[Dict], manifest: Dict[str, Dict],
+                       batch_pricing: bool = True) -> Tuple[int, int]:
+    """
+    Batch 결과를 사용자별로 모아 save_analysis로 저장
+
+    심리 분석/스마트 인사이트가 모두 성공한 사용자만 저장합니다.
+    하나라도 실패하거나 비어 있으면 건너뛰어, 화면 분석이 새로 생성하도록 둡니다.
+
+    Args:
+        output_lines: Batch 결과 줄 ({custom_id, response: {status_code, body}, error})
+        manifest: prepare_batch가 만든 사용자별 메타데이터
+        batch_pricing: 사용량을 Batch 가격(50%)으로 기록할지 여부
+            (run_batch_locally 결과는 일반 호출로 과금되므로 False)
+
+    Returns:
+        (저장한 분석 수, 결과가 불완전해 건너뛴 사용자 수)
+    """
+    results: Dict[str, Dict[str, Dict]] = {}
+    for line in output_lines:
+        user_id, _, call_type = line['custom_id'].rpartition(':')
+        response = line.get('response') or {}
+        if line.get('error') or response.get('status_code') != 200:
+            print(f"[Batch] {line['custom_id']} 실패: {line.get('error')}")
+            continue
+
+        body = response['body']
+        results.setdefault(user_id, {})[call_type] = {
+            'content': (body['choices'][0]['message']['content'] or '').strip(),
+            'usage': body.get('usage') or {},
+            'model': body.get('model')
+        }
+
+    saved = 0
+    skipped = 0
+    for user_id, metadata in manifest.items():
+        calls = results.get(user_id, {})
+        if not all(calls.get(call_type, {}).get('content') for call_type in CALL_TYPES):
+            skipped += 1
+            continue
+
+        analysis = dict(metadata, source='batch')
+        for call_type, column in CALL_TYPES.items():
+            analysis[column] = calls[call_type]['content']
+
+        analysis_id = save_analysis(user_id, analysis)
+        if analysis_id is None:
+            continue
+        saved += 1
+
+        for call_type, call in calls.items():
+            usage = call['usage']
+            if usage:
+                log_ai_usage(user_id, analysis_id, call_type, {
+                    'prompt_tokens': usage.get('prompt_tokens', 0),
+                    'completion_tokens': usage.get('completion_tokens', 0),
+                    'total_tokens': usage.get('total_tokens', 0),
+                    'model': call['model'],
+                    'batch': batch_pricing
+                })
+
+    # 사용량 로그는 쓰기 지연 큐로 들어가므로 스크립트 종료 전에 저장
+    flush_write_queue()
+    return saved, skipped
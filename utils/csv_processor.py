@@ -184,7 +184,7 @@ def get_category_summary(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         카테고리별 집계 DataFrame
     """
-    summary = df.groupby('카테고리').agg({
+    summary = df.groupby('카테고리', observed=True).agg({
         '금액': ['sum', 'mean', 'count'],
         '필요도': 'mean',
         '사용빈도': 'mean'
@@ -5,9 +5,17 @@ Supabase 데이터베이스 연동 모듈
 """
 
 import os
+import time
+import atexit
+import hashlib
+import threading
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from typing import Optional, Dict, List, Tuple
+from collections import OrderedDict, deque
+from typing import Optional, Dict, List, Tuple, Iterator
+
+from utils.ai_telemetry import usage_cost
 
 # Supabase SDK (선택적 임포트)
 try:
@@ -19,6 +27,43 @@ except ImportError:
 # 싱글톤 클라이언트
 _supabase_client: Optional[object] = None
 
+# 대량 insert/delete 시 요청 1회당 최대 행 수 (요청 크기·URL 길이 제한 대응)
+BATCH_CHUNK_SIZE = 500
+DELETE_CHUNK_SIZE = 200
+
+# 구매 이력 조회 페이지 크기 (PostgREST 기본 max-rows 이하)
+PURCHASE_PAGE_SIZE = 1000
+
+# 사용자별 구매 이력 캐시 유지 시간 (초) - 다른 클라이언트(모바일 앱) 변경 반영 주기
+PURCHASE_CACHE_TTL = int(os.getenv('PURCHASE_CACHE_TTL', '300'))
+# 구매 이력 캐시 최대 사용자 수 (초과 시 가장 오래 사용하지 않은 사용자부터 제거)
+PURCHASE_CACHE_MAX_USERS = int(os.getenv('PURCHASE_CACHE_MAX_USERS', '64'))
+
+# 쓰기 지연(write-behind) 큐: 최대 대기 작업 수, 저장 주기(초), 실패 시 최대 재시도 횟수
+WRITE_QUEUE_MAX = int(os.getenv('DB_WRITE_QUEUE_MAX', '2000'))
+WRITE_QUEUE_FLUSH_INTERVAL = float(os.getenv('DB_WRITE_QUEUE_FLUSH_INTERVAL', '2'))
+WRITE_QUEUE_MAX_RETRIES = 5
+
+# 세션 프로필 캐시에 필요한 users 컬럼만 조회
+USER_PROFILE_COLUMNS = 'id, email, usage_count, is_subscribed, is_admin, language, purchase_count'
+
+# 일별 집계 조회 페이지 크기
+ROLLUP_PAGE_SIZE = 1000
+
+# 분석 이력 목록 미리보기 길이 (글자)
+ANALYSIS_PREVIEW_CHARS = 300
+
+# 분석 이력 목록에 필요한 analyses 컬럼만 조회 (본문 제외)
+ANALYSIS_LIST_COLUMNS = ('id, created_at, purchase_count, total_spent, average_regret_score, '
+                         'high_regret_count, source, language, psychology_preview, insights_preview')
+
+# CSV 중복 저장 upsert 키 (idx_purchases_user_date_row_hash, 파티션 테이블과 공용)
+PURCHASE_CONFLICT_COLUMNS = 'user_id,purchase_date,row_hash'
+
+# 분석에 필요한 purchases 컬럼만 조회
+PURCHASE_COLUMNS = ('id, purchase_date, category, product_name, amount, '
+                    'necessity_score, usage_frequency, thinking_days, repurchase_intent')
+
 
 def get_supabase_client() -> Optional[object]:
     """
@@ -80,13 +125,16 @@ def get_or_create_user(user_info: Dict) -> Optional[Dict]:
         result = client.table('users').select('*').eq('email', email).execute()
 
         if result.data:
-            # 기존 사용자 → last_login 업데이트
+            # 기존 사용자 → last_login 업데이트 (로그인 화면을 막지 않도록 쓰기 지연 큐로)
             user = result.data[0]
-            client.table('users').update({
-                'last_login': datetime.utcnow().isoformat(),
-                'name': user_info.get('name', user.get('name')),
-                'picture_url': user_info.get('picture', user.get('picture_url'))
-            }).eq('id', user['id']).execute()
+            get_write_queue().submit('last_login', {
+                'user_id': user['id'],
+                'values': {
+                    'last_login': datetime.utcnow().isoformat(),
+                    'name': user_info.get('name', user.get('name')),
+                    'picture_url': user_info.get('picture', user.get('picture_url'))
+                }
+            })
             return user
         else:
             # 신규 사용자 생성
@@ -121,49 +169,55 @@ def get_user_by_email(email: str) -> Optional[Dict]:
         return None
 
 
-def get_usage_count(user_id: str) -> Tuple[bool, int, bool]:
+def load_user_profile(email: str) -> Optional[Dict]:
     """
-    사용 횟수 확인
+    세션 프로필용 사용자 조회 (1회 왕복)
 
     Returns:
-        (사용 가능 여부, 남은 횟수, 구독 상태)
+        {id, email, usage_count, is_subscribed, is_admin, language, purchase_count} 또는 None
     """
     client = get_supabase_client()
     if not client:
-        return True, 5, False  # DB 없으면 기본값
+        return None
 
     try:
-        result = client.table('users').select('usage_count, is_subscribed').eq('id', user_id).execute()
-        if not result.data:
-            return True, 5, False
-
-        user = result.data[0]
-        if user['is_subscribed']:
-            return True, -1, True
+        result = client.table('users').select(USER_PROFILE_COLUMNS).eq('email', email).execute()
+        return result.data[0] if result.data else None
+    except Exception:
+        return None
 
-        remaining = 5 - user['usage_count']
-        return (remaining > 0), max(remaining, 0), False
 
-    except Exception:
-        return True, 5, False
+def use_quota(email: str, limit: int = 5, consume: bool = False) -> Optional[Tuple[bool, int, bool]]:
+    """
+    무료 사용 횟수 확인/차감 (use_quota RPC - 한 번의 왕복, 동시 요청에도 초과 차감 없음)
 
+    Args:
+        email: 사용자 이메일
+        limit: 무료 사용 한도
+        consume: True면 남은 횟수가 있을 때만 1회 차감 (조건부 UPDATE로 원자적)
 
-def increment_usage(user_id: str) -> None:
-    """사용 횟수 +1"""
+    Returns:
+        (사용 가능 여부, 남은 횟수, 구독 상태) - 구독자는 남은 횟수 -1
+        차감 시 '사용 가능'은 이번 차감 성공 여부. DB 오류/사용자 없음은 None (호출 측 fallback)
+    """
     client = get_supabase_client()
     if not client:
-        return
+        return None
 
     try:
-        # 현재 값 조회 후 +1
-        result = client.table('users').select('usage_count, is_subscribed').eq('id', user_id).execute()
-        if result.data and not result.data[0].get('is_subscribed', False):
-            current = result.data[0]['usage_count']
-            client.table('users').update({
-                'usage_count': current + 1
-            }).eq('id', user_id).execute()
+        result = client.rpc('use_quota', {
+            'p_email': email,
+            'p_limit': limit,
+            'p_consume': consume
+        }).execute()
+        if not result.data:
+            return None
+
+        row = result.data[0]
+        return bool(row['allowed']), int(row['remaining']), bool(row['is_subscribed'])
+
     except Exception:
-        pass
+        return None
 
 
 def is_admin(user_id: str) -> bool:
@@ -246,10 +300,74 @@ def update_language(user_id: str, lang: str) -> None:
 # Purchases CRUD
 # ============================================
 
+def _chunks(items: List, size: int):
+    """리스트를 size 단위로 나누기"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _build_purchase_row(user_id: str, purchase_data: Dict, source: str) -> Dict:
+    """
+    앱 내부 컬럼(날짜, 카테고리, ...) → purchases 테이블 row 변환
+
+    Args:
+        user_id: 사용자 UUID
+        purchase_data: {날짜, 카테고리, 상품명, 금액, 필요도, 사용빈도, 고민기간?, 재구매의향?}
+        source: 'csv' 또는 'manual'
+
+    Returns:
+        purchases insert용 dict
+    """
+    row = {
+        'user_id': user_id,
+        'purchase_date': str(purchase_data.get('날짜', ''))[:10],
+        'category': str(purchase_data.get('카테고리', '')),
+        'product_name': str(purchase_data.get('상품명', '')),
+        'amount': int(float(purchase_data.get('금액', 0))),
+        'necessity_score': int(purchase_data.get('필요도', 3)),
+        'usage_frequency': int(purchase_data.get('사용빈도', 3)),
+        'source': source
+    }
+
+    # 고민기간, 재구매의향 (있는 경우)
+    thinking_days = purchase_data.get('고민기간')
+    if thinking_days is not None and pd.notna(thinking_days):
+        row['thinking_days'] = int(thinking_days)
+    intent = purchase_data.get('재구매의향')
+    if intent is not None and pd.notna(intent):
+        row['repurchase_intent'] = str(intent).strip().lower() in ('예', 'yes', 'y', '1', 'はい')
+
+    return row
+
+
+def make_purchase_hash(user_id: str, purchase_date: str, category: str,
+                       product_name: str, amount: int, occurrence: int = 0) -> str:
+    """
+    구매 행 자연키 해시 (중복 저장 방지용)
+
+    Args:
+        user_id: 사용자 UUID
+        purchase_date: 구매일 (YYYY-MM-DD)
+        category: 카테고리
+        product_name: 상품명
+        amount: 금액
+        occurrence: 같은 파일 내 동일 자연키의 몇 번째 행인지 (0부터)
+
+    Returns:
+        SHA-256 hex 문자열
+    """
+    key = f"{user_id}|{purchase_date}|{category}|{product_name}|{amount}|{occurrence}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
 def save_purchases(user_id: str, df: pd.DataFrame, source: str = 'manual') -> bool:
     """
     DataFrame의 구매 이력을 DB에 저장
 
+    각 행에 자연키(사용자, 날짜, 카테고리, 상품명, 금액) 해시를 붙여
+    (user_id, purchase_date, row_hash) 충돌 시 무시하는 upsert로 저장하므로,
+    같은 파일을 다시 저장해도 중복 행이 생기지 않습니다.
+
     Args:
         user_id: 사용자 UUID
         df: 구매 데이터 DataFrame
@@ -264,31 +382,28 @@ def save_purchases(user_id: str, df: pd.DataFrame, source: str = 'manual') -> bo
 
     try:
         rows = []
-        for _, row in df.iterrows():
-            purchase = {
-                'user_id': user_id,
-                'purchase_date': str(row.get('날짜', ''))[:10],
-                'category': str(row.get('카테고리', '')),
-                'product_name': str(row.get('상품명', '')),
-                'amount': int(float(row.get('금액', 0))),
-                'necessity_score': int(row.get('필요도', 3)),
-                'usage_frequency': int(row.get('사용빈도', 3)),
-                'source': source
-            }
+        occurrences: Dict[Tuple, int] = {}
+        for record in df.to_dict('records'):
+            purchase = _build_purchase_row(user_id, record, source)
 
-            # 고민기간, 재구매의향 (있는 경우)
-            if '고민기간' in row and pd.notna(row['고민기간']):
-                purchase['thinking_days'] = int(row['고민기간'])
-            if '재구매의향' in row and pd.notna(row['재구매의향']):
-                intent = str(row['재구매의향']).strip().lower()
-                purchase['repurchase_intent'] = intent in ('예', 'yes', 'y', '1', 'はい')
+            # 자연키 해시 (같은 파일 안의 동일 행은 순번으로 구분)
+            natural_key = (purchase['purchase_date'], purchase['category'],
+                           purchase['product_name'], purchase['amount'])
+            occurrence = occurrences.get(natural_key, 0)
+            occurrences[natural_key] = occurrence + 1
+            purchase['row_hash'] = make_purchase_hash(user_id, *natural_key, occurrence=occurrence)
 
             rows.append(purchase)
 
-        if rows:
-            client.table('purchases').insert(rows).execute()
-            return True
-        return False
+        if not rows:
+            return False
+
+        for chunk in _chunks(rows, BATCH_CHUNK_SIZE):
+            (client.table('purchases')
+             .upsert(chunk, on_conflict=PURCHASE_CONFLICT_COLUMNS, ignore_duplicates=True)
+             .execute())
+        invalidate_purchase_cache(user_id)
+        return True
 
     except Exception:
         return False
@@ -310,89 +425,279 @@ def save_single_purchase(user_id: str, purchase_data: dict) -> bool:
         return False
 
     try:
-        row = {
-            'user_id': user_id,
-            'purchase_date': str(purchase_data.get('날짜', ''))[:10],
-            'category': str(purchase_data.get('카테고리', '')),
-            'product_name': str(purchase_data.get('상품명', '')),
-            'amount': int(float(purchase_data.get('금액', 0))),
-            'necessity_score': int(purchase_data.get('필요도', 3)),
-            'usage_frequency': int(purchase_data.get('사용빈도', 3)),
-            'source': 'manual'
-        }
+        row = _build_purchase_row(user_id, purchase_data, 'manual')
+        client.table('purchases').insert(row).execute()
+        invalidate_purchase_cache(user_id)
+        return True
 
-        if purchase_data.get('고민기간') is not None:
-            row['thinking_days'] = int(purchase_data['고민기간'])
-        if purchase_data.get('재구매의향') is not None:
-            intent = str(purchase_data['재구매의향']).strip().lower()
-            row['repurchase_intent'] = intent in ('예', 'yes', 'y', '1', 'はい')
+    except Exception:
+        return False
 
-        client.table('purchases').insert(row).execute()
+
+def save_purchase_items(user_id: str, items: List[Dict]) -> bool:
+    """
+    여러 구매 건을 한 번에 저장 (가계부 대기 목록용)
+
+    BATCH_CHUNK_SIZE 단위의 multi-row insert로 저장하므로
+    N건 저장이 N번이 아닌 ceil(N / BATCH_CHUNK_SIZE)번의 요청으로 끝납니다.
+
+    Args:
+        user_id: 사용자 UUID
+        items: [{날짜, 카테고리, 상품명, 금액, 필요도, 사용빈도, 고민기간?, 재구매의향?}, ...]
+
+    Returns:
+        성공 여부
+    """
+    client = get_supabase_client()
+    if not client or not items:
+        return False
+
+    try:
+        rows = [_build_purchase_row(user_id, item, 'manual') for item in items]
+        for chunk in _chunks(rows, BATCH_CHUNK_SIZE):
+            client.table('purchases').insert(chunk).execute()
+        invalidate_purchase_cache(user_id)
         return True
 
     except Exception:
         return False
 
 
-def load_purchases(user_id: str, date_from: str = None, date_to: str = None, include_id: bool = False) -> Optional[pd.DataFrame]:
+def _purchase_page_to_frame(records: List[Dict], include_id: bool) -> pd.DataFrame:
     """
-    DB에서 사용자의 구매 이력 로드
+    purchases 조회 결과 1페이지 → 앱 내부 컬럼 DataFrame (열 단위 변환)
+
+    Args:
+        records: PostgREST 응답 rows
+        include_id: True면 DB id 컬럼(_id) 포함
+
+    Returns:
+        구매 이력 DataFrame
+    """
+    page = pd.DataFrame.from_records(records)
+
+    df = pd.DataFrame({
+        '날짜': pd.to_datetime(page['purchase_date']),
+        '카테고리': page['category'],
+        '상품명': page['product_name'].fillna(''),
+        '금액': pd.to_numeric(page['amount']).astype('float64'),
+        '필요도': pd.to_numeric(page['necessity_score']).fillna(3).astype('int8'),
+        '사용빈도': pd.to_numeric(page['usage_frequency']).fillna(3).astype('int8'),
+    })
+    if include_id:
+        df['_id'] = page['id'].astype('int64')
+    if page['thinking_days'].notna().any():
+        df['고민기간'] = pd.to_numeric(page['thinking_days']).astype('Int16')
+    if page['repurchase_intent'].notna().any():
+        df['재구매의향'] = page['repurchase_intent'].map({True: '예', False: '아니오'})
+
+    return df
+
+
+def iter_purchase_pages(user_id: str, date_from: str = None, date_to: str = None,
+                        include_id: bool = False,
+                        page_size: int = PURCHASE_PAGE_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    구매 이력을 페이지 단위로 조회 (최신순, keyset pagination)
+
+    (purchase_date, id) 내림차순으로 정렬하고 마지막 행 이후부터 다음 페이지를
+    요청하므로 offset 없이 전체 이력을 끝까지 읽습니다.
+    각 페이지는 (user_id, purchase_date DESC, id DESC) 인덱스의 범위 스캔으로 처리됩니다.
 
     Args:
         user_id: 사용자 UUID
         date_from: 시작일 (YYYY-MM-DD), None이면 전체
         date_to: 종료일 (YYYY-MM-DD), None이면 전체
         include_id: True면 DB id 컬럼 포함 (삭제용)
+        page_size: 페이지당 행 수
 
-    Returns:
-        구매 이력 DataFrame 또는 None
+    Yields:
+        페이지별 구매 이력 DataFrame
     """
     client = get_supabase_client()
     if not client:
-        return None
+        return
 
-    try:
+    last_row = None
+    while True:
         query = (client.table('purchases')
-                 .select('*')
+                 .select(PURCHASE_COLUMNS)
                  .eq('user_id', user_id))
 
         if date_from:
             query = query.gte('purchase_date', date_from)
         if date_to:
             query = query.lte('purchase_date', date_to)
-
-        result = query.order('purchase_date', desc=True).execute()
+        if last_row is not None:
+            last_date, last_id = last_row['purchase_date'], last_row['id']
+            # 범위 조건을 따로 주어 인덱스 스캔이 마지막 날짜에서 시작하도록
+            # (OR 조건만 있으면 매 페이지 사용자 이력 처음부터 걸러냄)
+            query = query.lte('purchase_date', last_date)
+            query = query.or_(
+                f"purchase_date.lt.{last_date},"
+                f"and(purchase_date.eq.{last_date},id.lt.{last_id})"
+            )
+
+        result = (query.order('purchase_date', desc=True)
+                  .order('id', desc=True)
+                  .limit(page_size)
+                  .execute())
 
         if not result.data:
-            return None
+            return
 
-        # DB 컬럼 → 앱 내부 컬럼명으로 변환
-        rows = []
-        for r in result.data:
-            row = {
-                '날짜': r['purchase_date'],
-                '카테고리': r['category'],
-                '상품명': r['product_name'] or '',
-                '금액': float(r['amount']),
-                '필요도': r['necessity_score'] or 3,
-                '사용빈도': r['usage_frequency'] or 3,
-            }
-            if include_id:
-                row['_id'] = r['id']
-            if r.get('thinking_days') is not None:
-                row['고민기간'] = r['thinking_days']
-            if r.get('repurchase_intent') is not None:
-                row['재구매의향'] = '예' if r['repurchase_intent'] else '아니오'
-            rows.append(row)
-
-        df = pd.DataFrame(rows)
-        df['날짜'] = pd.to_datetime(df['날짜'])
-        return df
+        yield _purchase_page_to_frame(result.data, include_id)
+
+        if len(result.data) < page_size:
+            return
+        last_row = result.data[-1]
+
+
+def load_purchases(user_id: str, date_from: str = None, date_to: str = None, include_id: bool = False) -> Optional[pd.DataFrame]:
+    """
+    DB에서 사용자의 구매 이력 로드
 
+    Args:
+        user_id: 사용자 UUID
+        date_from: 시작일 (YYYY-MM-DD), None이면 전체
+        date_to: 종료일 (YYYY-MM-DD), None이면 전체
+        include_id: True면 DB id 컬럼 포함 (삭제용)
+
+    Returns:
+        구매 이력 DataFrame 또는 None
+    """
+    try:
+        return _fetch_purchases(user_id, date_from, date_to, include_id)
     except Exception:
         return None
 
 
+def _fetch_purchases(user_id: str, date_from: str = None, date_to: str = None,
+                     include_id: bool = False) -> Optional[pd.DataFrame]:
+    """전체 페이지를 읽어 하나의 DataFrame으로 합치기 (조회 실패 시 예외 전달)"""
+    pages = list(iter_purchase_pages(user_id, date_from, date_to, include_id))
+    if not pages:
+        return None
+
+    df = pd.concat(pages, ignore_index=True)
+    df['카테고리'] = df['카테고리'].astype('category')
+    return df
+
+
+# ============================================
+# Purchases 캐시 (사용자별 read-through)
+# ============================================
+
+# {user_id: {'version': int, 'loaded_at': float, 'df': 날짜 오름차순 DataFrame 또는 None}}
+# 최근 사용 순서 유지 (LRU) - 최대 PURCHASE_CACHE_MAX_USERS명
+_purchase_cache: "OrderedDict[str, Dict]" = OrderedDict()
+# {user_id: 데이터 버전} - 이 프로세스에서 구매 이력을 쓸 때마다 증가
+_purchase_versions: Dict[str, int] = {}
+_purchase_cache_lock = threading.Lock()
+
+
+def _evict_purchase_cache() -> None:
+    """만료된 항목 제거 후 최대 사용자 수까지 오래된 항목 제거 (_purchase_cache_lock 안에서 호출)"""
+    now = time.monotonic()
+    for user_id in [uid for uid, entry in _purchase_cache.items()
+                    if now - entry['loaded_at'] >= PURCHASE_CACHE_TTL]:
+        del _purchase_cache[user_id]
+
+    while len(_purchase_cache) > PURCHASE_CACHE_MAX_USERS:
+        _purchase_cache.popitem(last=False)
+
+
+def get_purchase_data_version(user_id: str) -> int:
+    """사용자 구매 이력 데이터 버전 (저장/삭제 시 증가)"""
+    with _purchase_cache_lock:
+        return _purchase_versions.get(user_id, 0)
+
+
+def invalidate_purchase_cache(user_id: str) -> None:
+    """사용자 구매 이력 캐시 무효화 (데이터 버전 증가)"""
+    with _purchase_cache_lock:
+        _purchase_versions[user_id] = _purchase_versions.get(user_id, 0) + 1
+        _purchase_cache.pop(user_id, None)
+
+
+def _patch_purchase_cache_delete(user_id: str, purchase_ids: List[int]) -> None:
+    """삭제된 행을 캐시에서 제거 (재조회 없이 반영)"""
+    with _purchase_cache_lock:
+        _purchase_versions[user_id] = _purchase_versions.get(user_id, 0) + 1
+        entry = _purchase_cache.get(user_id)
+        if entry is None:
+            return
+        entry['version'] = _purchase_versions[user_id]
+        if entry['df'] is not None:
+            df = entry['df']
+            df = df[~df['_id'].isin(purchase_ids)].reset_index(drop=True)
+            entry['df'] = df if len(df) > 0 else None
+
+
+def load_purchases_cached(user_id: str, date_from: str = None, date_to: str = None,
+                          include_id: bool = False) -> Optional[pd.DataFrame]:
+    """
+    캐시를 거쳐 구매 이력 로드 (load_purchases와 같은 형태로 반환)
+
+    사용자 전체 이력을 한 번 읽어 날짜 오름차순으로 보관하고,
+    기간 필터는 정렬된 날짜에 대한 이진 탐색으로 잘라서 반환합니다.
+    저장/삭제 함수가 캐시를 무효화/갱신하므로 변경이 없으면 DB 호출이 없습니다.
+
+    Args:
+        user_id: 사용자 UUID
+        date_from: 시작일 (YYYY-MM-DD), None이면 전체
+        date_to: 종료일 (YYYY-MM-DD), None이면 전체
+        include_id: True면 DB id 컬럼 포함 (삭제용)
+
+    Returns:
+        구매 이력 DataFrame (최신순) 또는 None
+    """
+    with _purchase_cache_lock:
+        _evict_purchase_cache()
+        version = _purchase_versions.get(user_id, 0)
+        entry = _purchase_cache.get(user_id)
+        if entry is not None:
+            _purchase_cache.move_to_end(user_id)
+
+    fresh = entry is not None and entry['version'] == version
+
+    if not fresh:
+        if not is_db_available():
+            return None
+        try:
+            full_df = _fetch_purchases(user_id, include_id=True)
+        except Exception:
+            return None
+        if full_df is not None:
+            full_df = full_df.sort_values(['날짜', '_id'], kind='stable').reset_index(drop=True)
+        entry = {'version': version, 'loaded_at': time.monotonic(), 'df': full_df}
+        with _purchase_cache_lock:
+            # 조회 중 다른 쓰기가 있었으면 캐시에 넣지 않음
+            if _purchase_versions.get(user_id, 0) == version:
+                _purchase_cache[user_id] = entry
+                _purchase_cache.move_to_end(user_id)
+                _evict_purchase_cache()
+
+    df = entry['df']
+    if df is None:
+        return None
+
+    # 기간 필터: 정렬된 날짜 배열에서 이진 탐색
+    dates = df['날짜'].to_numpy()
+    start, end = 0, len(df)
+    if date_from:
+        start = int(np.searchsorted(dates, np.datetime64(pd.Timestamp(date_from)), side='left'))
+    if date_to:
+        end = int(np.searchsorted(dates, np.datetime64(pd.Timestamp(date_to)), side='right'))
+    if start >= end:
+        return None
+
+    result = df.iloc[start:end].iloc[::-1].reset_index(drop=True)
+    if not include_id:
+        result = result.drop(columns=['_id'])
+    return result.copy()
+
+
 def delete_purchases(user_id: str, purchase_ids: List[int]) -> bool:
     """선택한 구매 이력 삭제"""
     client = get_supabase_client()
@@ -400,15 +705,27 @@ def delete_purchases(user_id: str, purchase_ids: List[int]) -> bool:
         return False
 
     try:
-        for pid in purchase_ids:
-            client.table('purchases').delete().eq('id', pid).eq('user_id', user_id).execute()
+        # id 목록을 in 필터로 묶어 한 번에 삭제 (URL 길이 제한 대응으로 청크 분할)
+        for chunk in _chunks(list(purchase_ids), DELETE_CHUNK_SIZE):
+            (client.table('purchases')
+             .delete()
+             .in_('id', chunk)
+             .eq('user_id', user_id)
+             .execute())
+        _patch_purchase_cache_delete(user_id, purchase_ids)
         return True
     except Exception:
+        invalidate_purchase_cache(user_id)
         return False
 
 
 def get_purchase_count(user_id: str) -> int:
-    """사용자의 저장된 구매 이력 수"""
+    """
+    사용자의 저장된 구매 이력 수 (purchases COUNT 쿼리)
+
+    화면 표시는 세션 프로필의 users.purchase_count(트리거 유지)를 사용하고,
+    이 함수는 트리거 적용 전 DB 등 정확한 재집계가 필요할 때만 사용합니다.
+    """
     client = get_supabase_client()
     if not client:
         return 0
@@ -423,10 +740,270 @@ def get_purchase_count(user_id: str) -> int:
         return 0
 
 
+# ============================================
+# 구매 이력 집계 (서버 측 RPC)
+# ============================================
+
+# purchase_category_summary 컬럼 → get_category_summary 컬럼
+CATEGORY_SUMMARY_COLUMNS = {
+    'category': '카테고리',
+    'total_amount': '총_금액',
+    'avg_amount': '평균_금액',
+    'purchase_count': '구매_건수',
+    'avg_necessity': '평균_필요도',
+    'avg_usage': '평균_사용빈도'
+}
+
+# purchase_monthly_summary 컬럼 → 월별 추이 차트 컬럼
+MONTHLY_SUMMARY_COLUMNS = {
+    'month': '연월',
+    'total_amount': '총_금액',
+    'purchase_count': '구매_건수'
+}
+
+
+def _category_summary_frame(records: List[Dict]) -> pd.DataFrame:
+    """purchase_category_summary 결과 → get_category_summary와 같은 DataFrame"""
+    df = pd.DataFrame(records, columns=list(CATEGORY_SUMMARY_COLUMNS) + ['first_date', 'last_date'])
+    df = df[list(CATEGORY_SUMMARY_COLUMNS)].rename(columns=CATEGORY_SUMMARY_COLUMNS)
+    for col in ('총_금액', '평균_금액', '평균_필요도', '평균_사용빈도'):
+        df[col] = pd.to_numeric(df[col]).astype(float).round(1)
+    df['구매_건수'] = df['구매_건수'].astype(int)
+    return df.sort_values('총_금액', ascending=False).reset_index(drop=True)
+
+
+def _monthly_summary_frame(records: List[Dict]) -> pd.DataFrame:
+    """purchase_monthly_summary 결과 → [연월, 총_금액, 구매_건수] DataFrame"""
+    df = pd.DataFrame(records, columns=list(MONTHLY_SUMMARY_COLUMNS)).rename(columns=MONTHLY_SUMMARY_COLUMNS)
+    df['총_금액'] = pd.to_numeric(df['총_금액']).astype(float)
+    df['구매_건수'] = df['구매_건수'].astype(int)
+    return df
+
+
+def _summary_params(user_id: str, date_from: str = None, date_to: str = None) -> Dict:
+    return {'p_user_id': user_id, 'p_from': date_from, 'p_to': date_to}
+
+
+def load_category_summary(user_id: str, date_from: str = None,
+                          date_to: str = None) -> Optional[pd.DataFrame]:
+    """
+    카테고리별 집계 (purchase_category_summary RPC)
+
+    Returns:
+        get_category_summary와 같은 형태의 DataFrame 또는 None (DB 불가/오류)
+    """
+    client = get_supabase_client()
+    if not client:
+        return None
+
+    try:
+        result = client.rpc('purchase_category_summary',
+                            _summary_params(user_id, date_from, date_to)).execute()
+        return _category_summary_frame(result.data or [])
+    except Exception:
+        return None
+
+
+def load_monthly_summary(user_id: str, date_from: str = None,
+                         date_to: str = None) -> Optional[pd.DataFrame]:
+    """
+    월별 집계 (purchase_monthly_summary RPC)
+
+    Returns:
+        [연월, 총_금액, 구매_건수] DataFrame (연월 오름차순) 또는 None
+    """
+    client = get_supabase_client()
+    if not client:
+        return None
+
+    try:
+        result = client.rpc('purchase_monthly_summary',
+                            _summary_params(user_id, date_from, date_to)).execute()
+        return _monthly_summary_frame(result.data or [])
+    except Exception:
+        return None
+
+
+def load_purchase_summary(user_id: str, date_from: str = None,
+                          date_to: str = None) -> Optional[Dict]:
+    """
+    대시보드 요약용 집계 한 번에 조회 (purchase_summary RPC, 원본 행 없이 수백 바이트)
+
+    Args:
+        user_id: 사용자 UUID
+        date_from: 시작일 (YYYY-MM-DD), None이면 전체
+        date_to: 종료일 (YYYY-MM-DD), None이면 전체
+
+    Returns:
+        {
+            'categories': get_category_summary 형태 DataFrame,
+            'monthly': [연월, 총_금액, 구매_건수] DataFrame,
+            'first_date': 첫 구매일 (Timestamp), 'last_date': 마지막 구매일 (Timestamp)
+        }
+        또는 None (DB 불가/오류/구매 이력 없음)
+    """
+    client = get_supabase_client()
+    if not client:
+        return None
+
+    try:
+        data = client.rpc('purchase_summary', _summary_params(user_id, date_from, date_to)).execute().data
+        if not data or not data.get('categories'):
+            return None
+
+        categories = data['categories']
+        return {
+            'categories': _category_summary_frame(categories),
+            'monthly': _monthly_summary_frame(data.get('monthly') or []),
+            'first_date': pd.to_datetime(min(c['first_date'] for c in categories)),
+            'last_date': pd.to_datetime(max(c['last_date'] for c in categories))
+        }
+    except Exception:
+        return None
+
+
+# ============================================
+# 일별 집계 (purchase_daily_rollups, purchases 트리거가 유지)
+# ============================================
+
+# purchase_daily_rollups 컬럼 → 앱 내부 컬럼
+DAILY_ROLLUP_COLUMNS = {
+    'day': '날짜',
+    'category': '카테고리',
+    'total_amount': '총_금액',
+    'purchase_count': '구매_건수',
+    'max_amount': '최대_금액',
+    'necessity_sum': '필요도_합계',
+    'usage_sum': '사용빈도_합계'
+}
+
+
+def load_daily_rollups(user_id: str, date_from: str = None,
+                       date_to: str = None) -> Optional[pd.DataFrame]:
+    """
+    사용자의 (날짜, 카테고리)별 구매 집계 로드
+
+    행 수는 구매 건수가 아니라 구매한 날짜 × 카테고리 수에 비례합니다.
+
+    Args:
+        user_id: 사용자 UUID
+        date_from: 시작일 (YYYY-MM-DD), None이면 전체
+        date_to: 종료일 (YYYY-MM-DD), None이면 전체
+
+    Returns:
+        [날짜, 카테고리, 총_금액, 구매_건수, 최대_금액, 필요도_합계, 사용빈도_합계] DataFrame
+        (날짜 오름차순, 이력이 없으면 빈 DataFrame) 또는 None (DB 불가/오류)
+    """
+    client = get_supabase_client()
+    if not client:
+        return None
+
+    try:
+        records = []
+        while True:
+            query = (client.table('purchase_daily_rollups')
+                     .select(', '.join(DAILY_ROLLUP_COLUMNS))
+                     .eq('user_id', user_id))
+            if date_from:
+                query = query.gte('day', date_from)
+            if date_to:
+                query = query.lte('day', date_to)
+
+            start = len(records)
+            result = (query.order('day').order('category')
+                      .range(start, start + ROLLUP_PAGE_SIZE - 1)
+                      .execute())
+            records.extend(result.data or [])
+            if len(result.data or []) < ROLLUP_PAGE_SIZE:
+                break
+
+        df = pd.DataFrame(records, columns=list(DAILY_ROLLUP_COLUMNS)).rename(columns=DAILY_ROLLUP_COLUMNS)
+        df['날짜'] = pd.to_datetime(df['날짜'])
+        for col in ('총_금액', '최대_금액'):
+            df[col] = pd.to_numeric(df[col]).astype('float64')
+        for col in ('구매_건수', '필요도_합계', '사용빈도_합계'):
+            df[col] = df[col].astype('int64')
+        return df
+    except Exception:
+        return None
+
+
+def summarize_daily_rollups(rollups: pd.DataFrame, date_from: str = None,
+                            date_to: str = None) -> Optional[Dict]:
+    """
+    일별 집계 → load_purchase_summary와 같은 형태의 요약 (기간 변경 시 DB 재조회 없이 사용)
+
+    Args:
+        rollups: load_daily_rollups 결과
+        date_from: 시작일 (YYYY-MM-DD), None이면 전체
+        date_to: 종료일 (YYYY-MM-DD), None이면 전체
+
+    Returns:
+        {'categories', 'monthly', 'first_date', 'last_date'} 또는 None (해당 기간 이력 없음)
+    """
+    if date_from:
+        rollups = rollups[rollups['날짜'] >= pd.Timestamp(date_from)]
+    if date_to:
+        rollups = rollups[rollups['날짜'] <= pd.Timestamp(date_to)]
+    if rollups is None or len(rollups) == 0:
+        return None
+
+    by_category = rollups.groupby('카테고리', observed=True).agg(
+        total_amount=('총_금액', 'sum'),
+        purchase_count=('구매_건수', 'sum'),
+        necessity_sum=('필요도_합계', 'sum'),
+        usage_sum=('사용빈도_합계', 'sum')
+    ).reset_index().rename(columns={'카테고리': 'category'})
+    by_category['avg_amount'] = by_category['total_amount'] / by_category['purchase_count']
+    by_category['avg_necessity'] = by_category['necessity_sum'] / by_category['purchase_count']
+    by_category['avg_usage'] = by_category['usage_sum'] / by_category['purchase_count']
+
+    by_month = rollups.groupby(rollups['날짜'].dt.to_period('M').astype(str)).agg(
+        total_amount=('총_금액', 'sum'),
+        purchase_count=('구매_건수', 'sum')
+    ).reset_index().rename(columns={'날짜': 'month'})
+
+    return {
+        'categories': _category_summary_frame(by_category.to_dict('records')),
+        'monthly': _monthly_summary_frame(by_month.to_dict('records')),
+        'first_date': rollups['날짜'].min(),
+        'last_date': rollups['날짜'].max()
+    }
+
+
 # ============================================
 # Analyses CRUD
 # ============================================
 
+def make_analysis_preview(text: Optional[str]) -> str:
+    """분석 본문 → 목록 미리보기 (앞 ANALYSIS_PREVIEW_CHARS자, 잘렸으면 '…')"""
+    text = text or ''
+    if len(text) > ANALYSIS_PREVIEW_CHARS:
+        return text[:ANALYSIS_PREVIEW_CHARS] + "\u2026"
+    return text
+
+
+def _build_analysis_row(user_id: str, analysis_data: Dict) -> Dict:
+    """save_analysis 인자 → analyses 행 (목록용 미리보기 포함)"""
+    psychology = analysis_data.get('psychology_analysis', '')
+    insights = analysis_data.get('smart_insights', '')
+    row = {
+        'user_id': user_id,
+        'purchase_count': analysis_data.get('purchase_count', 0),
+        'total_spent': analysis_data.get('total_spent', 0),
+        'average_regret_score': analysis_data.get('average_regret_score', 0),
+        'high_regret_count': analysis_data.get('high_regret_count', 0),
+        'psychology_analysis': psychology,
+        'smart_insights': insights,
+        'psychology_preview': make_analysis_preview(psychology),
+        'insights_preview': make_analysis_preview(insights),
+        # 배치 사전 생성 결과는 출처/언어 기록 (묶음 insert에서 NULL이 되지 않도록 항상 포함)
+        'source': analysis_data.get('source') or 'interactive',
+        'language': analysis_data.get('language')
+    }
+    return row
+
+
 def save_analysis(user_id: str, analysis_data: Dict) -> Optional[int]:
     """
     분석 결과 저장
@@ -435,7 +1012,8 @@ def save_analysis(user_id: str, analysis_data: Dict) -> Optional[int]:
         user_id: 사용자 UUID
         analysis_data: {
             purchase_count, total_spent, average_regret_score,
-            high_regret_count, psychology_analysis, smart_insights
+            high_regret_count, psychology_analysis, smart_insights,
+            source(선택, 'batch'), language(선택)
         }
 
     Returns:
@@ -446,17 +1024,7 @@ def save_analysis(user_id: str, analysis_data: Dict) -> Optional[int]:
         return None
 
     try:
-        row = {
-            'user_id': user_id,
-            'purchase_count': analysis_data.get('purchase_count', 0),
-            'total_spent': analysis_data.get('total_spent', 0),
-            'average_regret_score': analysis_data.get('average_regret_score', 0),
-            'high_regret_count': analysis_data.get('high_regret_count', 0),
-            'psychology_analysis': analysis_data.get('psychology_analysis', ''),
-            'smart_insights': analysis_data.get('smart_insights', '')
-        }
-
-        result = client.table('analyses').insert(row).execute()
+        result = client.table('analyses').insert(_build_analysis_row(user_id, analysis_data)).execute()
         if result.data:
             return result.data[0]['id']
         return None
@@ -465,6 +1033,29 @@ def save_analysis(user_id: str, analysis_data: Dict) -> Optional[int]:
         return None
 
 
+def save_analysis_async(user_id: str, analysis_data: Dict,
+                        usage_logs: Optional[List[Tuple[str, Dict]]] = None) -> None:
+    """
+    분석 결과 + AI 사용량 로그를 쓰기 지연 큐로 저장 (화면 렌더링을 막지 않음)
+
+    분석 행이 저장되어 id가 정해진 뒤 사용량 로그에 analysis_id를 채워 함께 저장합니다.
+    직후 rerun의 분석 이력에는 저장 주기(DB_WRITE_QUEUE_FLUSH_INTERVAL)만큼 늦게 보일 수 있습니다.
+
+    Args:
+        user_id: 사용자 UUID
+        analysis_data: save_analysis와 동일
+        usage_logs: [(call_type, usage), ...] - log_ai_usage 인자와 동일
+    """
+    if not get_supabase_client():
+        return
+
+    get_write_queue().submit('analysis', {
+        'row': _build_analysis_row(user_id, analysis_data),
+        'usage_rows': [_build_usage_row(user_id, None, call_type, usage)
+                       for call_type, usage in (usage_logs or []) if usage]
+    })
+
+
 def load_analyses(user_id: str, limit: int = 10) -> List[Dict]:
     """
     분석 이력 조회 (최신순)
@@ -488,12 +1079,114 @@ def load_analyses(user_id: str, limit: int = 10) -> List[Dict]:
         return []
 
 
+def load_analysis_list(user_id: str, limit: int = 5) -> List[Dict]:
+    """
+    분석 이력 목록 조회 (최신순, 메타데이터 + 미리보기만 - 본문 제외)
+
+    Returns:
+        [{id, created_at, purchase_count, total_spent, average_regret_score, high_regret_count,
+          source, language, psychology_preview, insights_preview}, ...]
+    """
+    client = get_supabase_client()
+    if not client:
+        return []
+
+    try:
+        result = (client.table('analyses')
+                  .select(ANALYSIS_LIST_COLUMNS)
+                  .eq('user_id', user_id)
+                  .order('created_at', desc=True)
+                  .limit(limit)
+                  .execute())
+        return result.data or []
+    except Exception:
+        return []
+
+
+def load_analysis_body(user_id: str, analysis_id: int) -> Optional[Dict]:
+    """
+    분석 1건의 본문 조회 (이력 목록에서 펼쳐 볼 때)
+
+    Returns:
+        {psychology_analysis, smart_insights} 또는 None
+    """
+    client = get_supabase_client()
+    if not client:
+        return None
+
+    try:
+        result = (client.table('analyses')
+                  .select('psychology_analysis, smart_insights')
+                  .eq('id', analysis_id)
+                  .eq('user_id', user_id)
+                  .execute())
+        return result.data[0] if result.data else None
+    except Exception:
+        return None
+
+
 def load_latest_analysis(user_id: str) -> Optional[Dict]:
     """최근 분석 1건 조회"""
     analyses = load_analyses(user_id, limit=1)
     return analyses[0] if analyses else None
 
 
+def find_precomputed_analysis(user_id: str, purchase_count: int, total_spent: int,
+                              language: str) -> Optional[Dict]:
+    """
+    현재 데이터와 일치하는 배치 사전 생성 분석 조회
+
+    Args:
+        user_id: 사용자 UUID
+        purchase_count: 현재 분석 대상 구매 건수
+        total_spent: 현재 분석 대상 총 지출
+        language: 언어 코드
+
+    Returns:
+        분석 결과 dict 또는 None (없거나 데이터가 달라진 경우)
+    """
+    client = get_supabase_client()
+    if not client:
+        return None
+
+    try:
+        latest = load_latest_analysis(user_id)
+        # 사전 생성 이후 화면에서 새로 분석했다면 그 결과가 최신
+        if not latest or latest.get('source') != 'batch':
+            return None
+        if latest.get('language') != language:
+            return None
+        if int(latest.get('purchase_count') or 0) != purchase_count:
+            return None
+        if int(float(latest.get('total_spent') or 0)) != total_spent:
+            return None
+        return latest
+    except Exception:
+        return None
+
+
+def load_users_pending_analysis(limit: int = 500) -> List[Dict]:
+    """
+    마지막 배치 분석 이후 구매 이력이 바뀐 사용자 조회 (배치 사전 생성 대상)
+
+    Returns:
+        [{user_id, language, purchase_count, last_purchase_at, last_analysis_at}, ...]
+    """
+    client = get_supabase_client()
+    if not client:
+        return []
+
+    try:
+        result = (client.table('users_pending_analysis')
+                  .select('*')
+                  .order('last_purchase_at', desc=True)
+                  .limit(limit)
+                  .execute())
+        return result.data or []
+    except Exception:
+        return []
+
+
 # ============================================
 # AI Usage Logs
 # ============================================
@@ -501,34 +1194,282 @@ def load_latest_analysis(user_id: str) -> Optional[Dict]:
 def log_ai_usage(user_id: str, analysis_id: Optional[int],
                  call_type: str, tokens: Dict) -> None:
     """
-    AI API 사용량 기록
+    AI API 사용량 기록 (쓰기 지연 큐 → 백그라운드에서 묶어서 저장)
 
     Args:
         user_id: 사용자 UUID
         analysis_id: 연결된 분석 ID (없으면 None)
-        call_type: 'psychology' 또는 'smart_insights'
-        tokens: {prompt_tokens, completion_tokens, total_tokens}
+        call_type: 'psychology', 'smart_insights' 또는 'combined' (통합 구조화 호출)
+        tokens: {prompt_tokens, completion_tokens, total_tokens,
+                 cached(선택), baseline_prompt_tokens(선택, 개별 호출 시 예상 입력 토큰),
+                 batch(선택, Batch API 가격 적용),
+                 model, language, latency_ms, ttft_ms, retries(선택, OpenAIService 계측 필드)}
+    """
+    if not get_supabase_client():
+        return
+
+    get_write_queue().submit('ai_usage', _build_usage_row(user_id, analysis_id, call_type, tokens))
+
+
+def _build_usage_row(user_id: str, analysis_id: Optional[int],
+                     call_type: str, tokens: Dict) -> Dict:
+    """log_ai_usage 인자 → ai_usage_logs 행"""
+    # 진행 중이던 같은 요청의 응답을 공유받은 호출은 토큰/비용을 먼저 보낸 요청의 행에만 기록
+    shared = bool(tokens.get('shared'))
+    row = {
+        'user_id': user_id,
+        'analysis_id': analysis_id,
+        'call_type': call_type,
+        'prompt_tokens': 0 if shared else tokens.get('prompt_tokens', 0),
+        'completion_tokens': 0 if shared else tokens.get('completion_tokens', 0),
+        'total_tokens': 0 if shared else tokens.get('total_tokens', 0),
+        # 캐시 적중/공유는 0, Batch API는 50% (비용 계산식은 ai_telemetry 한 곳)
+        'estimated_cost_usd': round(usage_cost(tokens), 6),
+        # 묶음 insert는 행들의 키 합집합으로 컬럼을 보내고 빠진 키를 NULL로 채우므로
+        # 모든 행이 같은 키를 갖도록 기본값까지 명시
+        'cached': bool(tokens.get('cached')),
+        'model': tokens.get('model'),
+        'language': tokens.get('language'),
+        'latency_ms': tokens.get('latency_ms'),
+        'ttft_ms': tokens.get('ttft_ms'),
+        'retries': tokens.get('retries') or 0,
+        # 통합 호출: 개별 호출 대비 예상 입력 토큰 (절감량 비교용)
+        'baseline_prompt_tokens': tokens.get('baseline_prompt_tokens') or None
+    }
+    return row
+
+
+def load_ai_usage_summary(days: int = 7) -> List[Dict]:
+    """
+    AI 사용량 일별 요약 조회 (관리자용, ai_usage_daily_summary 뷰)
+
+    Args:
+        days: 최근 N일
+
+    Returns:
+        [{day, call_type, model, calls, cache_hit_rate, retries,
+          latency_p50_ms, latency_p95_ms, ttft_p50_ms,
+          prompt_tokens, completion_tokens, cost_usd}, ...]
     """
     client = get_supabase_client()
     if not client:
-        return
+        return []
 
     try:
-        total = tokens.get('total_tokens', 0)
-        # gpt-4o-mini 기준 비용 계산 (input: $0.15/1M, output: $0.6/1M)
-        prompt_cost = tokens.get('prompt_tokens', 0) * 0.00000015
-        completion_cost = tokens.get('completion_tokens', 0) * 0.0000006
-        estimated_cost = prompt_cost + completion_cost
-
-        row = {
-            'user_id': user_id,
-            'analysis_id': analysis_id,
-            'call_type': call_type,
-            'prompt_tokens': tokens.get('prompt_tokens', 0),
-            'completion_tokens': tokens.get('completion_tokens', 0),
-            'total_tokens': total,
-            'estimated_cost_usd': round(estimated_cost, 6)
-        }
-        client.table('ai_usage_logs').insert(row).execute()
+        since = (pd.Timestamp.now() - pd.Timedelta(days=days)).strftime('%Y-%m-%d')
+        result = (client.table('ai_usage_daily_summary')
+                  .select('*')
+                  .gte('day', since)
+                  .order('day', desc=True)
+                  .execute())
+        return result.data or []
     except Exception:
-        pass
+        return []
+
+
+# ============================================
+# 쓰기 지연(write-behind) 큐
+# 분석 스냅샷, AI 사용량 로그, last_login 같은 부가 쓰기를 요청 스레드에서 떼어내
+# 백그라운드 스레드가 종류별로 묶어서 저장 (실패 시 재시도, 대기 작업 수 상한, 종료 시 저장)
+# ============================================
+
+def _is_transport_error(error: Exception) -> bool:
+    """요청이 서버에 닿지 못한 오류 (연결/타임아웃) 여부 - 데이터 거절(APIError)과 구분"""
+    if isinstance(error, (OSError, ConnectionError, TimeoutError)):
+        return True
+    return type(error).__module__.split('.')[0] in ('httpx', 'httpcore')
+
+
+class WriteBehindQueue:
+    """부가 쓰기 작업 큐 ('analysis', 'ai_usage', 'last_login')"""
+
+    def __init__(self, max_jobs: int = WRITE_QUEUE_MAX,
+                 flush_interval: float = WRITE_QUEUE_FLUSH_INTERVAL,
+                 max_retries: int = WRITE_QUEUE_MAX_RETRIES):
+        """
+        Args:
+            max_jobs: 최대 대기 작업 수 (넘치면 가장 오래된 작업부터 버림)
+            flush_interval: 저장 주기 (초, 연속 실패 시 최대 60초까지 두 배씩 늘림)
+            max_retries: 작업별 최대 재시도 횟수 (넘으면 버림)
+        """
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        self._jobs: deque = deque(maxlen=max_jobs)
+        self._lock = threading.Lock()
+        # 저장은 한 번에 하나만 (백그라운드 주기 저장과 종료 시 저장이 겹치지 않도록)
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._failures = 0
+        self._stats = {'submitted': 0, 'written': 0, 'retried': 0, 'dropped': 0}
+
+    def submit(self, kind: str, payload: Dict) -> None:
+        """
+        작업 추가 (저장은 백그라운드 스레드에서)
+
+        Args:
+            kind: 'analysis' ({row, usage_rows}), 'ai_usage' (행), 'last_login' ({user_id, values})
+            payload: 작업 내용
+        """
+        with self._lock:
+            if len(self._jobs) == self._jobs.maxlen:
+                self._stats['dropped'] += 1
+                print(f"[DB Write Queue] 대기 작업 {self._jobs.maxlen}개 초과 - 가장 오래된 작업 버림")
+            self._jobs.append({'kind': kind, 'payload': payload, 'attempts': 0})
+            self._stats['submitted'] += 1
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def stats(self) -> Dict:
+        """누적 통계 {submitted, written, retried, dropped, pending}"""
+        with self._lock:
+            return dict(self._stats, pending=len(self._jobs))
+
+    def flush(self) -> int:
+        """
+        대기 중인 작업을 종류별로 묶어서 저장
+
+        Returns:
+            저장한 작업 수
+        """
+        with self._flush_lock:
+            with self._lock:
+                jobs = list(self._jobs)
+                self._jobs.clear()
+            if not jobs:
+                return 0
+
+            client = get_supabase_client()
+            failed = []
+            written = 0
+
+            by_kind: Dict[str, List[Dict]] = {}
+            for job in jobs:
+                by_kind.setdefault(job['kind'], []).append(job)
+
+            # 분석 행 먼저 저장 → 반환된 id로 딸린 사용량 로그의 analysis_id 채움
+            usage_jobs = by_kind.get('ai_usage', [])
+            for chunk in _chunks(by_kind.get('analysis', []), BATCH_CHUNK_SIZE):
+                saved, rejected = self._insert(client, 'analyses', chunk, lambda job: job['payload']['row'])
+                failed.extend(rejected)
+                written += len(saved)
+                for job, analysis_id in saved:
+                    for usage_row in job['payload']['usage_rows']:
+                        usage_jobs.append({'kind': 'ai_usage', 'attempts': 0,
+                                           'payload': dict(usage_row, analysis_id=analysis_id)})
+
+            for chunk in _chunks(usage_jobs, BATCH_CHUNK_SIZE):
+                saved, rejected = self._insert(client, 'ai_usage_logs', chunk, lambda job: job['payload'])
+                failed.extend(rejected)
+                written += len(saved)
+
+            # last_login: 같은 사용자는 마지막 값만 (행마다 값이 달라 묶음 update 불가)
+            latest = {job['payload']['user_id']: job for job in by_kind.get('last_login', [])}
+            for user_id, job in latest.items():
+                try:
+                    client.table('users').update(job['payload']['values']).eq('id', user_id).execute()
+                    written += 1
+                except Exception:
+                    failed.append(job)
+
+            self._requeue(failed)
+            with self._lock:
+                self._stats['written'] += written
+            return written
+
+    @classmethod
+    def _insert(cls, client, table: str, jobs: List[Dict],
+                row_of) -> Tuple[List[Tuple[Dict, Optional[int]]], List[Dict]]:
+        """
+        묶음 insert (서버가 묶음을 거절하면 반으로 나눠 다시 시도 → 잘못된 행만 실패)
+
+        Args:
+            client: Supabase 클라이언트
+            table: 테이블 이름
+            jobs: 작업 목록
+            row_of: 작업 → insert할 행
+
+        Returns:
+            ([(작업, 생성된 id)], 실패한 작업 목록)
+        """
+        if not client:
+            return [], list(jobs)
+        try:
+            result = client.table(table).insert([row_of(job) for job in jobs]).execute()
+            ids = [row.get('id') for row in (result.data or [])]
+            ids += [None] * (len(jobs) - len(ids))
+            return list(zip(jobs, ids)), []
+        except Exception as e:
+            # 연결 오류는 행 문제가 아니므로 나누지 않고 묶음 전체를 재시도
+            if len(jobs) == 1 or _is_transport_error(e):
+                return [], list(jobs)
+
+        middle = len(jobs) // 2
+        saved_head, failed_head = cls._insert(client, table, jobs[:middle], row_of)
+        saved_tail, failed_tail = cls._insert(client, table, jobs[middle:], row_of)
+        return saved_head + saved_tail, failed_head + failed_tail
+
+    def _requeue(self, failed: List[Dict]) -> None:
+        """실패한 작업을 큐 앞으로 되돌림 (재시도 횟수 초과 시 버림)"""
+        retry = []
+        dropped = 0
+        for job in failed:
+            job['attempts'] += 1
+            if job['attempts'] > self.max_retries:
+                dropped += 1
+            else:
+                retry.append(job)
+
+        with self._lock:
+            self._failures = self._failures + 1 if failed else 0
+            # 새로 들어온 작업 공간을 넘는 만큼은 버림 (오래된 작업부터)
+            room = self._jobs.maxlen - len(self._jobs)
+            dropped += max(len(retry) - room, 0)
+            retry = retry[len(retry) - room:] if len(retry) > room else retry
+            self._jobs.extendleft(reversed(retry))
+            self._stats['retried'] += len(retry)
+            self._stats['dropped'] += dropped
+
+        if dropped:
+            print(f"[DB Write Queue] 저장 실패 작업 {dropped}개 버림")
+
+    def _run(self) -> None:
+        """백그라운드 저장 루프 (연속 실패 시 저장 주기를 늘려 DB 부담 완화)"""
+        while True:
+            with self._lock:
+                delay = min(self.flush_interval * (2 ** self._failures), 60)
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[DB Write Queue ERROR] {str(e)}")
+
+
+# 싱글톤 큐
+_write_queue: Optional[WriteBehindQueue] = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue() -> WriteBehindQueue:
+    """
+    프로세스 전역 쓰기 지연 큐 반환 (종료 시 남은 작업 저장)
+
+    Returns:
+        WriteBehindQueue 인스턴스
+    """
+    global _write_queue
+
+    with _write_queue_lock:
+        if _write_queue is None:
+            _write_queue = WriteBehindQueue()
+            atexit.register(_write_queue.flush)
+
+    return _write_queue
+
+
+def flush_write_queue() -> int:
+    """대기 중인 쓰기 작업 즉시 저장 (스크립트 종료 전 등)"""
+    return get_write_queue().flush()
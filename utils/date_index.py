@@ -0,0 +1,158 @@
+"""
+날짜 구간 카운트 인덱스
+
+키(카테고리 등)별로 구매 시각을 정렬해 두고 이진 탐색(searchsorted)으로
+"키 k의 [t-a, t+b] 구간 내 구매 건수"를 O(log n)에 계산합니다.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Hashable, Iterable, Optional
+
+# 하루 (나노초)
+DAY_NS = np.int64(24 * 60 * 60 * 10**9)
+
+# 키를 지정하지 않은 경우의 단일 키
+_ALL = None
+
+
+def to_ns(values) -> np.ndarray:
+    """datetime 계열 값을 int64 나노초 배열로 변환"""
+    return pd.to_datetime(pd.Series(values)).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+
+class WindowedCountIndex:
+    """키별 정렬 시각 배열 기반 구간 카운트 인덱스"""
+
+    def __init__(self, dates: Iterable, keys: Optional[Iterable[Hashable]] = None):
+        """
+        Args:
+            dates: 구매 시각 (datetime 계열 또는 int64 나노초)
+            keys: 각 시각의 키 (None이면 전체를 하나의 키로 취급)
+        """
+        self._sorted: Dict[Hashable, np.ndarray] = {}
+        for key, values in self._group(dates, keys):
+            self._sorted[key] = values
+
+    @staticmethod
+    def _as_ns(dates) -> np.ndarray:
+        arr = np.asarray(dates)
+        if arr.dtype == np.int64:
+            return arr
+        return to_ns(dates)
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._sorted.values())
+
+    def keys(self):
+        """인덱스에 포함된 키 목록"""
+        return self._sorted.keys()
+
+    def count(self, key: Hashable, lo: int, hi: int) -> int:
+        """
+        키 key의 [lo, hi] 구간(양 끝 포함) 내 건수
+
+        Args:
+            key: 조회 키 (keys 없이 만든 인덱스는 None)
+            lo: 구간 시작 (나노초)
+            hi: 구간 끝 (나노초)
+
+        Returns:
+            구간 내 건수
+        """
+        values = self._sorted.get(key)
+        if values is None:
+            return 0
+        return int(np.searchsorted(values, hi, side='right')
+                   - np.searchsorted(values, lo, side='left'))
+
+    def count_many(self, keys, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+        """
+        여러 질의의 [lo, hi] 구간 건수를 한 번에 계산
+
+        Args:
+            keys: 질의별 키 배열 (None이면 모든 질의가 단일 키)
+            lo: 질의별 구간 시작 (나노초)
+            hi: 질의별 구간 끝 (나노초)
+
+        Returns:
+            질의별 건수 배열
+        """
+        lo = np.asarray(lo, dtype=np.int64)
+        hi = np.asarray(hi, dtype=np.int64)
+        counts = np.zeros(len(lo), dtype=np.int64)
+
+        if keys is None:
+            values = self._sorted.get(_ALL)
+            if values is not None:
+                counts[:] = (np.searchsorted(values, hi, side='right')
+                             - np.searchsorted(values, lo, side='left'))
+            return counts
+
+        codes, uniques = pd.factorize(pd.Series(keys))
+        for code, positions in pd.Series(codes).groupby(codes).indices.items():
+            values = self._sorted.get(uniques[code]) if code >= 0 else None
+            if values is None:
+                continue
+            counts[positions] = (np.searchsorted(values, hi[positions], side='right')
+                                 - np.searchsorted(values, lo[positions], side='left'))
+        return counts
+
+    def count_around(self, keys, t: np.ndarray, before: int, after: int) -> np.ndarray:
+        """질의 시각 t 기준 [t - before, t + after] 구간 건수"""
+        t = np.asarray(t, dtype=np.int64)
+        return self.count_many(keys, t - before, t + after)
+
+    def add(self, dates, keys=None) -> None:
+        """
+        시각 추가 (정렬 상태 유지)
+
+        Args:
+            dates: 추가할 시각
+            keys: 각 시각의 키 (None이면 단일 키)
+        """
+        for key, values in self._group(dates, keys):
+            current = self._sorted.get(key)
+            if current is None:
+                self._sorted[key] = values
+            else:
+                self._sorted[key] = np.insert(current, np.searchsorted(current, values), values)
+
+    def remove(self, dates, keys=None) -> None:
+        """
+        시각 제거 (같은 시각이 여러 건이면 요청한 건수만큼만 제거)
+
+        Args:
+            dates: 제거할 시각
+            keys: 각 시각의 키 (None이면 단일 키)
+        """
+        for key, values in self._group(dates, keys):
+            current = self._sorted.get(key)
+            if current is None:
+                continue
+            # 같은 값이 k번 나오면 해당 값의 앞에서부터 k개 위치를 제거
+            uniq, counts = np.unique(values, return_counts=True)
+            starts = np.searchsorted(current, uniq, side='left')
+            available = np.searchsorted(current, uniq, side='right') - starts
+            counts = np.minimum(counts, available)
+            positions = np.concatenate([
+                np.arange(start, start + count) for start, count in zip(starts, counts)
+            ]) if len(uniq) else np.array([], dtype=np.int64)
+            remaining = np.delete(current, positions.astype(np.int64))
+            if len(remaining):
+                self._sorted[key] = remaining
+            else:
+                del self._sorted[key]
+
+    def _group(self, dates, keys):
+        """(키, 정렬된 시각 배열) 쌍으로 묶기"""
+        dates_ns = self._as_ns(dates)
+        if keys is None:
+            yield _ALL, np.sort(dates_ns)
+            return
+
+        codes, uniques = pd.factorize(pd.Series(keys))
+        for code, positions in pd.Series(codes).groupby(codes).indices.items():
+            # 키가 없는(NaN) 행은 어떤 키와도 일치하지 않음
+            if code >= 0:
+                yield uniques[code], np.sort(dates_ns[positions])
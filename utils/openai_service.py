@@ -5,16 +5,189 @@ OpenAI API 서비스 모듈
 """
 
 import os
-from typing import Dict, List, Optional
+import time
+import queue
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
 import json
 from openai import OpenAI
 from dotenv import load_dotenv
 from utils.translations import format_currency, from_krw
+from utils.response_cache import get_response_cache, hash_prompt, make_response_key
+from utils.prompt_budget import TokenBudget, count_tokens
+from utils.request_scheduler import RequestScheduler, get_request_scheduler
+from utils.ai_telemetry import get_ai_telemetry
 
 # 환경 변수 로드
 load_dotenv()
 
 
+# 스트림 종료 표시 (백그라운드 수신 큐용)
+_STREAM_END = object()
+
+
+class StreamingCompletion:
+    """
+    스트리밍 응답 래퍼
+
+    순회하면 도착하는 content 조각(delta)을 바로 내보내고,
+    순회가 끝나면 전체 텍스트와 토큰 사용량(마지막 usage 청크)을 result()로 제공합니다.
+    st.write_stream()에 그대로 넘길 수 있습니다.
+    """
+
+    def __init__(self, client, params: Dict, content_key: str, error_prefix: str,
+                 on_complete: Optional[Callable[[str, Optional[Dict]], None]] = None,
+                 scheduler: Optional[RequestScheduler] = None,
+                 on_finish: Optional[Callable[['StreamingCompletion'], None]] = None):
+        """
+        Args:
+            client: OpenAI 클라이언트
+            params: chat.completions.create 인자 (stream 관련 인자 제외)
+            content_key: 결과 dict의 본문 키 ('feedback' / 'insights')
+            error_prefix: 실패 시 에러 메시지 접두어
+            on_complete: 수신 성공 시 (전체 텍스트, usage)로 호출 (응답 캐시 저장용)
+            scheduler: 요청 스케줄러 (수신이 끝날 때까지 동시 실행 슬롯 점유)
+            on_finish: 수신이 끝나면 (성공/실패 모두) 스트림 자신으로 호출 (호출 계측용)
+        """
+        self.client = client
+        self.params = params
+        self.content_key = content_key
+        self.error_prefix = error_prefix
+        self.on_complete = on_complete
+        self.scheduler = scheduler
+        self.on_finish = on_finish
+
+        self.success = False
+        self.error: Optional[str] = None
+        self.usage: Optional[Dict] = None
+        self.first_token_at: Optional[float] = None
+        self._parts: List[str] = []
+        self._queue: Optional[queue.Queue] = None
+        self._started = time.perf_counter()
+        self._finished: Optional[float] = None
+
+    @property
+    def text(self) -> str:
+        """지금까지 수신한 전체 텍스트"""
+        return ''.join(self._parts)
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """첫 조각까지 걸린 시간 (초)"""
+        return (self.first_token_at - self._started) if self.first_token_at else None
+
+    def prefetch(self) -> 'StreamingCompletion':
+        """
+        백그라운드 스레드에서 미리 수신 시작
+
+        다른 스트림을 화면에 그리는 동안에도 이 요청이 진행되도록 하며,
+        이후 순회하면 그동안 쌓인 조각부터 내보냅니다.
+        """
+        if self._queue is not None:
+            return self  # 이미 수신 중이거나 끝난 스트림
+
+        self._queue = queue.Queue()
+        threading.Thread(target=self._pump, daemon=True).start()
+        return self
+
+    def __iter__(self) -> Iterator[str]:
+        if self._queue is None:
+            yield from self._receive()
+            return
+
+        while True:
+            delta = self._queue.get()
+            if delta is _STREAM_END:
+                return
+            yield delta
+
+    def _pump(self) -> None:
+        """백그라운드 수신 루프"""
+        try:
+            for delta in self._receive():
+                self._queue.put(delta)
+        finally:
+            self._queue.put(_STREAM_END)
+
+    def _open_stream(self):
+        """스트리밍 요청 열기"""
+        return self.client.chat.completions.create(
+            **self.params,
+            stream=True,
+            stream_options={'include_usage': True}
+        )
+
+    def _read_stream(self, stream) -> Iterator[str]:
+        """청크 수신"""
+        for chunk in stream:
+            # include_usage 사용 시 마지막 청크는 choices 없이 usage만 담김
+            if getattr(chunk, 'usage', None):
+                self.usage = {
+                    'prompt_tokens': chunk.usage.prompt_tokens,
+                    'completion_tokens': chunk.usage.completion_tokens,
+                    'total_tokens': chunk.usage.total_tokens
+                }
+            if not chunk.choices:
+                continue
+
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if self.first_token_at is None:
+                    self.first_token_at = time.perf_counter()
+                self._parts.append(delta)
+                yield delta
+
+    def _receive(self) -> Iterator[str]:
+        """API 스트림을 읽어 delta를 내보내고 usage를 기록"""
+        try:
+            # 스케줄러 사용 시 열기에 성공한 시점부터 수신이 끝날 때까지 슬롯 점유
+            if self.scheduler:
+                with self.scheduler.stream(self._open_stream) as stream:
+                    yield from self._read_stream(stream)
+            else:
+                yield from self._read_stream(self._open_stream())
+
+            self.success = True
+            if self.on_complete:
+                self.on_complete(self.text.strip(), self.usage)
+
+        except Exception as e:
+            self.error = f"{self.error_prefix}: {str(e)}"
+
+        finally:
+            self._finished = time.perf_counter()
+            if self.on_finish:
+                self.on_finish(self)
+
+    def result(self) -> Dict:
+        """
+        수신 완료 후 결과 (generate_* 반환 형식과 동일)
+
+        Returns:
+            {
+                'success': True/False,
+                content_key: 전체 텍스트,
+                'error': 에러 메시지 (실패 시),
+                'usage': 토큰 사용량,
+                'elapsed': 전체 소요 시간 (초),
+                'ttft': 첫 조각까지 걸린 시간 (초)
+            }
+        """
+        finished = self._finished or time.perf_counter()
+        result = {
+            'success': self.success,
+            self.content_key: self.text.strip() if self.success else '',
+            'error': self.error,
+            'elapsed': finished - self._started,
+            'ttft': self.ttft
+        }
+        if self.usage:
+            result['usage'] = self.usage
+            if self.usage.get('cached'):
+                result['cached'] = True
+        return result
+
+
 class OpenAIService:
     """OpenAI API 서비스 클래스"""
 
@@ -24,6 +197,10 @@ class OpenAIService:
         self.model = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
         self.temperature = float(os.getenv('OPENAI_TEMPERATURE', '0.7'))
         self.max_tokens = int(os.getenv('OPENAI_MAX_TOKENS', '800'))
+        # 'separate': 심리 분석/인사이트 개별 스트리밍, 'combined': 구조화 응답 1회 호출
+        self.analysis_mode = os.getenv('OPENAI_ANALYSIS_MODE', 'separate')
+        # 프롬프트 데이터 부분(구매 항목 + 카테고리 표) 토큰 예산
+        self.prompt_data_tokens = int(os.getenv('OPENAI_PROMPT_DATA_TOKENS', '600'))
 
         if not self.api_key:
             raise ValueError(
@@ -33,12 +210,101 @@ class OpenAIService:
             )
 
         # OpenAI 클라이언트 초기화
-        self.client = OpenAI(api_key=self.api_key)
+        # 재시도는 스케줄러가 담당 (SDK 자체 재시도 끔)
+        self.client = OpenAI(api_key=self.api_key, max_retries=0)
+
+        # 프로세스 전역 요청 스케줄러 (동시 실행/속도 제한, 재시도, 중복 요청 공유)
+        self.scheduler = get_request_scheduler()
+
+        # 응답 캐시 (비활성화 시 None)
+        self.response_cache = get_response_cache()
+
+        # 호출 계측 (지연/토큰/비용/재시도 집계 + ai_usage_logs 백그라운드 저장)
+        self.telemetry = get_ai_telemetry()
 
     def is_api_key_valid(self) -> bool:
         """API 키 유효성 검사"""
         return bool(self.api_key and self.api_key.startswith('sk-'))
 
+    @staticmethod
+    def feedback_inputs(inputs: Dict) -> Dict:
+        """build_ai_analysis_inputs 결과에서 심리 분석 인자만 선택"""
+        keys = ('overall_score', 'total_purchases', 'total_amount', 'regret_ratio',
+                'main_cause', 'top_regret_items', 'category_breakdown')
+        return {key: inputs[key] for key in keys}
+
+    @staticmethod
+    def insights_inputs(inputs: Dict) -> Dict:
+        """build_ai_analysis_inputs 결과에서 스마트 인사이트 인자만 선택"""
+        keys = ('overall_score', 'total_purchases', 'total_amount', 'target_items',
+                'category_spending', 'category_breakdown')
+        return {key: inputs[key] for key in keys}
+
+    @staticmethod
+    def combined_inputs(inputs: Dict) -> Dict:
+        """build_ai_analysis_inputs 결과에서 통합 분석 인자만 선택"""
+        return {key: value for key, value in inputs.items() if key != 'top_regret_items'}
+
+    def _item_table(self, budget: TokenBudget, items: List[Dict], language: str = 'ko',
+                    detail: bool = True) -> str:
+        """
+        구매 항목 표 (후회 점수 높은 순, 예산 초과분 제외)
+
+        Args:
+            budget: 토큰 예산
+            items: 구매 항목 목록
+            language: 언어 코드
+            detail: 필요도/사용빈도 열 포함 여부
+        """
+        if language == 'ja':
+            headers = ['カテゴリ', '商品名', '金額', '後悔スコア', '必要度', '使用頻度']
+        else:
+            headers = ['카테고리', '상품명', '금액', '후회점수', '필요도', '사용빈도']
+        if not detail:
+            headers = headers[:4]
+
+        rows = []
+        for item in sorted(items, key=lambda item: item['score'], reverse=True):
+            row = [item['category'], item['product'],
+                   format_currency(item['amount'], language), f"{item['score']:.0f}"]
+            if detail:
+                row += [item['necessity'], item['usage']]
+            rows.append(row)
+
+        return budget.take_rows(headers, rows)
+
+    def _category_table(self, budget: TokenBudget, category_amounts: Dict,
+                        category_breakdown: Dict, language: str = 'ko') -> str:
+        """
+        카테고리 지출 표 (지출 큰 순, 예산 초과분은 '기타' 한 줄로 합산)
+
+        Args:
+            budget: 토큰 예산
+            category_amounts: {카테고리: 지출 금액}
+            category_breakdown: {카테고리: {'count', 'amount'}} (건수 조회용)
+            language: 언어 코드
+        """
+        if language == 'ja':
+            headers, other_label = ['カテゴリ', '支出', '件数'], 'その他'
+        else:
+            headers, other_label = ['카테고리', '지출', '건수'], '기타'
+
+        ranked = sorted(category_amounts.items(), key=lambda kv: kv[1], reverse=True)
+        rows = [
+            [cat, format_currency(amount, language), category_breakdown.get(cat, {}).get('count', 0)]
+            for cat, amount in ranked
+        ]
+
+        def overflow_row(dropped_rows):
+            dropped = ranked[len(ranked) - len(dropped_rows):]
+            return [
+                f"{other_label} {len(dropped)}",
+                format_currency(sum(amount for _, amount in dropped), language),
+                sum(category_breakdown.get(cat, {}).get('count', 0) for cat, _ in dropped)
+            ]
+
+        return budget.take_rows(headers, rows, overflow_row=overflow_row)
+
     def build_analysis_prompt(
         self,
         overall_score: float,
@@ -66,23 +332,16 @@ class OpenAIService:
             프롬프트 문자열
         """
 
-        # 카테고리별 정보 포맷팅
-        count_unit = '件' if language == 'ja' else '건'
-        score_label = '後悔スコア' if language == 'ja' else '후회점수'
-        category_info = ""
-        if category_breakdown:
-            category_info = "\n".join([
-                f"  - {cat}: {info['count']}{count_unit}, 総 {format_currency(info['amount'], language)}"
-                for cat, info in list(category_breakdown.items())[:5]
-            ])
-
-        # 상위 후회 항목 포맷팅
-        regret_items_info = ""
-        if top_regret_items:
-            regret_items_info = "\n".join([
-                f"  {i+1}. {item['category']} - {item['product']} ({format_currency(item['amount'], language)}, {score_label}: {item['score']:.1f})"
-                for i, item in enumerate(top_regret_items[:5])
-            ])
+        # 데이터 표 (토큰 예산 안에서 후회 항목 → 카테고리 순으로 채움)
+        budget = TokenBudget(self.prompt_data_tokens, self.model)
+        regret_items_info = self._item_table(budget, (top_regret_items or [])[:5], language,
+                                             detail=False)
+        category_info = self._category_table(
+            budget,
+            {cat: info['amount'] for cat, info in (category_breakdown or {}).items()},
+            category_breakdown or {},
+            language
+        )
 
         prompt = f"""당신은 20년 경력의 소비 심리 전문가이자 재무 상담가입니다.
 사용자의 구매 데이터를 분석하여 따뜻하고 공감적이면서도 전문적인 조언을 제공합니다.
@@ -102,41 +361,150 @@ class OpenAIService:
 ## 후회 점수 높은 구매 TOP 5
 {regret_items_info if regret_items_info else "데이터 없음"}
 
-# 응답 형식
+{self._psychology_instructions()}
 
-다음 형식으로 친근하고 공감적인 톤으로 응답하세요. 이모지를 적절히 사용하되 과하지 않게:
+이제 위 데이터를 바탕으로 분석을 시작해주세요.
+{chr(10) + "重要: 日本語で回答してください。~です、~ます体を使ってください。" if language == "ja" else ""}"""
 
-## 📊 당신의 소비 패턴 한눈에 보기
-(2-3문장으로 전체적인 소비 패턴을 요약합니다. 비난하지 않고 팩트를 전달합니다.)
+        return prompt
 
-## 🔍 후회 구매의 주요 원인 3가지
-1. **[원인 1 제목]**: [구체적인 설명과 패턴 분석]
-2. **[원인 2 제목]**: [구체적인 설명과 패턴 분석]
-3. **[원인 3 제목]**: [구체적인 설명과 패턴 분석]
+    def _response_cache_key(self, params: Dict, language: str) -> str:
+        """요청 파라미터로 응답 캐시 키 생성"""
+        return make_response_key(
+            params['model'], params['temperature'], language, hash_prompt(params['messages'])
+        )
 
-## 💡 지금 바로 실천 가능한 개선 방안
-1. **[방안 1 제목]**: [즉시 실천 가능한 구체적인 팁]
-2. **[방안 2 제목]**: [습관 개선 제안]
-3. **[방안 3 제목]**: [심리적 접근 방법]
+    def _get_cached_response(self, cache_key: str, content_key: str) -> Optional[Dict]:
+        """
+        응답 캐시 조회
 
-## 🎯 이번 달 도전 과제
-**목표**: [SMART 기준의 구체적이고 측정 가능한 목표 1개]
-**실천 방법**: [목표 달성을 위한 3가지 작은 액션 아이템]
+        Returns:
+            generate_* 반환 형식의 결과 (usage에 'cached': True 표시) 또는 None
+        """
+        if self.response_cache is None:
+            return None
 
-# 작성 가이드라인
+        try:
+            hit = self.response_cache.get(cache_key)
+        except Exception as e:
+            print(f"[OpenAI Cache ERROR] 조회 실패: {str(e)}")
+            return None
 
-1. **톤**: 친구 같은 상담사 톤. "~해요", "~이에요" 사용. 반말은 피함.
-2. **비난 금지**: "잘못", "실수" 같은 부정적 단어 피함. "개선", "성장" 강조.
-3. **구체성**: "조금만 줄이세요"가 아니라 "한 달에 2번 → 1번으로 줄여보세요" 같이 구체적.
-4. **긍정적 강화**: 잘한 점이 있다면 먼저 칭찬.
-5. **실천 가능성**: 거창한 목표보다 작고 구체적인 액션.
-6. **공감**: 사용자의 감정을 이해하고 공감 표현 포함.
-7. **길이**: 전체 500자 이내로 간결하게.
+        if hit is None:
+            return None
 
-이제 위 데이터를 바탕으로 분석을 시작해주세요.
-{chr(10) + "重要: 日本語で回答してください。~です、~ます体を使ってください。" if language == "ja" else ""}"""
+        return {
+            'success': True,
+            content_key: hit['content'],
+            'error': None,
+            'usage': {**hit['usage'], 'cached': True},
+            'cached': True
+        }
 
-        return prompt
+    def _store_cached_response(self, cache_key: str, content: str, usage: Optional[Dict]) -> None:
+        """응답 캐시 저장 (실패해도 분석 결과에는 영향 없음)"""
+        if self.response_cache is None or not content:
+            return
+
+        try:
+            self.response_cache.put(cache_key, content, usage)
+        except Exception as e:
+            print(f"[OpenAI Cache ERROR] 저장 실패: {str(e)}")
+
+    def _record_call(self, call_type: str, language: str, started: float, result: Dict,
+                     ttft: Optional[float] = None) -> Dict:
+        """
+        호출 계측 기록 후 결과 usage에 계측 필드를 덧붙여 반환
+
+        Args:
+            call_type: 'psychology', 'smart_insights', 'combined'
+            language: 분석 언어
+            started: 호출 시작 시각 (time.perf_counter)
+            result: generate_* 반환 형식의 결과
+            ttft: 첫 토큰까지 걸린 시간 (초, 스트리밍만)
+
+        Returns:
+            result (usage에 model, language, latency_ms, ttft_ms, retries, cost_usd 추가,
+                    진행 중이던 같은 요청의 응답을 공유받았으면 shared=True)
+        """
+        usage = result.get('usage')
+        cached = bool(usage and usage.get('cached'))
+        # 공유받은 응답의 사용량/비용은 먼저 보낸 요청이 이미 기록
+        shared = bool(usage) and not cached and self.scheduler.last_shared()
+        fields = self.telemetry.record_call(
+            call_type=call_type,
+            model=self.model,
+            language=language,
+            success=result['success'],
+            latency=time.perf_counter() - started,
+            ttft=ttft,
+            usage=usage,
+            retries=0 if cached else self.scheduler.last_retries(),
+            error=result.get('error'),
+            shared=shared
+        )
+        if usage:
+            result['usage'] = {**usage, **fields}
+            if shared:
+                result['usage']['shared'] = True
+        return result
+
+    def build_feedback_request(
+        self,
+        overall_score: float,
+        total_purchases: int,
+        total_amount: float,
+        regret_ratio: float,
+        main_cause: str,
+        top_regret_items: List[Dict] = None,
+        category_breakdown: Dict = None,
+        language: str = 'ko'
+    ) -> Dict:
+        """
+        심리 분석 요청 파라미터 생성 (chat.completions.create 인자)
+
+        일반 호출과 스트리밍 호출이 같은 프롬프트/파라미터를 쓰도록 한 곳에서 만듭니다.
+        """
+        # 프롬프트 생성
+        prompt = self.build_analysis_prompt(
+            overall_score=overall_score,
+            total_purchases=total_purchases,
+            total_amount=total_amount,
+            regret_ratio=regret_ratio,
+            main_cause=main_cause,
+            top_regret_items=top_regret_items or [],
+            category_breakdown=category_breakdown or {},
+            language=language
+        )
+
+        # 시스템 메시지 (언어별)
+        if language == 'ja':
+            system_msg = ("あなたは20年のキャリアを持つ消費心理の専門家であり、"
+                          "ファイナンシャルアドバイザーです。"
+                          "ユーザーに温かく共感的で実践可能なアドバイスを提供します。"
+                          "日本語で回答してください。")
+        else:
+            system_msg = ("당신은 20년 경력의 소비 심리 전문가이자 재무 상담가입니다. "
+                          "사용자에게 따뜻하고 공감적이면서도 실천 가능한 조언을 제공합니다.")
+
+        return {
+            'model': self.model,
+            'messages': [
+                {
+                    "role": "system",
+                    "content": system_msg
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            'temperature': self.temperature,
+            'max_tokens': self.max_tokens,
+            'top_p': 1.0,
+            'frequency_penalty': 0.3,
+            'presence_penalty': 0.3
+        }
 
     def generate_ai_feedback(
         self,
@@ -176,113 +544,92 @@ class OpenAIService:
                 'error': 'OPENAI_API_KEY가 유효하지 않습니다. .env 파일을 확인해주세요.'
             }
 
+        started = time.perf_counter()
         try:
-            # 프롬프트 생성
-            prompt = self.build_analysis_prompt(
+            params = self.build_feedback_request(
                 overall_score=overall_score,
                 total_purchases=total_purchases,
                 total_amount=total_amount,
                 regret_ratio=regret_ratio,
                 main_cause=main_cause,
-                top_regret_items=top_regret_items or [],
-                category_breakdown=category_breakdown or {},
+                top_regret_items=top_regret_items,
+                category_breakdown=category_breakdown,
                 language=language
             )
 
-            # 시스템 메시지 (언어별)
-            if language == 'ja':
-                system_msg = ("あなたは20年のキャリアを持つ消費心理の専門家であり、"
-                              "ファイナンシャルアドバイザーです。"
-                              "ユーザーに温かく共感的で実践可能なアドバイスを提供します。"
-                              "日本語で回答してください。")
-            else:
-                system_msg = ("당신은 20년 경력의 소비 심리 전문가이자 재무 상담가입니다. "
-                              "사용자에게 따뜻하고 공감적이면서도 실천 가능한 조언을 제공합니다.")
-
-            # OpenAI API 호출
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_msg
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-                top_p=1.0,
-                frequency_penalty=0.3,
-                presence_penalty=0.3
+            # 같은 프롬프트의 이전 응답이 있으면 재사용
+            cache_key = self._response_cache_key(params, language)
+            cached = self._get_cached_response(cache_key, 'feedback')
+            if cached:
+                return self._record_call('psychology', language, started, cached)
+
+            # OpenAI API 호출 (같은 프롬프트가 진행 중이면 그 응답 공유)
+            response = self.scheduler.call(
+                lambda: self.client.chat.completions.create(**params), key=cache_key
             )
 
             # 응답 추출
             feedback = response.choices[0].message.content.strip()
 
-            # 토큰 사용량 로깅 (선택사항)
             usage = response.usage
-            print(f"[OpenAI] API 호출 성공!")
-            print(f"   - 모델: {self.model}")
-            print(f"   - 입력 토큰: {usage.prompt_tokens}")
-            print(f"   - 출력 토큰: {usage.completion_tokens}")
-            print(f"   - 총 토큰: {usage.total_tokens}")
+            usage_dict = {
+                'prompt_tokens': usage.prompt_tokens,
+                'completion_tokens': usage.completion_tokens,
+                'total_tokens': usage.total_tokens
+            }
+            self._store_cached_response(cache_key, feedback, usage_dict)
 
-            return {
+            return self._record_call('psychology', language, started, {
                 'success': True,
                 'feedback': feedback,
                 'error': None,
-                'usage': {
-                    'prompt_tokens': usage.prompt_tokens,
-                    'completion_tokens': usage.completion_tokens,
-                    'total_tokens': usage.total_tokens
-                }
-            }
+                'usage': usage_dict
+            })
 
         except Exception as e:
             error_message = str(e)
-            print(f"[OpenAI ERROR] API 호출 실패: {error_message}")
 
-            return {
+            return self._record_call('psychology', language, started, {
                 'success': False,
                 'feedback': '',
                 'error': f"AI 분석 생성 중 오류 발생: {error_message}"
-            }
+            })
 
-    def build_smart_insights_prompt(
-        self,
-        overall_score: float,
-        total_purchases: int,
-        total_amount: float,
-        target_items: list,
-        category_spending: dict,
-        category_breakdown: dict,
-        language: str = 'ko'
-    ) -> str:
-        """스마트 인사이트 프롬프트 생성"""
+    def _psychology_instructions(self) -> str:
+        """심리 분석 응답 형식 + 작성 가이드라인 (단독/통합 프롬프트 공용)"""
+        return """# 응답 형식
 
-        # 분석 대상 항목 포맷
-        count_unit = '件' if language == 'ja' else '건'
-        score_label = '後悔スコア' if language == 'ja' else '후회점수'
-        necessity_label = '必要度' if language == 'ja' else '필요도'
-        usage_label = '使用頻度' if language == 'ja' else '사용빈도'
-        items_text = ""
-        for i, item in enumerate(target_items, 1):
-            items_text += (
-                f"{i}. [{item['category']}] {item['product']} "
-                f"- {format_currency(item['amount'], language)} "
-                f"({score_label}: {item['score']:.0f}, "
-                f"{necessity_label}: {item['necessity']}, {usage_label}: {item['usage']})\n"
-            )
+다음 형식으로 친근하고 공감적인 톤으로 응답하세요. 이모지를 적절히 사용하되 과하지 않게:
+
+## 📊 당신의 소비 패턴 한눈에 보기
+(2-3문장으로 전체적인 소비 패턴을 요약합니다. 비난하지 않고 팩트를 전달합니다.)
+
+## 🔍 후회 구매의 주요 원인 3가지
+1. **[원인 1 제목]**: [구체적인 설명과 패턴 분석]
+2. **[원인 2 제목]**: [구체적인 설명과 패턴 분석]
+3. **[원인 3 제목]**: [구체적인 설명과 패턴 분석]
+
+## 💡 지금 바로 실천 가능한 개선 방안
+1. **[방안 1 제목]**: [즉시 실천 가능한 구체적인 팁]
+2. **[방안 2 제목]**: [습관 개선 제안]
+3. **[방안 3 제목]**: [심리적 접근 방법]
+
+## 🎯 이번 달 도전 과제
+**목표**: [SMART 기준의 구체적이고 측정 가능한 목표 1개]
+**실천 방법**: [목표 달성을 위한 3가지 작은 액션 아이템]
 
-        # 카테고리별 지출 포맷
-        category_text = ""
-        for cat, amount in category_spending.items():
-            count = category_breakdown.get(cat, {}).get('count', 0)
-            category_text += f"- {cat}: {format_currency(amount, language)} ({count}{count_unit})\n"
+# 작성 가이드라인
 
+1. **톤**: 친구 같은 상담사 톤. "~해요", "~이에요" 사용. 반말은 피함.
+2. **비난 금지**: "잘못", "실수" 같은 부정적 단어 피함. "개선", "성장" 강조.
+3. **구체성**: "조금만 줄이세요"가 아니라 "한 달에 2번 → 1번으로 줄여보세요" 같이 구체적.
+4. **긍정적 강화**: 잘한 점이 있다면 먼저 칭찬.
+5. **실천 가능성**: 거창한 목표보다 작고 구체적인 액션.
+6. **공감**: 사용자의 감정을 이해하고 공감 표현 포함.
+7. **길이**: 전체 500자 이내로 간결하게."""
+
+    def _insights_instructions(self, language: str = 'ko') -> str:
+        """스마트 인사이트 요청 사항 + 작성 가이드라인 (단독/통합 프롬프트 공용)"""
         from utils.translations import currency_symbol
         sym = currency_symbol(language)
         if language == 'ja':
@@ -299,22 +646,7 @@ class OpenAIService:
             save_example2 = f"2. **충동구매 24시간 룰**: 5만원 이상 구매 시 24시간 대기 후 결정 → 예상 월 절약 {sym}50,000"
             lang_guide = "- 한국어로 작성"
 
-        prompt = f"""당신은 소비 데이터 분석 전문가입니다. 사용자의 구매 데이터를 기반으로 스마트 인사이트를 생성합니다.
-
-# 분석 데이터
-
-## 전체 개요
-- 후회 점수: {overall_score:.1f}/100
-- 총 구매 건수: {total_purchases}{count_unit}
-- 총 지출 금액: {format_currency(total_amount, language)}
-
-## 분석 대상 구매 항목
-{items_text}
-
-## 카테고리별 지출
-{category_text}
-
-# 요청 사항
+        return f"""# 요청 사항
 
 다음 4가지 인사이트를 정확히 아래 형식으로 작성하세요.
 
@@ -364,8 +696,83 @@ class OpenAIService:
 - ~해요, ~이에요 체 사용
 {lang_guide}"""
 
+    def build_smart_insights_prompt(
+        self,
+        overall_score: float,
+        total_purchases: int,
+        total_amount: float,
+        target_items: list,
+        category_spending: dict,
+        category_breakdown: dict,
+        language: str = 'ko'
+    ) -> str:
+        """스마트 인사이트 프롬프트 생성"""
+
+        # 데이터 표 (토큰 예산 안에서 분석 대상 항목 → 카테고리 순으로 채움)
+        count_unit = '件' if language == 'ja' else '건'
+        budget = TokenBudget(self.prompt_data_tokens, self.model)
+        items_text = self._item_table(budget, target_items, language)
+        category_text = self._category_table(budget, category_spending, category_breakdown, language)
+
+        prompt = f"""당신은 소비 데이터 분석 전문가입니다. 사용자의 구매 데이터를 기반으로 스마트 인사이트를 생성합니다.
+
+# 분석 데이터
+
+## 전체 개요
+- 후회 점수: {overall_score:.1f}/100
+- 총 구매 건수: {total_purchases}{count_unit}
+- 총 지출 금액: {format_currency(total_amount, language)}
+
+## 분석 대상 구매 항목
+{items_text if items_text else "데이터 없음"}
+
+## 카테고리별 지출
+{category_text if category_text else "데이터 없음"}
+
+{self._insights_instructions(language)}"""
+
         return prompt
 
+    def build_smart_insights_request(
+        self,
+        overall_score: float,
+        total_purchases: int,
+        total_amount: float,
+        target_items: list,
+        category_spending: dict,
+        category_breakdown: dict,
+        language: str = 'ko'
+    ) -> Dict:
+        """스마트 인사이트 요청 파라미터 생성 (chat.completions.create 인자)"""
+        prompt = self.build_smart_insights_prompt(
+            overall_score, total_purchases, total_amount,
+            target_items, category_spending, category_breakdown,
+            language=language
+        )
+
+        if language == 'ja':
+            system_msg = "あなたは消費データ分析の専門家です。購買データに基づいて実用的なインサイトを提供します。日本語で回答してください。"
+        else:
+            system_msg = "당신은 소비 데이터 분석 전문가입니다. 구매 데이터를 기반으로 실용적인 인사이트를 제공합니다."
+
+        return {
+            'model': self.model,
+            'messages': [
+                {
+                    "role": "system",
+                    "content": system_msg
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            'temperature': self.temperature,
+            'max_tokens': 1500,
+            'frequency_penalty': 0.3,
+            'presence_penalty': 0.3
+        }
+
     def generate_smart_insights(
         self,
         overall_score: float,
@@ -378,6 +785,7 @@ class OpenAIService:
     ) -> dict:
         """스마트 인사이트 생성 (API 호출)"""
 
+        started = time.perf_counter()
         try:
             if not self.is_api_key_valid():
                 return {
@@ -386,61 +794,339 @@ class OpenAIService:
                     'error': 'API 키가 유효하지 않습니다.'
                 }
 
-            prompt = self.build_smart_insights_prompt(
+            params = self.build_smart_insights_request(
                 overall_score, total_purchases, total_amount,
                 target_items, category_spending, category_breakdown,
                 language=language
             )
 
-            if language == 'ja':
-                system_msg = "あなたは消費データ分析の専門家です。購買データに基づいて実用的なインサイトを提供します。日本語で回答してください。"
-            else:
-                system_msg = "당신은 소비 데이터 분석 전문가입니다. 구매 데이터를 기반으로 실용적인 인사이트를 제공합니다."
-
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_msg
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=self.temperature,
-                max_tokens=1500,
-                frequency_penalty=0.3,
-                presence_penalty=0.3
+            # 같은 프롬프트의 이전 응답이 있으면 재사용
+            cache_key = self._response_cache_key(params, language)
+            cached = self._get_cached_response(cache_key, 'insights')
+            if cached:
+                return self._record_call('smart_insights', language, started, cached)
+
+            response = self.scheduler.call(
+                lambda: self.client.chat.completions.create(**params), key=cache_key
             )
 
             insights = response.choices[0].message.content
 
             usage = response.usage
-            print(f"[Smart Insights] 토큰 사용량 - 입력: {usage.prompt_tokens}, "
-                  f"출력: {usage.completion_tokens}, 총: {usage.total_tokens}")
+            usage_dict = {
+                'prompt_tokens': usage.prompt_tokens,
+                'completion_tokens': usage.completion_tokens,
+                'total_tokens': usage.total_tokens
+            }
+            self._store_cached_response(cache_key, insights, usage_dict)
 
-            return {
+            return self._record_call('smart_insights', language, started, {
                 'success': True,
                 'insights': insights,
                 'error': None,
-                'usage': {
-                    'prompt_tokens': usage.prompt_tokens,
-                    'completion_tokens': usage.completion_tokens,
-                    'total_tokens': usage.total_tokens
-                }
-            }
+                'usage': usage_dict
+            })
 
         except Exception as e:
             error_message = str(e)
-            print(f"[Smart Insights ERROR] API 호출 실패: {error_message}")
 
-            return {
+            return self._record_call('smart_insights', language, started, {
                 'success': False,
                 'insights': '',
                 'error': f"스마트 인사이트 생성 중 오류 발생: {error_message}"
+            })
+
+    def build_combined_prompt(
+        self,
+        overall_score: float,
+        total_purchases: int,
+        total_amount: float,
+        regret_ratio: float,
+        main_cause: str,
+        target_items: list,
+        category_spending: dict,
+        category_breakdown: dict,
+        language: str = 'ko'
+    ) -> str:
+        """
+        심리 분석 + 스마트 인사이트 통합 프롬프트 생성
+
+        두 단독 프롬프트가 각각 싣던 개요/카테고리/구매 항목 데이터를 한 번만 싣습니다.
+        분석 대상 항목(target_items)에 후회 점수 상위 항목이 이미 포함되어 있으므로
+        후회 TOP 5 목록은 따로 싣지 않습니다.
+        """
+        count_unit = '件' if language == 'ja' else '건'
+
+        # 데이터 표 (토큰 예산 안에서 분석 대상 항목 → 카테고리 순으로 채움)
+        budget = TokenBudget(self.prompt_data_tokens, self.model)
+        items_text = self._item_table(budget, target_items, language)
+        category_text = self._category_table(budget, category_spending, category_breakdown, language)
+
+        prompt = f"""당신은 20년 경력의 소비 심리 전문가이자 소비 데이터 분석 전문가입니다.
+사용자의 구매 데이터를 분석하여 심리 분석과 스마트 인사이트를 함께 작성합니다.
+
+# 분석 데이터
+
+## 전체 개요
+- 후회 점수: {overall_score:.1f}/100
+- 총 구매 건수: {total_purchases}{count_unit}
+- 총 지출 금액: {format_currency(total_amount, language)}
+- 후회 구매 비율: {regret_ratio:.1f}%
+- 주요 후회 원인: {main_cause}
+
+## 분석 대상 구매 항목 (후회 점수 높은 순, 상위 5건이 후회 구매 TOP 5)
+{items_text if items_text else "데이터 없음"}
+
+## 카테고리별 지출
+{category_text if category_text else "데이터 없음"}
+
+# 출력 형식
+
+JSON 객체 하나로 응답합니다. 각 필드 값은 마크다운 문자열입니다.
+- psychology_analysis: 아래 [A] 지침을 따른 소비 심리 분석
+- smart_insights: 아래 [B] 지침을 따른 스마트 인사이트
+
+# [A] psychology_analysis 지침
+
+{self._psychology_instructions()}
+
+# [B] smart_insights 지침
+
+{self._insights_instructions(language)}
+{chr(10) + "重要: 日本語で回答してください。~です、~ます体を使ってください。" if language == "ja" else ""}"""
+
+        return prompt
+
+    def build_combined_request(self, language: str = 'ko', **kwargs) -> Dict:
+        """
+        통합 분석 요청 파라미터 생성 (JSON schema 구조화 응답)
+
+        Args:
+            language: 언어 코드
+            **kwargs: build_combined_prompt 인자
+        """
+        prompt = self.build_combined_prompt(language=language, **kwargs)
+
+        if language == 'ja':
+            system_msg = ("あなたは消費心理の専門家であり、消費データ分析の専門家です。"
+                          "温かく共感的で実践可能なアドバイスと実用的なインサイトを提供します。"
+                          "日本語で回答してください。")
+        else:
+            system_msg = ("당신은 소비 심리 전문가이자 소비 데이터 분석 전문가입니다. "
+                          "따뜻하고 공감적인 조언과 실용적인 인사이트를 함께 제공합니다.")
+
+        return {
+            'model': self.model,
+            'messages': [
+                {
+                    "role": "system",
+                    "content": system_msg
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            'temperature': self.temperature,
+            # 두 단독 호출의 출력 한도 합
+            'max_tokens': self.max_tokens + 1500,
+            'frequency_penalty': 0.3,
+            'presence_penalty': 0.3,
+            'response_format': {
+                'type': 'json_schema',
+                'json_schema': {
+                    'name': 'buywise_analysis',
+                    'strict': True,
+                    'schema': {
+                        'type': 'object',
+                        'properties': {
+                            'psychology_analysis': {'type': 'string'},
+                            'smart_insights': {'type': 'string'}
+                        },
+                        'required': ['psychology_analysis', 'smart_insights'],
+                        'additionalProperties': False
+                    }
+                }
             }
+        }
+
+    def generate_combined_analysis(
+        self,
+        overall_score: float,
+        total_purchases: int,
+        total_amount: float,
+        regret_ratio: float,
+        main_cause: str,
+        target_items: list,
+        category_spending: dict,
+        category_breakdown: dict,
+        language: str = 'ko'
+    ) -> Dict:
+        """
+        심리 분석 + 스마트 인사이트를 한 번의 구조화 응답으로 생성
+
+        Returns:
+            {
+                'success': True/False,
+                'feedback': 심리 분석 텍스트,
+                'insights': 스마트 인사이트 텍스트,
+                'error': 에러 메시지 (실패 시),
+                'usage': 토큰 사용량 + 'baseline_prompt_tokens' (개별 호출 시 예상 입력 토큰)
+            }
+        """
+        failed = {'success': False, 'feedback': '', 'insights': ''}
+
+        if not self.is_api_key_valid():
+            return {**failed, 'error': 'OPENAI_API_KEY가 유효하지 않습니다. .env 파일을 확인해주세요.'}
+
+        started = time.perf_counter()
+        try:
+            data = dict(
+                overall_score=overall_score,
+                total_purchases=total_purchases,
+                total_amount=total_amount,
+                target_items=target_items,
+                category_spending=category_spending,
+                category_breakdown=category_breakdown
+            )
+            params = self.build_combined_request(
+                regret_ratio=regret_ratio, main_cause=main_cause, language=language, **data
+            )
+
+            cache_key = self._response_cache_key(params, language)
+            cached = self._get_cached_response(cache_key, 'content')
+            if cached:
+                content, usage_dict = cached['content'], cached['usage']
+            else:
+                response = self.scheduler.call(
+                    lambda: self.client.chat.completions.create(**params), key=cache_key
+                )
+                content = response.choices[0].message.content
+
+                usage = response.usage
+                usage_dict = {
+                    'prompt_tokens': usage.prompt_tokens,
+                    'completion_tokens': usage.completion_tokens,
+                    'total_tokens': usage.total_tokens,
+                    'baseline_prompt_tokens': self._estimate_separate_prompt_tokens(
+                        params, usage.prompt_tokens, regret_ratio, main_cause, language, data
+                    )
+                }
+
+            sections = json.loads(content)
+            result = {
+                'success': True,
+                'feedback': sections['psychology_analysis'].strip(),
+                'insights': sections['smart_insights'].strip(),
+                'error': None,
+                'usage': usage_dict
+            }
+            if cached:
+                result['cached'] = True
+            else:
+                self._store_cached_response(cache_key, content, usage_dict)
+            return self._record_call('combined', language, started, result)
+
+        except Exception as e:
+            error_message = str(e)
+
+            return self._record_call('combined', language, started, {
+                **failed, 'error': f"AI 분석 생성 중 오류 발생: {error_message}"
+            })
+
+    def _estimate_separate_prompt_tokens(self, combined_params: Dict, combined_tokens: int,
+                                         regret_ratio: float, main_cause: str,
+                                         language: str, data: Dict) -> int:
+        """
+        같은 데이터를 개별 호출 2회로 보냈을 때의 입력 토큰 추정치
+
+        통합 요청의 실제 입력 토큰에 로컬 토큰 계산 기준 두 요청의 차이를 더합니다.
+        """
+        top_regret_items = sorted(data['target_items'], key=lambda item: item['score'],
+                                  reverse=True)[:5]
+        feedback_params = self.build_feedback_request(
+            overall_score=data['overall_score'],
+            total_purchases=data['total_purchases'],
+            total_amount=data['total_amount'],
+            regret_ratio=regret_ratio,
+            main_cause=main_cause,
+            top_regret_items=top_regret_items,
+            category_breakdown=data['category_breakdown'],
+            language=language
+        )
+        insights_params = self.build_smart_insights_request(language=language, **data)
+
+        separate = self.count_request_tokens(feedback_params) + self.count_request_tokens(insights_params)
+        return combined_tokens + separate - self.count_request_tokens(combined_params)
+
+    def count_request_tokens(self, params: Dict) -> int:
+        """요청 메시지의 로컬 토큰 수 (메시지당 역할 구분 토큰 약 4개 포함)"""
+        return sum(count_tokens(m['content'], self.model) + 4 for m in params['messages'])
+
+    def stream_ai_feedback(self, language: str = 'ko', **kwargs) -> StreamingCompletion:
+        """
+        심리 분석 스트리밍 버전 (인자는 generate_ai_feedback과 동일)
+
+        Returns:
+            순회 시 텍스트 조각을 내보내는 StreamingCompletion
+        """
+        if not self.is_api_key_valid():
+            return _finished_stream(
+                'feedback', error='OPENAI_API_KEY가 유효하지 않습니다. .env 파일을 확인해주세요.'
+            )
+
+        return self._open_stream(
+            self.build_feedback_request(language=language, **kwargs), language,
+            call_type='psychology',
+            content_key='feedback',
+            error_prefix='AI 분석 생성 중 오류 발생'
+        )
+
+    def stream_smart_insights(self, language: str = 'ko', **kwargs) -> StreamingCompletion:
+        """
+        스마트 인사이트 스트리밍 버전 (인자는 generate_smart_insights와 동일)
+
+        Returns:
+            순회 시 텍스트 조각을 내보내는 StreamingCompletion
+        """
+        if not self.is_api_key_valid():
+            return _finished_stream('insights', error='API 키가 유효하지 않습니다.')
+
+        return self._open_stream(
+            self.build_smart_insights_request(language=language, **kwargs), language,
+            call_type='smart_insights',
+            content_key='insights',
+            error_prefix='스마트 인사이트 생성 중 오류 발생'
+        )
+
+    def _open_stream(self, params: Dict, language: str, call_type: str, content_key: str,
+                     error_prefix: str) -> StreamingCompletion:
+        """캐시 적중 시 저장된 응답을, 아니면 실제 API 스트림을 반환"""
+        started = time.perf_counter()
+        cache_key = self._response_cache_key(params, language)
+        cached = self._get_cached_response(cache_key, content_key)
+        if cached:
+            stream = _finished_stream(content_key, text=cached[content_key], usage=cached['usage'])
+            self._record_call(call_type, language, started, cached)
+            stream.usage = cached['usage']
+            return stream
+
+        def record(stream: StreamingCompletion) -> None:
+            result = self._record_call(
+                call_type, language, stream._started,
+                {'success': stream.success, 'error': stream.error, 'usage': stream.usage},
+                ttft=stream.ttft
+            )
+            stream.usage = result['usage']
+
+        return StreamingCompletion(
+            self.client, params,
+            content_key=content_key,
+            error_prefix=error_prefix,
+            on_complete=lambda text, usage: self._store_cached_response(cache_key, text, usage),
+            scheduler=self.scheduler,
+            on_finish=record
+        )
 
     def generate_quick_tips(self, regret_score: float) -> List[str]:
         """
@@ -485,6 +1171,31 @@ class OpenAIService:
             ]
 
 
+def _finished_stream(content_key: str, text: str = '', usage: Optional[Dict] = None,
+                     error: Optional[str] = None) -> StreamingCompletion:
+    """
+    API 호출 없이 끝난 스트림 (캐시 적중 또는 호출 전 실패)
+
+    Args:
+        content_key: 결과 dict의 본문 키
+        text: 한 번에 내보낼 텍스트 (캐시 적중 시)
+        usage: 저장된 토큰 사용량
+        error: 에러 메시지 (있으면 실패)
+    """
+    stream = StreamingCompletion(None, {}, content_key, error_prefix='')
+    stream._queue = queue.Queue()
+    if error:
+        stream.error = error
+    else:
+        stream.success = True
+        stream.usage = usage
+        stream._parts.append(text)
+        stream._queue.put(text)
+    stream._queue.put(_STREAM_END)
+    stream._finished = stream._started
+    return stream
+
+
 # 싱글톤 인스턴스 (선택사항)
 _openai_service = None
 
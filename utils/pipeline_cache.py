@@ -0,0 +1,131 @@
+"""
+CSV 업로드 파이프라인 결과 캐시
+
+업로드 파일 내용 해시 + 언어 + 계산 날짜를 키로 검증/전처리/후회 점수 계산 결과를 보관하여
+Streamlit rerun(슬라이더, 라디오 조작 등)마다 같은 파일을 다시 계산하지 않도록 합니다.
+- 프로세스 전체에서 공유하는 LRU (최대 항목 수 제한)
+- 세션별 소유 관리: 세션이 다른 파일로 바꾸거나 로그아웃하면 해당 세션만 쓰던 항목 제거
+- 경과 일수/시간 경과/최근성 점수는 오늘 날짜 기준이므로 날짜가 바뀌면 다른 키로 다시 계산
+- 저장된 DataFrame은 여러 세션이 공유하므로 꺼내 쓸 때는 복사본 사용
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Optional
+
+
+def hash_content(content: bytes) -> str:
+    """파일 내용 SHA-256 해시"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def make_cache_key(content_hash: str, language: str, as_of: Optional[date] = None) -> str:
+    """
+    캐시 키 생성 (내용 해시 + 언어 + 계산 날짜)
+
+    Args:
+        content_hash: 파일 내용 해시
+        language: 언어 코드
+        as_of: 계산 기준 날짜 (None이면 오늘)
+    """
+    return f"{content_hash}:{language}:{(as_of or date.today()).isoformat()}"
+
+
+class PipelineCache:
+    """세션 소유 정보를 가진 스레드 안전 LRU 캐시"""
+
+    def __init__(self, max_entries: int = 16):
+        """
+        Args:
+            max_entries: 최대 보관 항목 수 (초과 시 가장 오래 사용하지 않은 항목 제거)
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._owners = {}  # key → 해당 항목을 쓰는 세션 id 집합
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """캐시 조회 (적중 시 최근 사용으로 갱신)"""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: str, value: Any, owner: Optional[str] = None) -> None:
+        """
+        캐시 저장
+
+        Args:
+            key: 캐시 키
+            value: 파이프라인 결과
+            owner: 항목을 사용하는 세션 id
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if owner is not None:
+                self._owners.setdefault(key, set()).add(owner)
+
+            while len(self._entries) > self.max_entries:
+                oldest, _ = self._entries.popitem(last=False)
+                self._owners.pop(oldest, None)
+
+    def acquire(self, key: str, owner: str) -> None:
+        """기존 항목에 세션 소유 등록 (다른 세션이 만든 항목 재사용 시)"""
+        with self._lock:
+            if key in self._entries:
+                self._owners.setdefault(key, set()).add(owner)
+
+    def release(self, owner: str, keep: Optional[str] = None) -> None:
+        """
+        세션 소유 해제 (다른 세션이 쓰지 않는 항목은 제거)
+
+        Args:
+            owner: 세션 id
+            keep: 계속 사용할 키 (현재 업로드된 파일)
+        """
+        with self._lock:
+            for key in list(self._owners):
+                if key == keep:
+                    continue
+                owners = self._owners[key]
+                if owner not in owners:
+                    continue
+                owners.discard(owner)
+                if not owners:
+                    del self._owners[key]
+                    self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """전체 캐시 비우기"""
+        with self._lock:
+            self._entries.clear()
+            self._owners.clear()
+
+
+# 싱글톤 인스턴스
+_csv_pipeline_cache = None
+
+
+def get_csv_pipeline_cache() -> PipelineCache:
+    """
+    CSV 파이프라인 캐시 싱글톤 반환
+
+    Returns:
+        PipelineCache 인스턴스
+    """
+    global _csv_pipeline_cache
+
+    if _csv_pipeline_cache is None:
+        _csv_pipeline_cache = PipelineCache(
+            max_entries=int(os.getenv('CSV_CACHE_MAX_ENTRIES', '16'))
+        )
+
+    return _csv_pipeline_cache
@@ -0,0 +1,146 @@
+"""
+프롬프트 토큰 예산 관리
+
+프롬프트의 데이터 부분(구매 항목, 카테고리 통계)을 간결한 표 형식으로 만들고,
+로컬에서 토큰 수를 세어 설정한 예산을 넘지 않는 범위에서 중요한 행부터 담습니다.
+- tiktoken 설치 시 모델 인코딩으로 정확히 계산, 없거나 인코딩 로드 실패 시 글자 수 기반 근사
+- 예산 초과로 빠진 행은 요약 행(예: 기타 N개) 하나로 합칠 수 있음
+"""
+
+import math
+from typing import Callable, Dict, List, Optional, Sequence
+
+# tiktoken은 선택적 의존성
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# 모델별 인코딩 캐시
+_encodings: Dict[str, object] = {}
+
+
+def _get_encoding(model: str):
+    """
+    모델 인코딩 반환 (알 수 없는 모델은 o200k_base)
+
+    인코딩 파일 다운로드/로드에 실패하면 None을 캐시하여 글자 수 기반 근사를 사용합니다.
+    """
+    if model not in _encodings:
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding('o200k_base')
+        except Exception:
+            encoding = None
+        _encodings[model] = encoding
+    return _encodings[model]
+
+
+def count_tokens(text: str, model: str = 'gpt-4o-mini') -> int:
+    """
+    텍스트 토큰 수 계산
+
+    tiktoken이 없거나 인코딩을 불러오지 못하면 ASCII는 4글자당 1토큰,
+    한글/일본어 등 그 외 문자는 글자당 1토큰으로 근사합니다 (실제보다 약간 크게 잡히는 보수적 추정).
+
+    Args:
+        text: 대상 텍스트
+        model: 모델명 (인코딩 선택용)
+
+    Returns:
+        토큰 수
+    """
+    if not text:
+        return 0
+
+    encoding = _get_encoding(model) if TIKTOKEN_AVAILABLE else None
+    if encoding is not None:
+        return len(encoding.encode(text))
+
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+def _table_line(cells: Sequence) -> str:
+    """표 한 줄 (| 구분, 셀 안의 |는 /로 치환)"""
+    return '|'.join(str(cell).replace('|', '/').replace('\n', ' ') for cell in cells)
+
+
+class TokenBudget:
+    """프롬프트 데이터 부분의 토큰 예산"""
+
+    def __init__(self, max_tokens: int, model: str = 'gpt-4o-mini'):
+        """
+        Args:
+            max_tokens: 데이터 부분에 쓸 수 있는 최대 토큰 수
+            model: 모델명 (토큰 계산용)
+        """
+        self.max_tokens = max_tokens
+        self.model = model
+        self.used = 0
+
+    @property
+    def remaining(self) -> int:
+        """남은 토큰 수"""
+        return max(self.max_tokens - self.used, 0)
+
+    def take_rows(
+        self,
+        headers: Sequence[str],
+        rows: List[Sequence],
+        overflow_row: Optional[Callable[[List[Sequence]], Sequence]] = None
+    ) -> str:
+        """
+        헤더 + 우선순위 순 행을 예산 안에서 표로 구성
+
+        Args:
+            headers: 열 이름
+            rows: 중요도 높은 순으로 정렬된 행 목록
+            overflow_row: 예산 초과로 빠진 행들을 받아 요약 행 하나를 만드는 함수
+
+        Returns:
+            표 문자열 (담을 행이 없으면 빈 문자열)
+        """
+        if not rows:
+            return ''
+
+        header_line = _table_line(headers)
+        lines = [header_line]
+        used = count_tokens(header_line + '\n', self.model)
+        if used > self.remaining:
+            return ''
+
+        line_tokens = []
+        for row in rows:
+            line = _table_line(row)
+            tokens = count_tokens(line + '\n', self.model)
+            if used + tokens > self.remaining:
+                break
+            lines.append(line)
+            line_tokens.append(tokens)
+            used += tokens
+
+        # 빠진 행이 있으면 요약 행이 들어갈 때까지 마지막 행을 하나씩 빼서 자리 확보
+        kept = len(line_tokens)
+        if kept < len(rows) and overflow_row is not None:
+            while True:
+                summary = _table_line(overflow_row(rows[kept:]))
+                summary_tokens = count_tokens(summary + '\n', self.model)
+                if used + summary_tokens <= self.remaining or kept == 0:
+                    break
+                kept -= 1
+                used -= line_tokens.pop()
+                lines.pop()
+
+            if used + summary_tokens <= self.remaining:
+                lines.append(summary)
+                used += summary_tokens
+
+        if len(lines) == 1:
+            return ''
+
+        self.used += used
+        return '\n'.join(lines)
@@ -7,7 +7,10 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, time
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+
+from utils.date_index import WindowedCountIndex, DAY_NS, to_ns
+from utils.translations import t
 
 # 식비 관련 카테고리 키워드
 FOOD_KEYWORDS = {'식비', '음식', '배달', '카페', '커피', '외식', '식료품', '간식', '식사', '음료'}
@@ -155,22 +158,36 @@ def calculate_category_repetition_score(
     if len(category_purchase_dates) <= 1:
         return 0
 
-    # 현재 구매 전후 30일 이내의 구매 건수
-    nearby_purchases = [
-        d for d in category_purchase_dates
-        if d != current_date and abs((d - current_date).days) <= 30
-    ]
+    index = WindowedCountIndex(category_purchase_dates)
+    nearby_count = count_category_nearby(index, None, to_ns([current_date]))
+    return int(category_repetition_points(nearby_count)[0])
 
-    nearby_count = len(nearby_purchases)
 
-    if nearby_count >= 3:
-        return 15  # 한 달 내 4건 이상 (현재 포함)
-    elif nearby_count == 2:
-        return 10  # 한 달 내 3건
-    elif nearby_count == 1:
-        return 5   # 한 달 내 2건
-    else:
-        return 0
+def count_category_nearby(index: WindowedCountIndex, keys, dates_ns: np.ndarray) -> np.ndarray:
+    """
+    같은 키의 전후 30일 이내 구매 건수 (같은 시각의 구매는 제외)
+
+    abs((d - t).days) <= 30 조건은 t - 30일 <= d < t + 31일 과 같습니다.
+
+    Args:
+        index: 구매 시각 인덱스 (키 = 카테고리)
+        keys: 질의별 카테고리 (None이면 단일 키 인덱스)
+        dates_ns: 질의 시각 (나노초)
+
+    Returns:
+        질의별 인접 구매 건수
+    """
+    return (index.count_around(keys, dates_ns, 30 * DAY_NS, 31 * DAY_NS - 1)
+            - index.count_around(keys, dates_ns, 0, 0))
+
+
+def category_repetition_points(nearby_count: np.ndarray) -> np.ndarray:
+    """인접 구매 건수 → 반복 구매 점수 (0-15)"""
+    return np.select(
+        [nearby_count >= 3, nearby_count == 2, nearby_count == 1],
+        [15, 10, 5],  # 한 달 내 4건 이상 / 3건 / 2건 (현재 포함)
+        default=0
+    )
 
 
 def calculate_late_night_score(purchase_datetime: datetime) -> float:
@@ -223,30 +240,39 @@ def calculate_impulse_buying_pattern_score(
     Returns:
         충동 구매 패턴 점수 (0-10)
     """
-    # 같은 날 구매 건수
-    same_day_count = sum(1 for d in all_purchase_dates if d.date() == purchase_date.date())
+    index = WindowedCountIndex(all_purchase_dates)
+    same_day_count, consecutive_count = count_impulse_neighbors(index, to_ns([purchase_date]))
+    return int(impulse_pattern_points(same_day_count, consecutive_count)[0])
 
-    if same_day_count >= 4:
-        return 10  # 하루에 4건 이상
-    elif same_day_count == 3:
-        return 7   # 하루에 3건
-    elif same_day_count == 2:
-        return 4   # 하루에 2건
 
-    # 연속 3일 이내 구매 건수
-    consecutive_purchases = sum(
-        1 for d in all_purchase_dates
-        if 0 <= (purchase_date - d).days <= 3 and d != purchase_date
-    )
+def count_impulse_neighbors(index: WindowedCountIndex, dates_ns: np.ndarray):
+    """
+    충동 구매 패턴용 건수 계산
 
-    if consecutive_purchases >= 5:
-        return 8
-    elif consecutive_purchases >= 3:
-        return 5
-    elif consecutive_purchases >= 2:
-        return 3
+    Args:
+        index: 전체 구매 시각 인덱스 (단일 키)
+        dates_ns: 질의 시각 (나노초)
 
-    return 0
+    Returns:
+        (같은 날 구매 건수(자신 포함), 직전 3일 이내 구매 건수(같은 시각 제외))
+        직전 3일 조건 0 <= (t - d).days <= 3 은 t - 4일 < d <= t 와 같습니다.
+    """
+    dates_ns = np.asarray(dates_ns, dtype=np.int64)
+    day_start = np.floor_divide(dates_ns, DAY_NS) * DAY_NS
+    same_day_count = index.count_many(None, day_start, day_start + DAY_NS - 1)
+    consecutive_count = (index.count_around(None, dates_ns, 4 * DAY_NS - 1, 0)
+                         - index.count_around(None, dates_ns, 0, 0))
+    return same_day_count, consecutive_count
+
+
+def impulse_pattern_points(same_day_count: np.ndarray, consecutive_count: np.ndarray) -> np.ndarray:
+    """같은 날/연속 구매 건수 → 충동 구매 패턴 점수 (0-10)"""
+    return np.select(
+        [same_day_count >= 4, same_day_count == 3, same_day_count == 2,
+         consecutive_count >= 5, consecutive_count >= 3, consecutive_count >= 2],
+        [10, 7, 4, 8, 5, 3],
+        default=0
+    )
 
 
 def calculate_regret_score(
@@ -316,6 +342,163 @@ def calculate_regret_score(
     return scores
 
 
+# 점수 요소 → DataFrame 컬럼명
+SCORE_COLUMNS = {
+    'total_score': '후회점수',
+    'necessity_gap': '후회점수_필요도갭',
+    'time_decay': '후회점수_시간경과',
+    'price_weight': '후회점수_금액',
+    'recency': '후회점수_최근성',
+    'category_repetition': '후회점수_반복구매',
+    'late_night': '후회점수_새벽구매',
+    'impulse_pattern': '후회점수_충동패턴'
+}
+
+def calculate_regret_scores_vectorized(
+    df: pd.DataFrame,
+    current_date: datetime = None
+) -> pd.DataFrame:
+    """
+    전체 구매의 후회 점수를 열 단위(NumPy 배열 연산)로 한 번에 계산
+
+    calculate_regret_score()를 행마다 호출하는 것과 같은 결과를 내지만,
+    통계값·날짜 정렬을 한 번만 수행하므로 O(n log n)으로 동작합니다.
+
+    Args:
+        df: 구매 데이터 DataFrame (날짜, 카테고리, 금액, 필요도, 사용빈도)
+        current_date: 기준 날짜 (기본값: 현재)
+
+    Returns:
+        요소별 점수 DataFrame (index는 df와 동일)
+        컬럼: total_score, necessity_gap, time_decay, price_weight,
+              recency, category_repetition, late_night, impulse_pattern
+    """
+    if current_date is None:
+        current_date = pd.Timestamp.now()
+
+    dates_ns = to_ns(df['날짜'])
+    amount = pd.to_numeric(df['금액']).to_numpy(dtype=float)
+    row_scores = _row_scores(df)
+
+    # 5) 카테고리 반복 구매
+    category_index = WindowedCountIndex(dates_ns, keys=df['카테고리'])
+    category_repetition = category_repetition_points(
+        count_category_nearby(category_index, df['카테고리'], dates_ns)
+    )
+
+    # 7) 충동 구매 패턴
+    impulse_pattern = impulse_pattern_points(
+        *count_impulse_neighbors(WindowedCountIndex(dates_ns), dates_ns)
+    )
+
+    time_scores = _time_scores(dates_ns, row_scores['usage'], row_scores['food'], current_date)
+    price_weight = _price_weight_scores(amount, df['금액'].mean(), df['금액'].max())
+
+    return _assemble_scores(
+        row_scores['necessity_gap'], time_scores['time_decay'], price_weight,
+        time_scores['recency'], category_repetition, row_scores['late_night'],
+        impulse_pattern, index=df.index
+    )
+
+
+def _row_scores(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """행 자체 값만으로 정해지는 요소 (필요도 갭, 새벽 구매) 계산"""
+    n = len(df)
+    necessity = pd.to_numeric(df['필요도']).to_numpy(dtype=float)
+    usage = pd.to_numeric(df['사용빈도']).to_numpy(dtype=float)
+
+    # 식비 카테고리 여부 (고유 카테고리 단위로 판정)
+    category_codes, categories = pd.factorize(df['카테고리'])
+    food_by_code = np.array([is_food_category(str(c)) for c in categories], dtype=bool)
+    food = np.zeros(n, dtype=bool)
+    valid_category = category_codes >= 0
+    food[valid_category] = food_by_code[category_codes[valid_category]]
+
+    # 1) 필요도-사용빈도 갭
+    gap = necessity - usage
+    necessity_gap = np.select(
+        [gap <= 0, gap == 1, gap == 2, gap == 3],
+        [0, 5, 12, 20],
+        default=30
+    )
+    necessity_gap[food] = 0
+
+    # 6) 새벽 구매
+    hour = pd.to_datetime(df['날짜']).dt.hour.to_numpy(dtype=float)
+    late_night = np.select(
+        [hour < 5, hour >= 23, hour >= 21],
+        [10, 7, 4],
+        default=0
+    )
+
+    return {
+        'usage': usage,
+        'food': food,
+        'necessity_gap': necessity_gap,
+        'late_night': late_night
+    }
+
+
+def _time_scores(dates_ns: np.ndarray, usage: np.ndarray, food: np.ndarray,
+                 current_date: datetime) -> Dict[str, np.ndarray]:
+    """기준 날짜에 따라 달라지는 요소 (시간 경과, 최근성) 계산"""
+    now_ns = pd.Timestamp(current_date).as_unit('ns').value
+
+    # 경과 일수 (Timedelta.days와 동일하게 내림)
+    days_since = np.floor_divide(now_ns - dates_ns, DAY_NS)
+
+    # 2) 시간 경과
+    time_weight = np.select(
+        [days_since < 30, days_since < 90, days_since < 180],
+        [0.3, 0.6, 0.9],
+        default=1.2
+    )
+    time_decay = np.minimum((5 - usage) / 4 * time_weight * 12, 15)
+    time_decay[(days_since < 7) | food] = 0
+
+    # 4) 최근성
+    recency = np.select(
+        [days_since <= 3, days_since <= 7, days_since <= 14, days_since <= 30],
+        [8, 6, 4, 2],
+        default=0
+    )
+
+    return {'time_decay': time_decay, 'recency': recency}
+
+
+def _price_weight_scores(amount: np.ndarray, avg_amount: float, max_amount: float) -> np.ndarray:
+    """3) 금액 가중치 (전체 평균/최대 금액 기준)"""
+    price_ratio = amount / avg_amount if avg_amount > 0 else np.ones(len(amount))
+    max_ratio = amount / max_amount if max_amount > 0 else np.zeros(len(amount))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_amount = np.log10(amount / 1000)
+    return np.where(
+        amount <= 10000,
+        2.0,
+        np.minimum(price_ratio * 4 + max_ratio * 6 + log_amount * 2, 20)
+    )
+
+
+def _assemble_scores(necessity_gap, time_decay, price_weight, recency,
+                     category_repetition, late_night, impulse_pattern,
+                     index=None) -> pd.DataFrame:
+    """요소별 점수 배열을 합쳐 total_score를 포함한 DataFrame 생성"""
+    scores = pd.DataFrame({
+        'necessity_gap': necessity_gap,
+        'time_decay': time_decay,
+        'price_weight': price_weight,
+        'recency': recency,
+        'category_repetition': category_repetition,
+        'late_night': late_night,
+        'impulse_pattern': impulse_pattern
+    }, index=index)
+
+    # 총 점수 계산 (최대 100점)
+    scores.insert(0, 'total_score', np.minimum(scores.sum(axis=1, skipna=False), 100))
+
+    return scores
+
+
 def add_regret_scores_to_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """
     DataFrame의 모든 행에 후회 점수 추가
@@ -328,33 +511,204 @@ def add_regret_scores_to_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """
     result_df = df.copy()
 
-    # 각 행별로 후회 점수 계산
-    regret_data = []
-
-    for idx, row in result_df.iterrows():
-        scores = calculate_regret_score(
-            necessity=row['필요도'],
-            usage=row['사용빈도'],
-            amount=row['금액'],
-            purchase_date=row['날짜'],
-            category=row['카테고리'],
-            df=result_df
+    # 전체 행을 한 번에 계산 (행 순서/인덱스 유지)
+    scores = calculate_regret_scores_vectorized(result_df)
+
+    for key, column in SCORE_COLUMNS.items():
+        result_df[column] = scores[key]
+
+    return result_df
+
+
+class IncrementalRegretScorer:
+    """
+    사용자별 후회 점수 증분 계산기
+
+    전체 이력의 금액 합계/최대값과 카테고리별·전체 날짜 인덱스를 유지하여,
+    구매가 추가/삭제되면 해당 구매와 그 구매가 ±30일·3일 창에 걸리는
+    이웃 행의 반복 구매/충동 패턴 점수만 다시 계산합니다.
+    (기준 날짜·평균 금액에 따라 달라지는 요소는 scored_frame()에서 배열 연산으로 갱신)
+    """
+
+    # 내부 상태 컬럼 (scored_frame 결과에서는 제외)
+    _STATE_COLUMNS = ['_ns', '_usage', '_food', '_necessity_gap', '_late_night',
+                      '_category_repetition', '_impulse_pattern']
+
+    def __init__(self, id_column: str = '_id'):
+        """
+        Args:
+            id_column: 행 식별 컬럼 (DB purchases.id)
+        """
+        self.id_column = id_column
+        self._frame: Optional[pd.DataFrame] = None
+        self._category_index = WindowedCountIndex(np.array([], dtype=np.int64), keys=[])
+        self._all_index = WindowedCountIndex(np.array([], dtype=np.int64))
+        self._amount_sum = 0.0
+        self._amount_count = 0
+        self._amount_max = np.nan
+
+    def __len__(self) -> int:
+        return 0 if self._frame is None else len(self._frame)
+
+    def diff(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List]:
+        """
+        최신 구매 목록과 현재 상태 비교
+
+        Args:
+            df: 최신 구매 DataFrame (id_column 포함)
+
+        Returns:
+            (새로 추가된 행 DataFrame, 삭제된 행 id 리스트)
+        """
+        known = pd.Index([] if self._frame is None else self._frame[self.id_column])
+        latest = pd.Index(df[self.id_column])
+        added = df[~latest.isin(known)]
+        removed = known.difference(latest).tolist()
+        return added, removed
+
+    def add(self, df: pd.DataFrame) -> None:
+        """
+        전처리된 구매 행 추가 (process_csv_data 결과)
+
+        Args:
+            df: 추가할 구매 DataFrame (id_column 포함)
+        """
+        if df is None or len(df) == 0:
+            return
+
+        new = df.copy()
+        dates_ns = to_ns(new['날짜'])
+        row_scores = _row_scores(new)
+        new['_ns'] = dates_ns
+        new['_usage'] = row_scores['usage']
+        new['_food'] = row_scores['food']
+        new['_necessity_gap'] = row_scores['necessity_gap']
+        new['_late_night'] = row_scores['late_night']
+        new['_category_repetition'] = 0
+        new['_impulse_pattern'] = 0
+
+        # 금액 통계
+        amount = pd.to_numeric(new['금액']).to_numpy(dtype=float)
+        valid = ~np.isnan(amount)
+        self._amount_sum += amount[valid].sum()
+        self._amount_count += int(valid.sum())
+        if valid.any():
+            self._amount_max = np.nanmax([self._amount_max, amount[valid].max()])
+
+        # 날짜 인덱스
+        self._category_index.add(dates_ns, keys=new['카테고리'])
+        self._all_index.add(dates_ns)
+
+        frames = [new] if self._frame is None else [self._frame, new]
+        self._frame = (pd.concat(frames)
+                       .sort_values('_ns', kind='stable')
+                       .reset_index(drop=True))
+
+        self._rescore_neighbors(dates_ns)
+
+    def remove(self, ids: List) -> None:
+        """
+        구매 행 삭제
+
+        Args:
+            ids: 삭제할 행 id 리스트
+        """
+        if self._frame is None or not len(ids):
+            return
+
+        mask = self._frame[self.id_column].isin(ids).to_numpy()
+        if not mask.any():
+            return
+
+        removed = self._frame[mask]
+        dates_ns = removed['_ns'].to_numpy(dtype=np.int64)
+
+        self._category_index.remove(dates_ns, keys=removed['카테고리'])
+        self._all_index.remove(dates_ns)
+        self._frame = self._frame[~mask].reset_index(drop=True)
+
+        # 금액 통계 (최대값이 빠진 경우에만 다시 계산)
+        amount = pd.to_numeric(removed['금액']).to_numpy(dtype=float)
+        valid = ~np.isnan(amount)
+        self._amount_sum -= amount[valid].sum()
+        self._amount_count -= int(valid.sum())
+        if valid.any() and amount[valid].max() >= self._amount_max:
+            self._amount_max = self._frame['금액'].max() if len(self._frame) else np.nan
+
+        self._rescore_neighbors(dates_ns)
+
+    def _rescore_neighbors(self, changed_ns: np.ndarray) -> None:
+        """
+        변경된 시각의 창에 걸리는 행만 반복 구매/충동 패턴 점수 재계산
+
+        시각 x의 추가/삭제는 카테고리 창(d - 30일 <= x < d + 31일),
+        같은 날, 직전 3일 창(d - 4일 < x <= d)에 x가 들어가는 행 d,
+        즉 x - 31일 < d <= x + 30일 범위의 행에만 영향을 줍니다.
+        """
+        if self._frame is None or len(self._frame) == 0 or len(changed_ns) == 0:
+            return
+
+        frame_ns = self._frame['_ns'].to_numpy(dtype=np.int64)
+        changed_ns = np.sort(np.asarray(changed_ns, dtype=np.int64))
+        starts = np.searchsorted(frame_ns, changed_ns - 31 * DAY_NS + 1, side='left')
+        ends = np.searchsorted(frame_ns, changed_ns + 30 * DAY_NS, side='right')
+
+        # 구간 병합 후 영향 받는 행 위치 수집
+        affected = np.zeros(len(frame_ns) + 1, dtype=np.int64)
+        np.add.at(affected, starts, 1)
+        np.add.at(affected, ends, -1)
+        positions = np.flatnonzero(np.cumsum(affected)[:-1] > 0)
+        if len(positions) == 0:
+            return
+
+        dates_ns = frame_ns[positions]
+        categories = self._frame['카테고리'].iloc[positions]
+
+        self._frame.loc[positions, '_category_repetition'] = category_repetition_points(
+            count_category_nearby(self._category_index, categories, dates_ns)
+        )
+        self._frame.loc[positions, '_impulse_pattern'] = impulse_pattern_points(
+            *count_impulse_neighbors(self._all_index, dates_ns)
         )
-        regret_data.append(scores)
 
-    # 점수를 DataFrame에 추가
-    regret_df = pd.DataFrame(regret_data)
+    def scored_frame(self, current_date: datetime = None) -> Optional[pd.DataFrame]:
+        """
+        후회 점수가 포함된 DataFrame 반환 (add_regret_scores_to_dataframe과 동일한 컬럼)
 
-    result_df['후회점수'] = regret_df['total_score']
-    result_df['후회점수_필요도갭'] = regret_df['necessity_gap']
-    result_df['후회점수_시간경과'] = regret_df['time_decay']
-    result_df['후회점수_금액'] = regret_df['price_weight']
-    result_df['후회점수_최근성'] = regret_df['recency']
-    result_df['후회점수_반복구매'] = regret_df['category_repetition']
-    result_df['후회점수_새벽구매'] = regret_df['late_night']
-    result_df['후회점수_충동패턴'] = regret_df['impulse_pattern']
+        Args:
+            current_date: 기준 날짜 (기본값: 현재)
 
-    return result_df
+        Returns:
+            날짜 내림차순 DataFrame 또는 None (데이터 없음)
+        """
+        if self._frame is None or len(self._frame) == 0:
+            return None
+
+        if current_date is None:
+            current_date = pd.Timestamp.now()
+
+        frame = self._frame
+        dates_ns = frame['_ns'].to_numpy(dtype=np.int64)
+        time_scores = _time_scores(
+            dates_ns, frame['_usage'].to_numpy(), frame['_food'].to_numpy(), current_date
+        )
+        avg_amount = self._amount_sum / self._amount_count if self._amount_count else np.nan
+        price_weight = _price_weight_scores(
+            pd.to_numeric(frame['금액']).to_numpy(dtype=float), avg_amount, self._amount_max
+        )
+        scores = _assemble_scores(
+            frame['_necessity_gap'].to_numpy(), time_scores['time_decay'], price_weight,
+            time_scores['recency'], frame['_category_repetition'].to_numpy(),
+            frame['_late_night'].to_numpy(), frame['_impulse_pattern'].to_numpy(),
+            index=frame.index
+        )
+
+        result_df = frame.drop(columns=self._STATE_COLUMNS)
+        result_df['경과일수'] = (pd.Timestamp(current_date) - result_df['날짜']).dt.days
+        for key, column in SCORE_COLUMNS.items():
+            result_df[column] = scores[key]
+
+        return result_df.iloc[::-1].reset_index(drop=True)
 
 
 def get_regret_score_interpretation(score: float) -> Dict[str, str]:
@@ -476,3 +830,112 @@ def get_overall_regret_analysis(df: pd.DataFrame) -> Dict:
         },
         'interpretation': get_regret_score_interpretation(avg_regret_score)
     }
+
+
+def prepare_smart_insights_data(df, category_summary: Optional[pd.DataFrame] = None):
+    """
+    스마트 인사이트용 데이터 준비
+
+    Args:
+        df: 후회 점수가 포함된 DataFrame
+        category_summary: 서버 측 카테고리 집계 (get_category_summary 형태, 있으면 재집계 생략)
+    """
+    # Top 5 후회 항목
+    top_regret = df.nlargest(5, '후회점수')
+
+    # Top 3 고가 항목
+    top_expensive = df.nlargest(3, '금액')
+
+    # 중복 제거 (최대 8건)
+    combined_indices = list(set(top_regret.index.tolist() + top_expensive.index.tolist()))
+    target_df = df.loc[combined_indices]
+
+    target_items = []
+    for _, row in target_df.iterrows():
+        target_items.append({
+            'category': row['카테고리'],
+            'product': row['상품명'],
+            'amount': int(row['금액']),
+            'score': float(row['후회점수']),
+            'necessity': int(row['필요도']),
+            'usage': int(row['사용빈도'])
+        })
+
+    if category_summary is not None:
+        # 서버 집계 사용 (원본 행 재집계 없음)
+        category_spending = {
+            cat: int(amount)
+            for cat, amount in zip(category_summary['카테고리'], category_summary['총_금액'])
+        }
+        category_stats = {
+            row['카테고리']: {'count': int(row['구매_건수']), 'amount': int(row['총_금액'])}
+            for _, row in category_summary.iterrows()
+        }
+    else:
+        # 카테고리별 지출
+        category_spending = df.groupby('카테고리', observed=True)['금액'].sum().to_dict()
+
+        # 카테고리별 통계
+        category_stats = {}
+        for category in df['카테고리'].unique():
+            cat_df = df[df['카테고리'] == category]
+            category_stats[category] = {
+                'count': len(cat_df),
+                'amount': int(cat_df['금액'].sum())
+            }
+
+    return {
+        'target_items': target_items,
+        'category_spending': category_spending,
+        'category_breakdown': category_stats
+    }
+
+
+def build_ai_analysis_inputs(df: pd.DataFrame, language: str = 'ko',
+                             category_summary: Optional[pd.DataFrame] = None) -> Dict:
+    """
+    AI 분석 프롬프트 입력 준비 (화면 분석 버튼과 배치 사전 생성 공용)
+
+    같은 데이터면 같은 프롬프트가 만들어지도록 한 곳에서 준비합니다.
+
+    Args:
+        df: 후회 점수가 포함된 DataFrame
+        language: 언어 코드 (주요 원인 이름 번역용)
+        category_summary: 서버 측 카테고리 집계 (있으면 카테고리 통계에 사용)
+
+    Returns:
+        {overall_score, total_purchases, total_amount, regret_ratio, main_cause,
+         top_regret_items, target_items, category_spending, category_breakdown}
+    """
+    analysis = get_overall_regret_analysis(df)
+    insights_data = prepare_smart_insights_data(df, category_summary)
+
+    # 상위 후회 항목
+    top_regret = df.nlargest(5, '후회점수')
+    top_regret_items = []
+    for _, row in top_regret.iterrows():
+        top_regret_items.append({
+            'category': row['카테고리'],
+            'product': row['상품명'],
+            'amount': int(row['금액']),
+            'score': float(row['후회점수'])
+        })
+
+    # 주요 원인 변환
+    cause_names = t('cause_names', language)
+    main_cause = cause_names.get(
+        analysis['main_cause']['name'],
+        analysis['main_cause']['name']
+    )
+
+    return {
+        'overall_score': analysis['avg_regret_score'],
+        'total_purchases': analysis['total_purchases'],
+        'total_amount': df['금액'].sum(),
+        'regret_ratio': analysis['regret_ratio'],
+        'main_cause': main_cause,
+        'top_regret_items': top_regret_items,
+        'target_items': insights_data['target_items'],
+        'category_spending': insights_data['category_spending'],
+        'category_breakdown': insights_data['category_breakdown']
+    }
@@ -0,0 +1,281 @@
+"""
+OpenAI 요청 스케줄러 (프로세스 전역)
+
+여러 Streamlit 세션이 동시에 AI 분석을 요청해도 API 호출이 폭주하지 않도록 합니다.
+- 동시 실행 제한: 세마포어로 진행 중인 요청 수 상한
+- 토큰 버킷: 초당 요청 수 제한 (순간 burst 허용)
+- 재시도: 429/5xx/연결 오류 시 지터가 섞인 지수 백오프 (Retry-After 헤더 우선)
+- single-flight: 같은 키(같은 프롬프트)로 진행 중인 요청이 있으면 새로 보내지 않고 그 결과를 공유
+"""
+
+import os
+import time
+import random
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+# 재시도 대상 HTTP 상태 코드
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """스레드 안전 토큰 버킷"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: 초당 충전 토큰 수 (0 이하면 제한 없음)
+            capacity: 최대 보유 토큰 수 (burst 허용량)
+        """
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        토큰 1개 획득 (없으면 충전될 때까지 대기)
+
+        Returns:
+            대기한 시간 (초)
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """응답의 Retry-After 헤더 (초)"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """재시도할 오류인지 판단 (429/5xx 상태 코드, 연결/타임아웃 오류)"""
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return type(error).__name__ in ('APIConnectionError', 'APITimeoutError',
+                                    'ConnectionError', 'TimeoutError')
+
+
+class RequestScheduler:
+    """동시 실행 제한 + 속도 제한 + 재시도 + single-flight 스케줄러"""
+
+    def __init__(self, max_concurrency: int = 4, rate_per_second: float = 2.0,
+                 burst: int = 4, max_retries: int = 4,
+                 base_delay: float = 0.5, max_delay: float = 8.0):
+        """
+        Args:
+            max_concurrency: 동시에 진행할 수 있는 최대 요청 수
+            rate_per_second: 초당 새 요청 수 (0 이하면 제한 없음)
+            burst: 순간적으로 허용할 요청 수
+            max_retries: 최대 재시도 횟수
+            base_delay: 첫 재시도 대기 상한 (초)
+            max_delay: 재시도 대기 상한 (초)
+        """
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(rate_per_second, burst)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._inflight: Dict[str, Future] = {}
+        self._stats = {
+            'submitted': 0,
+            'executed': 0,
+            'coalesced': 0,
+            'retries': 0,
+            'failed': 0,
+            'in_flight': 0,
+            'max_in_flight': 0,
+            'rate_wait_seconds': 0.0
+        }
+
+    def stats(self) -> Dict:
+        """누적 통계 복사본"""
+        with self._lock:
+            return dict(self._stats)
+
+    def last_retries(self) -> int:
+        """현재 스레드에서 마지막으로 실행한 요청의 재시도 횟수 (공유된 결과는 0)"""
+        return getattr(self._local, 'retries', 0)
+
+    def last_shared(self) -> bool:
+        """현재 스레드의 마지막 요청이 다른 요청의 결과를 공유받았는지 (single-flight 후속 요청)"""
+        return getattr(self._local, 'shared', False)
+
+    def _count(self, name: str, amount=1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    @contextmanager
+    def slot(self):
+        """동시 실행 슬롯 점유 (스트리밍 응답은 수신이 끝날 때까지 점유)"""
+        self._semaphore.acquire()
+        with self._lock:
+            self._stats['in_flight'] += 1
+            self._stats['max_in_flight'] = max(self._stats['max_in_flight'],
+                                               self._stats['in_flight'])
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._stats['in_flight'] -= 1
+            self._semaphore.release()
+
+    def call(self, func: Callable[[], Any], key: Optional[str] = None) -> Any:
+        """
+        요청 실행 (슬롯 점유 + 속도 제한 + 재시도)
+
+        Args:
+            func: API 호출 함수
+            key: single-flight 키 (같은 키로 진행 중인 요청이 있으면 그 결과 공유)
+
+        Returns:
+            func 반환값 (공유된 경우 먼저 보낸 요청의 결과)
+        """
+        self._count('submitted')
+        self._local.retries = 0
+        self._local.shared = False
+        if key is None:
+            return self._attempt(func)
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            self._local.shared = True
+            return future.result()
+
+        try:
+            result = self._attempt(func)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    @contextmanager
+    def stream(self, func: Callable[[], Any]):
+        """
+        스트림 열기 (시도마다 대기 후 슬롯 점유, 열기에 성공하면 수신이 끝날 때까지 슬롯 유지)
+
+        실패한 시도는 백오프 대기 전에 슬롯을 반납하므로 재시도 대기 중에
+        다른 요청을 막지 않습니다.
+
+        Args:
+            func: 스트림을 여는 API 호출 함수
+
+        Yields:
+            func 반환값 (열린 스트림)
+        """
+        self._count('submitted')
+        self._local.retries = 0
+        self._local.shared = False
+        attempt = 0
+        while True:
+            self._count('rate_wait_seconds', self._bucket.acquire())
+            with self.slot():
+                try:
+                    self._count('executed')
+                    stream = func()
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable_error(e):
+                        self._count('failed')
+                        raise
+                    delay = self._backoff(attempt, e)
+                else:
+                    yield stream
+                    return
+
+            attempt += 1
+            self._local.retries = attempt
+            self._count('retries')
+            time.sleep(delay)
+
+    def _attempt(self, func: Callable[[], Any]) -> Any:
+        """재시도 루프 (대기는 슬롯 밖에서)"""
+        attempt = 0
+        while True:
+            self._count('rate_wait_seconds', self._bucket.acquire())
+            try:
+                self._count('executed')
+                with self.slot():
+                    return func()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    self._count('failed')
+                    raise
+                delay = self._backoff(attempt, e)
+
+            attempt += 1
+            self._local.retries = attempt
+            self._count('retries')
+            time.sleep(delay)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """대기 시간 (Retry-After 우선, 없으면 full jitter 지수 백오프)"""
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+# 싱글톤 인스턴스
+_request_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_request_scheduler() -> RequestScheduler:
+    """
+    프로세스 전역 요청 스케줄러 반환
+
+    Returns:
+        RequestScheduler 인스턴스
+    """
+    global _request_scheduler
+
+    with _scheduler_lock:
+        if _request_scheduler is None:
+            _request_scheduler = RequestScheduler(
+                max_concurrency=int(os.getenv('OPENAI_MAX_CONCURRENCY', '4')),
+                rate_per_second=float(os.getenv('OPENAI_RATE_PER_SECOND', '2')),
+                burst=int(os.getenv('OPENAI_RATE_BURST', '4')),
+                max_retries=int(os.getenv('OPENAI_MAX_RETRIES', '4'))
+            )
+
+    return _request_scheduler
@@ -0,0 +1,157 @@
+"""
+OpenAI 응답 캐시 (로컬 SQLite)
+
+모델 + temperature + 언어 + 완성된 프롬프트 해시를 키로 AI 응답과 토큰 사용량을 보관하여
+같은 데이터로 다시 분석할 때 API를 호출하지 않고 즉시 결과를 돌려줍니다.
+- 프로세스 재시작 후에도 유지 (data/ 아래 SQLite 파일)
+- TTL 경과 항목은 조회 시 무시, 저장 시 정리
+- 최대 항목 수 초과 시 가장 오래 사용하지 않은 항목부터 제거
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 기본 저장 경로
+DEFAULT_CACHE_PATH = Path(__file__).parent.parent / "data" / "openai_cache.sqlite3"
+
+
+def hash_prompt(messages: List[Dict]) -> str:
+    """시스템/사용자 메시지를 포함한 전체 프롬프트 SHA-256 해시"""
+    payload = json.dumps(messages, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def make_response_key(model: str, temperature: float, language: str, prompt_hash: str) -> str:
+    """캐시 키 생성 (모델 + temperature + 언어 + 프롬프트 해시)"""
+    return f"{model}:{temperature}:{language}:{prompt_hash}"
+
+
+class ResponseCache:
+    """TTL + 최대 항목 수 제한이 있는 스레드 안전 SQLite 응답 캐시"""
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, ttl_seconds: int = 7 * 24 * 3600,
+                 max_entries: int = 500):
+        """
+        Args:
+            path: SQLite 파일 경로
+            ttl_seconds: 항목 유효 시간 (초)
+            max_entries: 최대 보관 항목 수
+        """
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Streamlit 스크립트 스레드 / 스트리밍 백그라운드 스레드에서 함께 사용
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " content TEXT NOT NULL,"
+                " usage TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used_at)"
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        캐시 조회 (적중 시 최근 사용 시각 갱신)
+
+        Returns:
+            {'content': 응답 텍스트, 'usage': 토큰 사용량} 또는 None (없음/만료)
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT content, usage, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            content, usage, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET last_used_at = ? WHERE key = ?", (now, key)
+            )
+        return {'content': content, 'usage': json.loads(usage)}
+
+    def put(self, key: str, content: str, usage: Optional[Dict]) -> None:
+        """
+        응답 저장 후 만료/초과 항목 정리
+
+        Args:
+            key: 캐시 키
+            content: 응답 텍스트
+            usage: 원래 호출의 토큰 사용량
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, content, usage, created_at, last_used_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, content, json.dumps(usage or {}), now, now)
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self) -> None:
+        """전체 캐시 비우기"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+
+# 싱글톤 인스턴스
+_response_cache = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    응답 캐시 싱글톤 반환
+
+    OPENAI_CACHE_TTL=0 이면 캐시를 사용하지 않습니다.
+
+    Returns:
+        ResponseCache 인스턴스 또는 None (비활성화/생성 실패)
+    """
+    global _response_cache
+
+    ttl = int(os.getenv('OPENAI_CACHE_TTL', str(7 * 24 * 3600)))
+    if ttl <= 0:
+        return None
+
+    if _response_cache is None:
+        try:
+            _response_cache = ResponseCache(
+                path=Path(os.getenv('OPENAI_CACHE_PATH', str(DEFAULT_CACHE_PATH))),
+                ttl_seconds=ttl,
+                max_entries=int(os.getenv('OPENAI_CACHE_MAX_ENTRIES', '500'))
+            )
+        except Exception as e:
+            print(f"[OpenAI Cache] 캐시 초기화 실패: {str(e)}")
+            return None
+
+    return _response_cache
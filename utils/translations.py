@@ -214,6 +214,7 @@ TRANSLATIONS = {
         # 분석 이력
         'no_analysis_history': '아직 분석 이력이 없습니다.',
         'saved_purchases': '저장된 구매',
+        'show_full_analysis': '전체 보기',
         'count_unit': '건',
         'regret_label': '후회',
         'score_unit': '점',
@@ -334,6 +335,13 @@ API 키가 없어도 기본 분석은 계속 이용 가능합니다!""",
         'token_total': '총 토큰',
         'cost_estimate': '예상 비용',
 
+        # AI 호출 계측 (관리자)
+        'ai_telemetry': '🛠️ AI 호출 계측',
+        'ai_telemetry_process': '현재 서버 프로세스 집계',
+        'ai_telemetry_daily': '최근 7일 (ai_usage_logs)',
+        'ai_telemetry_empty': '아직 기록된 AI 호출이 없습니다.',
+        'write_queue_status': 'DB 쓰기 큐: 저장 {} / 대기 {} / 재시도 {} / 버림 {}',
+
         # AI 미리보기
         'preview_psychology': '**소비 심리 분석**\n- 소비 패턴 요약 및 주요 후회 원인 분석\n- 실천 가능한 개선 방안과 월간 도전 과제',
         'preview_insights': '**스마트 인사이트**\n- 각 구매의 소비패턴 분류 (스트레스성, 충동적, 계획적 등)\n- 유사 사용자 재구매율 추정\n- 카테고리별 장기 저축 효과 시뮬레이션\n- 추천 구매목록 TOP 5 (쿠팡 링크 포함)',
@@ -549,6 +557,7 @@ API 키가 없어도 기본 분석은 계속 이용 가능합니다!""",
         # 分析履歴
         'no_analysis_history': '分析履歴がありません。',
         'saved_purchases': '保存された購入',
+        'show_full_analysis': '全文を見る',
         'count_unit': '件',
         'regret_label': '後悔',
         'score_unit': '点',
@@ -669,6 +678,13 @@ APIキーがなくても基本分析は引き続きご利用いただけます
         'token_total': '総トークン',
         'cost_estimate': '推定コスト',
 
+        # AI呼び出し計測（管理者）
+        'ai_telemetry': '🛠️ AI呼び出し計測',
+        'ai_telemetry_process': '現在のサーバープロセスの集計',
+        'ai_telemetry_daily': '直近7日間 (ai_usage_logs)',
+        'ai_telemetry_empty': 'まだ記録されたAI呼び出しはありません。',
+        'write_queue_status': 'DB書き込みキュー: 保存 {} / 待機 {} / 再試行 {} / 破棄 {}',
+
         # AIプレビュー
         'preview_psychology': '**消費心理分析**\n- 消費パターンの要約と主な後悔原因の分析\n- 実践可能な改善方法と月間チャレンジ',
         'preview_insights': '**スマートインサイト**\n- 各購入の消費パターン分類（ストレス性、衝動的、計画的など）\n- 類似ユーザーの再購入率推定\n- カテゴリ別長期貯蓄効果シミュレーション\n- おすすめ購入リスト TOP 5（購入リンク付き）',
@@ -124,13 +124,15 @@ def create_amount_chart(df: pd.DataFrame, lang: str = 'ko') -> go.Figure:
     return fig
 
 
-def create_timeline_chart(df: pd.DataFrame, lang: str = 'ko') -> go.Figure:
+def create_timeline_chart(df: pd.DataFrame, lang: str = 'ko',
+                          monthly_summary: pd.DataFrame = None) -> go.Figure:
     """
     월별 지출 추이 차트 생성
 
     Args:
         df: 처리된 DataFrame
         lang: 언어 코드 ('ko' 또는 'ja')
+        monthly_summary: 서버 측 월별 집계 [연월, 총_금액, 구매_건수] (있으면 df 재집계 생략)
 
     Returns:
         plotly Figure 객체
@@ -139,14 +141,17 @@ def create_timeline_chart(df: pd.DataFrame, lang: str = 'ko') -> go.Figure:
     unit = '円' if lang == 'ja' else '원'
 
     # 월별 집계
-    monthly_df = df.copy()
-    monthly_df['연월'] = monthly_df['날짜'].dt.to_period('M').astype(str)
-
-    monthly_summary = monthly_df.groupby('연월').agg({
-        '금액': 'sum',
-        '날짜': 'count'
-    }).reset_index()
-    monthly_summary.columns = ['연월', '총_금액', '구매_건수']
+    if monthly_summary is None:
+        monthly_df = df.copy()
+        monthly_df['연월'] = monthly_df['날짜'].dt.to_period('M').astype(str)
+
+        monthly_summary = monthly_df.groupby('연월').agg({
+            '금액': 'sum',
+            '날짜': 'count'
+        }).reset_index()
+        monthly_summary.columns = ['연월', '총_금액', '구매_건수']
+    else:
+        monthly_summary = monthly_summary.copy()
 
     # 일본어 모드: JPY로 변환
     monthly_summary['총_금액'] = monthly_summary['총_금액'].apply(lambda x: from_krw(x, lang))